@@ -6,7 +6,7 @@ from app.config import settings
 from app.database import Base
 
 # Importar TODOS los modelos aquí para que Alembic los detecte
-from app.models import User
+from app.models import RefreshToken, User
 
 # this is the Alembic Config object
 config = context.config
@@ -0,0 +1,30 @@
+"""add (created_at, id) index to users for keyset pagination
+
+Revision ID: 3f355d65485f
+Revises: 23fb76df5b91
+Create Date: 2026-10-17 09:12:41.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f355d65485f'
+down_revision: Union[str, Sequence[str], None] = '23fb76df5b91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_users_created_at_id', 'users', ['created_at', 'id'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_created_at_id', table_name='users')
@@ -0,0 +1,43 @@
+"""make users email/username unique only among non-deleted rows
+
+Revision ID: 8fb07c73170e
+Revises: 3f355d65485f
+Create Date: 2026-10-17 11:40:05.271934
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8fb07c73170e'
+down_revision: Union[str, Sequence[str], None] = '3f355d65485f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_index(op.f('ix_users_username'), table_name='users')
+    op.create_index(
+        'uq_users_email_active', 'users', ['email'], unique=True,
+        postgresql_where=sa.text('deleted_at IS NULL'),
+        sqlite_where=sa.text('deleted_at IS NULL'),
+    )
+    op.create_index(
+        'uq_users_username_active', 'users', ['username'], unique=True,
+        postgresql_where=sa.text('deleted_at IS NULL'),
+        sqlite_where=sa.text('deleted_at IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Falla si ya hay duplicados entre usuarios eliminados y activos
+    op.drop_index('uq_users_username_active', table_name='users')
+    op.drop_index('uq_users_email_active', table_name='users')
+    op.create_index(op.f('ix_users_username'), 'users', ['username'], unique=True)
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
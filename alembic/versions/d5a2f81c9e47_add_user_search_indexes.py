@@ -0,0 +1,56 @@
+"""add lower() and trigram indexes for user search
+
+Revision ID: d5a2f81c9e47
+Revises: c41e7a9d2b63
+Create Date: 2026-10-17 19:20:13.640512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a2f81c9e47'
+down_revision: Union[str, Sequence[str], None] = 'c41e7a9d2b63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_FIELDS = ('username', 'email', 'full_name')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Postgres: btree text_pattern_ops (prefijo) + GIN de trigramas
+    # (subcadena). SQLite: solo el btree sobre lower(), ver app/models/user.py
+    is_postgres = op.get_bind().dialect.name == 'postgresql'
+    if is_postgres:
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for field in SEARCH_FIELDS:
+        op.create_index(
+            f'ix_users_{field}_lower', 'users',
+            [sa.text(f'lower({field}) text_pattern_ops' if is_postgres
+                     else f'lower({field})')],
+            unique=False,
+            postgresql_where=sa.text('deleted_at IS NULL'),
+            sqlite_where=sa.text('deleted_at IS NULL'),
+        )
+        if is_postgres:
+            op.create_index(
+                f'ix_users_{field}_trgm', 'users',
+                [sa.text(f'lower({field}) gin_trgm_ops')],
+                unique=False,
+                postgresql_using='gin',
+                postgresql_where=sa.text('deleted_at IS NULL'),
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # La extensión pg_trgm se deja instalada: otras tablas pueden usarla
+    is_postgres = op.get_bind().dialect.name == 'postgresql'
+    for field in reversed(SEARCH_FIELDS):
+        if is_postgres:
+            op.drop_index(f'ix_users_{field}_trgm', table_name='users')
+        op.drop_index(f'ix_users_{field}_lower', table_name='users')
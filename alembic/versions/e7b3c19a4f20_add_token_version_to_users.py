@@ -0,0 +1,31 @@
+"""add token_version to users
+
+Revision ID: e7b3c19a4f20
+Revises: d5a2f81c9e47
+Create Date: 2026-10-17 21:05:42.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b3c19a4f20'
+down_revision: Union[str, Sequence[str], None] = 'd5a2f81c9e47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'users',
+        sa.Column('token_version', sa.Integer(), server_default='0', nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'token_version')
@@ -1,66 +1,148 @@
+from uuid import UUID
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.config import settings
+from app.core.security import InvalidTokenError, token_versions, verify_access_token
 from app.crud import user as crud_user
-from app.database import get_db
+from app.crud.async_user import user as async_crud_user
+from app.database import get_async_db, get_db
 from app.models.user import User
+from app.schemas.access_token import AccessTokenData
 
 # OAuth2 scheme: busca el token en el header Authorization: Bearer <token>
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
-) -> User:
-    """
-    Obtiene el usuario actual desde el token JWT.
-    Si el token es inválido o el usuario no existe, lanza excepción.
-    """
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudo validar las credenciales",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+def _get_token_data(token: str) -> AccessTokenData:
+    """Verifica el JWT y retorna sus claims o lanza 401"""
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+        return verify_access_token(token)
+    except InvalidTokenError as e:
+        print(f"InvalidTokenError: {e}")
+        raise _credentials_exception() from e
+
+
+def _get_token_subject(token: str) -> UUID:
+    """Verifica el JWT y retorna el user_id (sub) o lanza 401"""
+    return _get_token_data(token).sub
+
+
+def _get_claims_user(token_data: AccessTokenData) -> User | None:
+    """
+    Usuario armado solo con los claims del token (sin DB), o None si el token
+    no los trae (modo stateless apagado o token emitido antes de activarlo)
+    o si `token_versions` no está sincronizada con la DB.
+
+    Solo tiene id, role e is_superuser: sirve para autorizar, no para
+    responder con datos del usuario. Se emite solo a usuarios activos, y
+    desactivar o eliminar al usuario incrementa su versión, así que un token
+    con versión vigente implica un usuario activo.
+    """
+    if not settings.STATELESS_AUTH or token_data.token_version is None:
+        return None
+    # Sin las versiones de la DB un token revocado pasaría: se consulta la DB
+    if not token_versions.synced:
+        return None
+    if not token_versions.is_current(token_data.sub, token_data.token_version):
+        raise _credentials_exception()
+    return User(
+        id=token_data.sub,
+        role=token_data.role,
+        is_superuser=token_data.is_superuser,
+        is_active=True,
+    )
+
+
+def _check_active(current_user: User) -> User:
+    if not current_user.is_active or current_user.deleted_at is not None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Usuario inactivo"
         )
+    return current_user
+
 
-        user_id: str | None = payload.get("sub")
+def _check_superuser(current_user: User) -> User:
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permisos de superusuario",
+        )
+    return current_user
 
-        if user_id is None:
-            raise credentials_exception
 
-    except JWTError as e:
-        print(f"JWTError: {e}")
-        raise credentials_exception from e
-    except Exception as e:
-        print(f"Exception: {e}")
-        raise credentials_exception from e
+def get_current_user(
+    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
+) -> User:
+    """
+    Obtiene el usuario actual desde el token JWT.
+    Si el token es inválido o el usuario no existe, lanza excepción.
 
-    user = crud_user.get(db, id=user_id)
+    El usuario se resuelve a través de `user_cache`: en un hit no se ejecuta
+    ninguna consulta, y como la sesión abre su conexión de forma perezosa,
+    tampoco se toma una conexión del pool.
+    """
+    user = crud_user.get_cached(db, id=_get_token_subject(token))
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
 
     return user
 
 
-def get_current_active_user(
-    current_user: User = Depends(get_current_user),
+def get_authorized_user(
+    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
 ) -> User:
     """
-    Verifica que el usuario actual esté activo (no desactivado).
+    Usuario activo para autorizar la petición.
+
+    Con `STATELESS_AUTH` se arma desde los claims del token y no toca la DB;
+    si no, es `get_current_active_user`. Las rutas que devuelven los datos
+    del usuario actual (`/me`) deben usar `get_current_active_user`.
     """
-    if not current_user.is_active or current_user.deleted_at is not None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Usuario inactivo"
-        )
+    token_data = _get_token_data(token)
+    claims_user = _get_claims_user(token_data)
+    if claims_user is not None:
+        return claims_user
 
-    return current_user
+    user = crud_user.get_cached(db, id=token_data.sub)
+    if user is None:
+        raise _credentials_exception()
+    return _check_active(user)
+
+
+def get_authorized_superuser(
+    current_user: User = Depends(get_authorized_user),
+) -> User:
+    """
+    Verifica que el usuario que autoriza la petición sea superusuario.
+    """
+    return _check_superuser(current_user)
+
+
+def get_current_active_user(
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme),
+    authorized_user: User = Depends(get_authorized_user),
+) -> User:
+    """
+    Verifica que el usuario actual esté activo (no desactivado) y lo retorna
+    completo. Fuera del modo stateless reutiliza el usuario ya resuelto por
+    `get_authorized_user` (FastAPI lo resuelve una sola vez por petición).
+    """
+    if not settings.STATELESS_AUTH:
+        return authorized_user
+    return _check_active(get_current_user(db, token))
 
 
 def get_current_superuser(
@@ -69,9 +151,68 @@ def get_current_superuser(
     """
     Verifica que el usuario actual sea superusuario.
     """
-    if not current_user.is_superuser:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="No tienes permisos de superusuario",
-        )
-    return current_user
+    return _check_superuser(current_user)
+
+
+# Versiones async, para los routers que usan AsyncSession
+
+
+async def get_current_user_async(
+    db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)
+) -> User:
+    """
+    Igual que `get_current_user`, pero resuelve el usuario con AsyncSession.
+    """
+    user = await async_crud_user.get_cached(db, id=_get_token_subject(token))
+    if user is None:
+        raise _credentials_exception()
+
+    return user
+
+
+async def get_authorized_user_async(
+    db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)
+) -> User:
+    """
+    Igual que `get_authorized_user`, con AsyncSession si hace falta la DB.
+    """
+    token_data = _get_token_data(token)
+    claims_user = _get_claims_user(token_data)
+    if claims_user is not None:
+        return claims_user
+
+    user = await async_crud_user.get_cached(db, id=token_data.sub)
+    if user is None:
+        raise _credentials_exception()
+    return _check_active(user)
+
+
+async def get_authorized_superuser_async(
+    current_user: User = Depends(get_authorized_user_async),
+) -> User:
+    """
+    Verifica que el usuario que autoriza la petición sea superusuario.
+    """
+    return _check_superuser(current_user)
+
+
+async def get_current_active_user_async(
+    db: AsyncSession = Depends(get_async_db),
+    token: str = Depends(oauth2_scheme),
+    authorized_user: User = Depends(get_authorized_user_async),
+) -> User:
+    """
+    Igual que `get_current_active_user`, con AsyncSession.
+    """
+    if not settings.STATELESS_AUTH:
+        return authorized_user
+    return _check_active(await get_current_user_async(db, token))
+
+
+async def get_current_superuser_async(
+    current_user: User = Depends(get_current_active_user_async),
+) -> User:
+    """
+    Verifica que el usuario actual sea superusuario.
+    """
+    return _check_superuser(current_user)
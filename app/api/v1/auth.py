@@ -1,84 +1,122 @@
-from datetime import timedelta
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.api.deps import get_current_active_user
-from app.config import settings
-from app.core.security import create_access_token
+from app.api.v1.common import (
+    duplicate_user,
+    invalid_credentials,
+    invalid_refresh_token,
+    token_response,
+    user_response,
+)
+from app.core.replicas import read_from_primary
+from app.core.security import access_token_data_for
+from app.core.throttling import login_throttle
 from app.crud import user as crud_user
+from app.crud.refresh_token import InvalidRefreshTokenError
+from app.crud.refresh_token import refresh_token as crud_refresh_token
+from app.crud.user import DuplicateUserError
 from app.database import get_db
 from app.models.user import User
 from app.schemas.access_token import AccessTokenData
-from app.schemas.user import Token, UserCreate, UserResponse
+from app.schemas.user import RefreshTokenRequest, Token, UserCreate, UserResponse
 
 router = APIRouter()
 
 
 @router.post("/login", response_model=Token)
-def login(
-    db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()
+async def login(
+    request: Request,
+    db: Session = Depends(get_db),
+    form_data: OAuth2PasswordRequestForm = Depends(),
 ) -> Any:
     """
     OAuth2 compatible token login.
     Recibe username y password, devuelve token JWT.
+
+    Los intentos se limitan por IP y por username antes de verificar el
+    password (429 con Retry-After), ver `LoginThrottle`.
+
+    Es async para esperar a Argon2 sin ocupar un thread del threadpool; las
+    consultas a la DB sí corren en el threadpool.
     """
-    user = crud_user.authenticate(
-        db, username=form_data.username, password=form_data.password
-    )
+    client_ip = request.client.host if request.client else None
+    login_throttle.check(form_data.username, client_ip)
+    with login_throttle.verification():
+        user = await crud_user.authenticate_async(
+            db, username=form_data.username, password=form_data.password
+        )
 
     if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Usuario o contraseña incorrectos",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise invalid_credentials()
+
+    # Refresh token para renovar la sesión sin volver a verificar el password
+    token_data, refresh_token = await run_in_threadpool(_issue_tokens, db, user)
+    return token_response(token_data, refresh_token)
+
+
+def _issue_tokens(db: Session, user: User) -> tuple[AccessTokenData, str]:
+    """
+    Claims del access token y refresh token nuevo. Corre en el threadpool:
+    tras un commit (rehash o `issue`) `user` queda expirado y leerlo recarga
+    la fila, una consulta bloqueante que no debe correr en el event loop.
+    """
+    token_data = access_token_data_for(user)
+    return token_data, crud_refresh_token.issue(db, user.id)
+
 
-    # Crear token JWT
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data=AccessTokenData(sub=user.id),  # "sub" es el subject (user_id)
-        expires_delta=access_token_expires,
-    )
+@router.post("/refresh", response_model=Token)
+def refresh(refresh_in: RefreshTokenRequest, db: Session = Depends(get_db)) -> Any:
+    """
+    Canjea un refresh token por un nuevo access token y un nuevo refresh
+    token (rotación). Es una búsqueda por índice, sin Argon2.
+
+    Un refresh token solo sirve una vez: si se vuelve a presentar, se asume
+    robado y se revoca toda la sesión (familia de tokens).
+    """
+    try:
+        user_id, refresh_token = crud_refresh_token.rotate(db, refresh_in.refresh_token)
+    except InvalidRefreshTokenError as e:
+        raise invalid_refresh_token() from e
 
-    return {"access_token": access_token, "token_type": "bearer"}
+    user = crud_user.get_cached(db, id=user_id)
+    if user is None or not user.is_active:
+        raise invalid_refresh_token()
+    return token_response(access_token_data_for(user), refresh_token)
 
 
 @router.post(
     "/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED
 )
-def register(user_in: UserCreate, db: Session = Depends(get_db)) -> Any:
+async def register(user_in: UserCreate, db: Session = Depends(get_db)) -> Any:
     """
     Registrar nuevo usuario.
 
     TODO: Ahora es público, hay que restringirlo a admins.
     """
-    # Verificar que el email no exista
-    user = crud_user.get_by_email(db, email=user_in.email)
-    if user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="El email ya está registrado",
-        )
-
-    # Verificar que el username no exista
-    user = crud_user.get_by_username(db, username=user_in.username)
-    if user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="El username ya está en uso"
-        )
-
-    # Crear usuario
-    user = crud_user.create(db, obj_in=user_in)
+    # Crear usuario; la unicidad de email/username la valida la DB
+    try:
+        user = await crud_user.create_async(db, obj_in=user_in)
+    except DuplicateUserError as e:
+        raise duplicate_user(e) from e
 
     return user
 
 
+# Después de editar su perfil, el usuario debe verlo sin esperar a la réplica
 @router.get("/me", response_model=UserResponse)
-def read_users_me(current_user: User = Depends(get_current_active_user)) -> Any:
+@read_from_primary
+def read_users_me(
+    request: Request,
+    current_user: User = Depends(get_current_active_user),
+) -> Response:
     """
-    Obtener información del usuario actual (desde el token).
+    Obtener información del usuario actual (desde el token), en JSON o
+    MessagePack según `Accept`.
+    Responde con ETag y honra `If-None-Match` (304).
     """
-    return current_user
+    return user_response(request, current_user)
@@ -0,0 +1,114 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, Request, Response, status
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_current_active_user_async
+from app.api.v1.common import (
+    duplicate_user,
+    invalid_credentials,
+    invalid_refresh_token,
+    token_response,
+    user_response,
+)
+from app.core.replicas import read_from_primary
+from app.core.security import access_token_data_for
+from app.core.throttling import login_throttle
+from app.crud.async_refresh_token import refresh_token as crud_refresh_token
+from app.crud.async_user import user as crud_user
+from app.crud.refresh_token import InvalidRefreshTokenError
+from app.crud.user import DuplicateUserError
+from app.database import get_async_db
+from app.models.user import User
+from app.schemas.user import RefreshTokenRequest, Token, UserCreate, UserResponse
+
+# Versión async del router de auth (ver `auth.py`), activada con ASYNC_ROUTES
+router = APIRouter()
+
+
+@router.post("/login", response_model=Token)
+async def login(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    form_data: OAuth2PasswordRequestForm = Depends(),
+) -> Any:
+    """
+    OAuth2 compatible token login.
+    Recibe username y password, devuelve token JWT.
+
+    Los intentos se limitan por IP y por username antes de verificar el
+    password (429 con Retry-After), ver `LoginThrottle`.
+    """
+    client_ip = request.client.host if request.client else None
+    login_throttle.check(form_data.username, client_ip)
+    with login_throttle.verification():
+        user = await crud_user.authenticate(
+            db, username=form_data.username, password=form_data.password
+        )
+
+    if not user:
+        raise invalid_credentials()
+
+    # Refresh token para renovar la sesión sin volver a verificar el password
+    refresh_token = await crud_refresh_token.issue(db, user.id)
+    return token_response(access_token_data_for(user), refresh_token)
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(
+    refresh_in: RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)
+) -> Any:
+    """
+    Canjea un refresh token por un nuevo access token y un nuevo refresh
+    token (rotación). Es una búsqueda por índice, sin Argon2.
+
+    Un refresh token solo sirve una vez: si se vuelve a presentar, se asume
+    robado y se revoca toda la sesión (familia de tokens).
+    """
+    try:
+        user_id, refresh_token = await crud_refresh_token.rotate(
+            db, refresh_in.refresh_token
+        )
+    except InvalidRefreshTokenError as e:
+        raise invalid_refresh_token() from e
+
+    user = await crud_user.get_cached(db, id=user_id)
+    if user is None or not user.is_active:
+        raise invalid_refresh_token()
+    return token_response(access_token_data_for(user), refresh_token)
+
+
+@router.post(
+    "/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED
+)
+async def register(
+    user_in: UserCreate, db: AsyncSession = Depends(get_async_db)
+) -> Any:
+    """
+    Registrar nuevo usuario.
+
+    TODO: Ahora es público, hay que restringirlo a admins.
+    """
+    # Crear usuario; la unicidad de email/username la valida la DB
+    try:
+        user = await crud_user.create(db, obj_in=user_in)
+    except DuplicateUserError as e:
+        raise duplicate_user(e) from e
+
+    return user
+
+
+# Después de editar su perfil, el usuario debe verlo sin esperar a la réplica
+@router.get("/me", response_model=UserResponse)
+@read_from_primary
+async def read_users_me(
+    request: Request,
+    current_user: User = Depends(get_current_active_user_async),
+) -> Response:
+    """
+    Obtener información del usuario actual (desde el token), en JSON o
+    MessagePack según `Accept`.
+    Responde con ETag y honra `If-None-Match` (304).
+    """
+    return user_response(request, current_user)
@@ -0,0 +1,299 @@
+from typing import Any, Iterable, List, Optional, Sequence
+from uuid import UUID
+
+from fastapi import HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Row
+
+from app.config import settings
+from app.core.etags import (
+    collection_etag,
+    entity_etag,
+    if_none_match,
+    not_modified,
+    set_etag,
+)
+from app.core.exporters import Exporter
+from app.core.fieldsets import InvalidFieldsError, parse_fields
+from app.core.importers import RowError, UnsupportedFormatError, detect_format
+from app.core.negotiation import (
+    MSGPACK_MEDIA_TYPE,
+    VARY_ACCEPT,
+    negotiate_media_type,
+    negotiated_response,
+)
+from app.core.pagination import InvalidCursorError
+from app.core.security import create_access_token
+from app.crud.user import MIN_CONTAINS_LENGTH, DuplicateUserError
+from app.models.enums import UserRole
+from app.models.user import User
+from app.schemas.access_token import AccessTokenData
+from app.schemas.user import (
+    ImportRowError,
+    UserBulkUpdate,
+    UserImportSummary,
+    UserResponse,
+    UserUpdate,
+)
+
+# Lo que comparten los routers sync (users.py, auth.py) y async
+# (users_async.py, auth_async.py): parámetros, validaciones y armado de las
+# respuestas. Cada router solo pone la sesión y los await.
+
+# Columnas del listado: exactamente los campos de UserResponse
+USER_LIST_COLUMNS = list(UserResponse.model_fields)
+
+FIELDS_QUERY = Query(
+    None,
+    description="Campos a incluir separados por coma (ej. id,username,role)",
+)
+
+COUNT_QUERY = Query(
+    None,
+    description=(
+        "Agregar X-Total-Count: `exact` (COUNT cacheado unos segundos) o "
+        "`estimated` (estimación del planner en tablas grandes)"
+    ),
+)
+
+SEARCH_TEXT_QUERY = Query(
+    None,
+    min_length=1,
+    max_length=100,
+    description="Texto a buscar en username, email y full_name",
+)
+
+SEARCH_MATCH_QUERY = Query(
+    "prefix",
+    description=(
+        "`prefix` (empieza con) o `contains` (contiene, mínimo "
+        f"{MIN_CONTAINS_LENGTH} caracteres)"
+    ),
+)
+
+ADMIN_ROLES = (UserRole.ADMIN.value, UserRole.SUPER_ADMIN.value)
+
+
+def bad_request(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def user_not_found() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND, detail="Usuario no encontrado"
+    )
+
+
+def invalid_cursor(e: InvalidCursorError) -> HTTPException:
+    return bad_request(str(e))
+
+
+def duplicate_user(e: DuplicateUserError) -> HTTPException:
+    """Error de registro/creación con un email o username ya usado"""
+    return bad_request(
+        "El email ya está registrado"
+        if e.field == "email"
+        else "El username ya está en uso"
+    )
+
+
+def duplicate_field(e: DuplicateUserError) -> HTTPException:
+    """Error de actualización con un email o username ya usado"""
+    return bad_request(f"El {e.field} ya está en uso")
+
+
+def invalid_credentials() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Usuario o contraseña incorrectos",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def invalid_refresh_token() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Refresh token inválido o expirado",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def parse_user_fields(fields: Optional[str]) -> List[str]:
+    try:
+        return parse_fields(fields, USER_LIST_COLUMNS)
+    except InvalidFieldsError as e:
+        raise bad_request(str(e)) from e
+
+
+def check_pagination(skip: int, cursor: Optional[str]) -> None:
+    if skip and cursor:
+        raise bad_request("No se puede usar skip y cursor a la vez")
+
+
+def check_search(q: Optional[str], match: str) -> None:
+    if q and match == "contains" and len(q) < MIN_CONTAINS_LENGTH:
+        raise bad_request(
+            "La búsqueda por subcadena requiere al menos "
+            f"{MIN_CONTAINS_LENGTH} caracteres"
+        )
+
+
+def require_self_or_admin(user_id: UUID, current_user: User, detail: str) -> None:
+    """Solo el mismo usuario o admin/superuser"""
+    if user_id != current_user.id and current_user.role not in ADMIN_ROLES:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+
+
+def require_role_change_allowed(
+    user: User, user_in: UserUpdate, current_user: User
+) -> None:
+    """Si intenta cambiar el rol, solo superuser puede"""
+    if user_in.role and user_in.role != user.role and not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo super usuarios pueden cambiar roles",
+        )
+
+
+def require_not_self(user_ids: Iterable[UUID], current_user: User) -> None:
+    """No permitir auto-eliminación"""
+    if current_user.id in user_ids:
+        raise bad_request("No puedes eliminarte a ti mismo")
+
+
+def bulk_update_values(bulk_in: UserBulkUpdate, current_user: User) -> dict[str, Any]:
+    """Valores del UPDATE masivo, ya validados"""
+    values = bulk_in.model_dump(exclude={"ids"}, exclude_none=True)
+    if not values:
+        raise bad_request("No hay cambios para aplicar")
+    if "role" in values:
+        values["role"] = values["role"].value
+
+    # No permitir auto-desactivación
+    if values.get("is_active") is False and current_user.id in bulk_in.ids:
+        raise bad_request("No puedes desactivarte a ti mismo")
+    return values
+
+
+def count_headers(total: int, exact: bool) -> dict[str, str]:
+    return {
+        "X-Total-Count": str(total),
+        "X-Total-Count-Type": "exact" if exact else "estimated",
+    }
+
+
+def page_response(
+    request: Request,
+    rows: Sequence[Row[Any]],
+    columns: List[str],
+    next_cursor: Optional[str],
+    headers: Optional[dict[str, str]] = None,
+) -> Response:
+    """
+    Página de usuarios en el formato negociado, con `X-Next-Cursor` y ETag
+    (304 si coincide con `If-None-Match`). Las filas traen `updated_at`.
+    """
+    headers = {**(headers or {})}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    media_type = negotiate_media_type(request)
+    etag = collection_etag(
+        ((row.id, row.updated_at) for row in rows), columns, next_cursor, media_type
+    )
+    if if_none_match(request, etag):
+        return not_modified(etag, {**headers, **VARY_ACCEPT})
+
+    response = negotiated_response(
+        media_type,
+        [{name: row._mapping[name] for name in columns} for row in rows],
+        headers,
+    )
+    set_etag(response, etag)
+    return response
+
+
+def row_columns(columns: List[str]) -> List[str]:
+    """Columnas a leer para un usuario: id y updated_at hacen falta para el ETag"""
+    return list(dict.fromkeys([*columns, "id", "updated_at"]))
+
+
+def row_response(request: Request, row: Row[Any], columns: List[str]) -> Response:
+    """Un usuario (solo `columns`) en el formato negociado, con ETag"""
+    media_type = negotiate_media_type(request)
+    etag = entity_etag(row.id, row.updated_at, media_type, *columns)
+    if if_none_match(request, etag):
+        return not_modified(etag, VARY_ACCEPT)
+
+    response = negotiated_response(
+        media_type, {name: row._mapping[name] for name in columns}
+    )
+    set_etag(response, etag)
+    return response
+
+
+def user_response(request: Request, user: User) -> Response:
+    """El usuario actual en el formato negociado, con ETag"""
+    media_type = negotiate_media_type(request)
+    etag = entity_etag(user.id, user.updated_at, media_type)
+    if if_none_match(request, etag):
+        return not_modified(etag, VARY_ACCEPT)
+
+    response = negotiated_response(
+        media_type, UserResponse.model_validate(user).model_dump()
+    )
+    set_etag(response, etag)
+    return response
+
+
+def user_exporter(request: Request, format: Optional[str]) -> Exporter:
+    """Sin `format`, MessagePack si el `Accept` lo pide y NDJSON si no"""
+    if format is None:
+        format = (
+            "msgpack"
+            if negotiate_media_type(request) == MSGPACK_MEDIA_TYPE
+            else "ndjson"
+        )
+    return Exporter(UserResponse, format)
+
+
+def export_response(content: Any, exporter: Exporter) -> StreamingResponse:
+    return StreamingResponse(
+        content,
+        media_type=exporter.media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="users.{exporter.format}"'
+        },
+    )
+
+
+def import_format(file: UploadFile) -> str:
+    try:
+        return detect_format(file.filename, file.content_type)
+    except UnsupportedFormatError as e:
+        raise bad_request(str(e)) from e
+
+
+def add_import_batch(
+    summary: UserImportSummary, rows: int, created: int, errors: List[RowError]
+) -> None:
+    """Suma al resumen un lote de `rows` filas leídas"""
+    summary.total += rows
+    summary.created += created
+    summary.failed += len(errors)
+    room = settings.USER_IMPORT_MAX_ERRORS - len(summary.errors)
+    summary.errors += [
+        ImportRowError(row=row, error=error) for row, error in sorted(errors)[:room]
+    ]
+
+
+def token_response(token_data: AccessTokenData, refresh_token: str) -> dict[str, str]:
+    """
+    Access token JWT con `token_data` (ver `access_token_data_for`) junto al
+    refresh token
+    """
+    access_token = create_access_token(data=token_data)
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+    }
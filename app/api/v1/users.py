@@ -1,64 +1,228 @@
-from typing import List
+from typing import List, Literal, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Security, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Query,
+    Request,
+    Response,
+    Security,
+    UploadFile,
+    status,
+)
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_current_active_user, get_current_superuser
+from app.api.deps import (
+    get_authorized_superuser,
+    get_authorized_user,
+    get_current_active_user,
+)
+from app.api.v1.common import (
+    COUNT_QUERY,
+    FIELDS_QUERY,
+    SEARCH_MATCH_QUERY,
+    SEARCH_TEXT_QUERY,
+    add_import_batch,
+    bulk_update_values,
+    check_pagination,
+    check_search,
+    count_headers,
+    duplicate_field,
+    duplicate_user,
+    export_response,
+    import_format,
+    invalid_cursor,
+    page_response,
+    parse_user_fields,
+    require_not_self,
+    require_role_change_allowed,
+    require_self_or_admin,
+    row_columns,
+    row_response,
+    user_exporter,
+    user_not_found,
+    user_response,
+)
+from app.config import settings
+from app.core.exporters import iter_export
+from app.core.importers import iter_validated_batches
+from app.core.pagination import InvalidCursorError
+from app.core.permissions import require_admin
+from app.core.replicas import read_from_primary
+from app.core.security import get_password_hashes
+from app.crud.base import CountMode
+from app.crud.user import DuplicateUserError, SearchMatch
 from app.crud.user import user as crud_user
 from app.database import get_db
 from app.models.enums import UserRole
 from app.models.user import User
-from app.schemas.user import UserCreate, UserResponse, UserUpdate
+from app.schemas.user import (
+    UserBulkIds,
+    UserBulkUpdate,
+    UserCreate,
+    UserImportSummary,
+    UserResponse,
+    UserUpdate,
+)
 
-router = APIRouter(dependencies=[Security(get_current_active_user)])
+router = APIRouter(dependencies=[Security(get_authorized_user)])
 
 
-@router.get("/", response_model=List[UserResponse])
+@router.get("/", response_model=List[UserResponse], response_class=ORJSONResponse)
 def list_users(
+    request: Request,
     db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 100,
-) -> List[User]:
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = FIELDS_QUERY,
+    count: Optional[CountMode] = COUNT_QUERY,
+) -> Response:
     """
     Listar todos los usuarios.
     Solo usuarios activos pueden ver la lista.
+
+    Soporta dos modos de paginación:
+    - Cursor (recomendado): la primera página se pide sin `skip` ni `cursor`;
+      si hay más resultados, el cursor de la siguiente página se devuelve en
+      el header `X-Next-Cursor` y se envía como `?cursor=...`.
+    - Offset (compatibilidad): `?skip=N`. Se vuelve lento en páginas profundas.
+
+    Ruta rápida: se seleccionan solo las columnas de `UserResponse` como filas
+    de Core y se serializan con orjson, sin objetos ORM ni validación de
+    pydantic (los tipos ya los garantizan las columnas).
+
+    Con `?fields=id,username` la proyección se aplica en el SELECT y la
+    respuesta incluye solo esos campos.
+
+    La página lleva un ETag (ids y `updated_at` de sus filas); con un
+    `If-None-Match` que coincide responde 304: la consulta se hace igual,
+    pero se ahorra serializar y enviar el cuerpo.
+
+    Con `Accept: application/msgpack` responde en MessagePack (mismos
+    campos; UUID y fechas como texto).
+
+    Con `?count=exact|estimated` agrega el total de usuarios en
+    `X-Total-Count` y si es exacto o estimado en `X-Total-Count-Type`.
+    """
+    columns = parse_user_fields(fields)
+    check_pagination(skip, cursor)
+
+    try:
+        rows, next_cursor = crud_user.get_page_rows(
+            db, [*columns, "updated_at"], cursor=cursor, skip=skip, limit=limit
+        )
+    except InvalidCursorError as e:
+        raise invalid_cursor(e) from e
+
+    headers = count_headers(*crud_user.total_count(db, count)) if count else {}
+    return page_response(request, rows, columns, next_cursor, headers)
+
+
+@router.get("/search", response_model=List[UserResponse], response_class=ORJSONResponse)
+def search_users(
+    request: Request,
+    db: Session = Depends(get_db),
+    q: Optional[str] = SEARCH_TEXT_QUERY,
+    match: SearchMatch = SEARCH_MATCH_QUERY,
+    role: Optional[UserRole] = None,
+    is_active: Optional[bool] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = FIELDS_QUERY,
+) -> Response:
+    """
+    Buscar usuarios por texto, rol y/o estado, sin distinguir mayúsculas.
+    Pagina por cursor igual que el listado (`X-Next-Cursor`).
+
+    Tanto el prefijo como la subcadena se resuelven con índices sobre
+    lower() de cada columna (btree y trigramas en Postgres), así el costo
+    depende de los resultados y no del tamaño de la tabla.
+    """
+    columns = parse_user_fields(fields)
+    check_search(q, match)
+
+    try:
+        rows, next_cursor = crud_user.search_rows(
+            db,
+            [*columns, "updated_at"],
+            q=q,
+            match=match,
+            role=role.value if role else None,
+            is_active=is_active,
+            cursor=cursor,
+            limit=limit,
+        )
+    except InvalidCursorError as e:
+        raise invalid_cursor(e) from e
+    return page_response(request, rows, columns, next_cursor)
+
+
+@router.get("/export", response_class=StreamingResponse)
+def export_users(
+    request: Request,
+    db: Session = Depends(get_db),
+    format: Optional[Literal["ndjson", "csv", "msgpack"]] = None,
+    current_user: User = Security(get_authorized_user),
+) -> StreamingResponse:
+    """
+    Exportar todos los usuarios como NDJSON, CSV o MessagePack en streaming.
+    Solo admin/superuser pueden exportar.
+
+    Sin `format`, se usa MessagePack si el `Accept` lo pide y NDJSON si no.
+
+    Las filas se leen con un cursor del servidor y se envían por bloques,
+    así la memoria no crece con la tabla y el primer byte sale de inmediato.
     """
-    return crud_user.get_multi(db, skip=skip, limit=limit)
+    require_admin(current_user.role, "No tienes permisos para exportar usuarios")
+
+    exporter = user_exporter(request, format)
+    users = crud_user.iter_all(db, batch_size=settings.USER_EXPORT_BATCH_SIZE)
+    return export_response(
+        iter_export(users, exporter, settings.USER_EXPORT_CHUNK_SIZE), exporter
+    )
 
 
+# Después de editar su perfil, el usuario debe verlo sin esperar a la réplica
 @router.get("/me", response_model=UserResponse)
-def read_user_me(current_user: User = Security(get_current_active_user)) -> User:
+@read_from_primary
+def read_user_me(
+    request: Request,
+    current_user: User = Security(get_current_active_user),
+) -> Response:
     """
-    Obtener información del usuario actual.
+    Obtener información del usuario actual, en JSON o MessagePack.
+    Responde con ETag y honra `If-None-Match` (304).
     """
-    return current_user
+    return user_response(request, current_user)
 
 
-@router.get("/{user_id}", response_model=UserResponse)
+@router.get("/{user_id}", response_model=UserResponse, response_class=ORJSONResponse)
 def read_user_by_id(
     user_id: UUID,
+    request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Security(get_current_active_user),
-) -> User:
+    current_user: User = Security(get_authorized_user),
+    fields: Optional[str] = FIELDS_QUERY,
+) -> Response:
     """
     Obtener usuario por ID.
+    Con `?fields=...` solo se seleccionan y devuelven esos campos.
+    Negocia JSON o MessagePack por `Accept`.
+    Responde con ETag y honra `If-None-Match` (304).
     """
-    user = crud_user.get(db, id=user_id)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Usuario no encontrado"
-        )
+    columns = parse_user_fields(fields)
+    row = crud_user.get_row(db, id=user_id, columns=row_columns(columns))
+    if not row:
+        raise user_not_found()
 
     # Solo el mismo usuario o admin/superuser pueden ver detalles
-    if user.id != current_user.id:
-        if current_user.role not in [UserRole.ADMIN.value, UserRole.SUPER_ADMIN.value]:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="No tienes permisos para ver este usuario",
-            )
-
-    return user
+    require_self_or_admin(
+        user_id, current_user, "No tienes permisos para ver este usuario"
+    )
+    return row_response(request, row, columns)
 
 
 @router.post(
@@ -66,34 +230,87 @@ def read_user_by_id(
     response_model=UserResponse,
     status_code=status.HTTP_201_CREATED,
     # Solo superuser puede crear
-    dependencies=[Security(get_current_superuser)],
+    dependencies=[Security(get_authorized_superuser)],
 )
-def create_user(
+async def create_user(
     user_in: UserCreate,
     db: Session = Depends(get_db),
 ) -> User:
     """
     Crear nuevo usuario.
     Solo super usuarios pueden crear usuarios.
+    Es async para esperar el hash sin ocupar un thread (ver `auth.register`).
     """
-    # Verificar que el email no exista
-    user = crud_user.get_by_email(db, email=user_in.email)
-    if user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="El email ya está registrado",
-        )
+    # Crear usuario; la unicidad de email/username la valida la DB
+    try:
+        user = await crud_user.create_async(db, obj_in=user_in)
+    except DuplicateUserError as e:
+        raise duplicate_user(e) from e
+    return user
 
-    # Verificar que el username no exista
-    user = crud_user.get_by_username(db, username=user_in.username)
-    if user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="El username ya está en uso"
+
+@router.post(
+    "/import",
+    response_model=UserImportSummary,
+    # Solo superuser puede importar
+    dependencies=[Security(get_authorized_superuser)],
+)
+def import_users(file: UploadFile, db: Session = Depends(get_db)) -> UserImportSummary:
+    """
+    Importación masiva de usuarios desde un archivo CSV o NDJSON.
+    Solo super usuarios pueden importar.
+
+    Columnas/campos: email, username, full_name, password y role (opcional).
+    El archivo se procesa en streaming y por lotes: cada lote se valida con
+    `UserCreate`, hashea las contraseñas en paralelo y se inserta con un solo
+    INSERT. Las filas con error se reportan sin detener la importación.
+    """
+    summary = UserImportSummary()
+    batches = iter_validated_batches(
+        file.file, import_format(file), UserCreate, settings.USER_IMPORT_BATCH_SIZE
+    )
+    for users_in, errors in batches:
+        duplicates = []
+        if users_in:
+            hashed_passwords = get_password_hashes(u.password for _, u in users_in)
+            duplicates = crud_user.create_batch(db, users_in, hashed_passwords)
+        add_import_batch(
+            summary,
+            rows=len(users_in) + len(errors),
+            created=len(users_in) - len(duplicates),
+            errors=errors + duplicates,
         )
+    return summary
 
-    # Crear usuario
-    user = crud_user.create(db, obj_in=user_in)
-    return user
+
+@router.post("/bulk/update", response_model=List[UserResponse])
+def bulk_update_users(
+    bulk_in: UserBulkUpdate,
+    db: Session = Depends(get_db),
+    # Solo superuser puede hacer cambios masivos
+    current_user: User = Security(get_authorized_superuser),
+) -> List[User]:
+    """
+    Cambiar rol y/o activar/desactivar varios usuarios en un solo UPDATE.
+    Retorna los usuarios actualizados (se ignoran ids inexistentes o eliminados).
+    """
+    values = bulk_update_values(bulk_in, current_user)
+    return crud_user.update_multi(db, ids=bulk_in.ids, values=values)
+
+
+@router.post("/bulk/delete", response_model=List[UserResponse])
+def bulk_delete_users(
+    bulk_in: UserBulkIds,
+    db: Session = Depends(get_db),
+    # Solo superuser puede eliminar
+    current_user: User = Security(get_authorized_superuser),
+) -> List[User]:
+    """
+    Eliminar varios usuarios (soft delete) en un solo UPDATE.
+    Retorna los usuarios eliminados.
+    """
+    require_not_self(bulk_in.ids, current_user)
+    return crud_user.soft_delete_multi(db, ids=bulk_in.ids)
 
 
 @router.put("/{user_id}", response_model=UserResponse)
@@ -101,7 +318,7 @@ def update_user(
     user_id: UUID,
     user_in: UserUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Security(get_current_active_user),
+    current_user: User = Security(get_authorized_user),
 ) -> User:
     """
     Actualizar usuario.
@@ -110,45 +327,18 @@ def update_user(
     """
     user = crud_user.get(db, id=user_id)
     if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Usuario no encontrado"
-        )
+        raise user_not_found()
+
+    require_self_or_admin(
+        user.id, current_user, "No tienes permisos para actualizar este usuario"
+    )
+    require_role_change_allowed(user, user_in, current_user)
 
-    # Verificar permisos
-    if user.id != current_user.id:
-        if current_user.role not in [UserRole.ADMIN.value, UserRole.SUPER_ADMIN.value]:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="No tienes permisos para actualizar este usuario",
-            )
-
-    # Si intenta cambiar el rol, solo superuser puede
-    if user_in.role and user_in.role != user.role:
-        if not current_user.is_superuser:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Solo super usuarios pueden cambiar roles",
-            )
-
-    # Verificar email único si se está cambiando
-    if user_in.email and user_in.email != user.email:
-        existing_user = crud_user.get_by_email(db, email=user_in.email)
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="El email ya está en uso",
-            )
-
-    # Verificar username único si se está cambiando
-    if user_in.username and user_in.username != user.username:
-        existing_user = crud_user.get_by_username(db, username=user_in.username)
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="El username ya está en uso",
-            )
-
-    user = crud_user.update(db, db_obj=user, obj_in=user_in)
+    # Email/username únicos: los valida la DB en el mismo UPDATE
+    try:
+        user = crud_user.update(db, db_obj=user, obj_in=user_in)
+    except DuplicateUserError as e:
+        raise duplicate_field(e) from e
     return user
 
 
@@ -157,7 +347,7 @@ def delete_user(
     user_id: UUID,
     db: Session = Depends(get_db),
     # Solo superuser puede eliminar
-    current_user: User = Security(get_current_superuser),
+    current_user: User = Security(get_authorized_superuser),
 ) -> User | None:
     """
     Eliminar usuario (soft delete).
@@ -165,16 +355,9 @@ def delete_user(
     """
     user = crud_user.get(db, id=user_id)
     if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Usuario no encontrado"
-        )
+        raise user_not_found()
 
-    # No permitir auto-eliminación
-    if user.id == current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No puedes eliminarte a ti mismo",
-        )
+    require_not_self([user.id], current_user)
 
     user = crud_user.soft_delete(db, id=user_id)
     return user
@@ -0,0 +1,368 @@
+from typing import List, Literal, Optional
+from uuid import UUID
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Query,
+    Request,
+    Response,
+    Security,
+    UploadFile,
+    status,
+)
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import iterate_in_threadpool
+
+from app.api.deps import (
+    get_authorized_superuser_async,
+    get_authorized_user_async,
+    get_current_active_user_async,
+)
+from app.api.v1.common import (
+    COUNT_QUERY,
+    FIELDS_QUERY,
+    SEARCH_MATCH_QUERY,
+    SEARCH_TEXT_QUERY,
+    add_import_batch,
+    bulk_update_values,
+    check_pagination,
+    check_search,
+    count_headers,
+    duplicate_field,
+    duplicate_user,
+    export_response,
+    import_format,
+    invalid_cursor,
+    page_response,
+    parse_user_fields,
+    require_not_self,
+    require_role_change_allowed,
+    require_self_or_admin,
+    row_columns,
+    row_response,
+    user_exporter,
+    user_not_found,
+    user_response,
+)
+from app.config import settings
+from app.core.exporters import aiter_export
+from app.core.importers import iter_validated_batches
+from app.core.pagination import InvalidCursorError
+from app.core.permissions import require_admin
+from app.core.replicas import read_from_primary
+from app.core.security import get_password_hashes_async
+from app.crud.async_user import user as crud_user
+from app.crud.base import CountMode
+from app.crud.user import DuplicateUserError, SearchMatch
+from app.crud.user import user as sync_crud_user
+from app.database import get_async_db
+from app.models.enums import UserRole
+from app.models.user import User
+from app.schemas.user import (
+    UserBulkIds,
+    UserBulkUpdate,
+    UserCreate,
+    UserImportSummary,
+    UserResponse,
+    UserUpdate,
+)
+
+# Versión async del router de users (ver `users.py`), activada con ASYNC_ROUTES
+router = APIRouter(dependencies=[Security(get_authorized_user_async)])
+
+
+@router.get("/", response_model=List[UserResponse], response_class=ORJSONResponse)
+async def list_users(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = FIELDS_QUERY,
+    count: Optional[CountMode] = COUNT_QUERY,
+) -> Response:
+    """
+    Listar todos los usuarios.
+    Solo usuarios activos pueden ver la lista.
+
+    Soporta dos modos de paginación:
+    - Cursor (recomendado): la primera página se pide sin `skip` ni `cursor`;
+      si hay más resultados, el cursor de la siguiente página se devuelve en
+      el header `X-Next-Cursor` y se envía como `?cursor=...`.
+    - Offset (compatibilidad): `?skip=N`. Se vuelve lento en páginas profundas.
+
+    Ruta rápida: se seleccionan solo las columnas de `UserResponse` como filas
+    de Core y se serializan con orjson, sin objetos ORM ni validación de
+    pydantic (los tipos ya los garantizan las columnas).
+
+    Con `?fields=id,username` la proyección se aplica en el SELECT y la
+    respuesta incluye solo esos campos.
+
+    La página lleva un ETag (ids y `updated_at` de sus filas); con un
+    `If-None-Match` que coincide responde 304: la consulta se hace igual,
+    pero se ahorra serializar y enviar el cuerpo.
+
+    Con `Accept: application/msgpack` responde en MessagePack (mismos
+    campos; UUID y fechas como texto).
+
+    Con `?count=exact|estimated` agrega el total de usuarios en
+    `X-Total-Count` y si es exacto o estimado en `X-Total-Count-Type`.
+    """
+    columns = parse_user_fields(fields)
+    check_pagination(skip, cursor)
+
+    try:
+        rows, next_cursor = await crud_user.get_page_rows(
+            db, [*columns, "updated_at"], cursor=cursor, skip=skip, limit=limit
+        )
+    except InvalidCursorError as e:
+        raise invalid_cursor(e) from e
+
+    headers = count_headers(*await crud_user.total_count(db, count)) if count else {}
+    return page_response(request, rows, columns, next_cursor, headers)
+
+
+@router.get("/search", response_model=List[UserResponse], response_class=ORJSONResponse)
+async def search_users(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    q: Optional[str] = SEARCH_TEXT_QUERY,
+    match: SearchMatch = SEARCH_MATCH_QUERY,
+    role: Optional[UserRole] = None,
+    is_active: Optional[bool] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = FIELDS_QUERY,
+) -> Response:
+    """
+    Buscar usuarios por texto, rol y/o estado, sin distinguir mayúsculas.
+    Pagina por cursor igual que el listado (`X-Next-Cursor`).
+
+    Tanto el prefijo como la subcadena se resuelven con índices sobre
+    lower() de cada columna (btree y trigramas en Postgres), así el costo
+    depende de los resultados y no del tamaño de la tabla.
+    """
+    columns = parse_user_fields(fields)
+    check_search(q, match)
+
+    try:
+        rows, next_cursor = await crud_user.search_rows(
+            db,
+            [*columns, "updated_at"],
+            q=q,
+            match=match,
+            role=role.value if role else None,
+            is_active=is_active,
+            cursor=cursor,
+            limit=limit,
+        )
+    except InvalidCursorError as e:
+        raise invalid_cursor(e) from e
+    return page_response(request, rows, columns, next_cursor)
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_users(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    format: Optional[Literal["ndjson", "csv", "msgpack"]] = None,
+    current_user: User = Security(get_authorized_user_async),
+) -> StreamingResponse:
+    """
+    Exportar todos los usuarios como NDJSON, CSV o MessagePack en streaming.
+    Solo admin/superuser pueden exportar.
+
+    Sin `format`, se usa MessagePack si el `Accept` lo pide y NDJSON si no.
+
+    Las filas se leen con un cursor del servidor y se envían por bloques,
+    así la memoria no crece con la tabla y el primer byte sale de inmediato.
+    """
+    require_admin(current_user.role, "No tienes permisos para exportar usuarios")
+
+    exporter = user_exporter(request, format)
+    users = crud_user.iter_all(db, batch_size=settings.USER_EXPORT_BATCH_SIZE)
+    return export_response(
+        aiter_export(users, exporter, settings.USER_EXPORT_CHUNK_SIZE), exporter
+    )
+
+
+# Después de editar su perfil, el usuario debe verlo sin esperar a la réplica
+@router.get("/me", response_model=UserResponse)
+@read_from_primary
+async def read_user_me(
+    request: Request,
+    current_user: User = Security(get_current_active_user_async),
+) -> Response:
+    """
+    Obtener información del usuario actual, en JSON o MessagePack.
+    Responde con ETag y honra `If-None-Match` (304).
+    """
+    return user_response(request, current_user)
+
+
+@router.get("/{user_id}", response_model=UserResponse, response_class=ORJSONResponse)
+async def read_user_by_id(
+    user_id: UUID,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Security(get_authorized_user_async),
+    fields: Optional[str] = FIELDS_QUERY,
+) -> Response:
+    """
+    Obtener usuario por ID.
+    Con `?fields=...` solo se seleccionan y devuelven esos campos.
+    Negocia JSON o MessagePack por `Accept`.
+    Responde con ETag y honra `If-None-Match` (304).
+    """
+    columns = parse_user_fields(fields)
+    row = await crud_user.get_row(db, id=user_id, columns=row_columns(columns))
+    if not row:
+        raise user_not_found()
+
+    # Solo el mismo usuario o admin/superuser pueden ver detalles
+    require_self_or_admin(
+        user_id, current_user, "No tienes permisos para ver este usuario"
+    )
+    return row_response(request, row, columns)
+
+
+@router.post(
+    "/create",
+    response_model=UserResponse,
+    status_code=status.HTTP_201_CREATED,
+    # Solo superuser puede crear
+    dependencies=[Security(get_authorized_superuser_async)],
+)
+async def create_user(
+    user_in: UserCreate,
+    db: AsyncSession = Depends(get_async_db),
+) -> User:
+    """
+    Crear nuevo usuario.
+    Solo super usuarios pueden crear usuarios.
+    """
+    # Crear usuario; la unicidad de email/username la valida la DB
+    try:
+        user = await crud_user.create(db, obj_in=user_in)
+    except DuplicateUserError as e:
+        raise duplicate_user(e) from e
+    return user
+
+
+@router.post(
+    "/import",
+    response_model=UserImportSummary,
+    # Solo superuser puede importar
+    dependencies=[Security(get_authorized_superuser_async)],
+)
+async def import_users(
+    file: UploadFile, db: AsyncSession = Depends(get_async_db)
+) -> UserImportSummary:
+    """
+    Importación masiva de usuarios desde un archivo CSV o NDJSON.
+    Ver `users.import_users`; el INSERT por lotes reutiliza el CRUD sync
+    a través de `AsyncSession.run_sync`. La lectura, el parseo y la
+    validación de cada lote corren en el threadpool, no en el event loop.
+    """
+    summary = UserImportSummary()
+    batches = iter_validated_batches(
+        file.file, import_format(file), UserCreate, settings.USER_IMPORT_BATCH_SIZE
+    )
+    async for users_in, errors in iterate_in_threadpool(batches):
+        duplicates = []
+        if users_in:
+            hashed_passwords = await get_password_hashes_async(
+                u.password for _, u in users_in
+            )
+            duplicates = await db.run_sync(
+                sync_crud_user.create_batch, users_in, hashed_passwords
+            )
+        add_import_batch(
+            summary,
+            rows=len(users_in) + len(errors),
+            created=len(users_in) - len(duplicates),
+            errors=errors + duplicates,
+        )
+    return summary
+
+
+@router.post("/bulk/update", response_model=List[UserResponse])
+async def bulk_update_users(
+    bulk_in: UserBulkUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    # Solo superuser puede hacer cambios masivos
+    current_user: User = Security(get_authorized_superuser_async),
+) -> List[User]:
+    """
+    Cambiar rol y/o activar/desactivar varios usuarios en un solo UPDATE.
+    Retorna los usuarios actualizados (se ignoran ids inexistentes o eliminados).
+    """
+    values = bulk_update_values(bulk_in, current_user)
+    return await crud_user.update_multi(db, ids=bulk_in.ids, values=values)
+
+
+@router.post("/bulk/delete", response_model=List[UserResponse])
+async def bulk_delete_users(
+    bulk_in: UserBulkIds,
+    db: AsyncSession = Depends(get_async_db),
+    # Solo superuser puede eliminar
+    current_user: User = Security(get_authorized_superuser_async),
+) -> List[User]:
+    """
+    Eliminar varios usuarios (soft delete) en un solo UPDATE.
+    Retorna los usuarios eliminados.
+    """
+    require_not_self(bulk_in.ids, current_user)
+    return await crud_user.soft_delete_multi(db, ids=bulk_in.ids)
+
+
+@router.put("/{user_id}", response_model=UserResponse)
+async def update_user(
+    user_id: UUID,
+    user_in: UserUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Security(get_authorized_user_async),
+) -> User:
+    """
+    Actualizar usuario.
+    Los usuarios pueden actualizarse a sí mismos.
+    Solo admin/superuser pueden actualizar a otros.
+    """
+    user = await crud_user.get(db, id=user_id)
+    if not user:
+        raise user_not_found()
+
+    require_self_or_admin(
+        user.id, current_user, "No tienes permisos para actualizar este usuario"
+    )
+    require_role_change_allowed(user, user_in, current_user)
+
+    # Email/username únicos: los valida la DB en el mismo UPDATE
+    try:
+        user = await crud_user.update(db, db_obj=user, obj_in=user_in)
+    except DuplicateUserError as e:
+        raise duplicate_field(e) from e
+    return user
+
+
+@router.delete("/{user_id}", response_model=UserResponse)
+async def delete_user(
+    user_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    # Solo superuser puede eliminar
+    current_user: User = Security(get_authorized_superuser_async),
+) -> User | None:
+    """
+    Eliminar usuario (soft delete).
+    Solo super usuarios pueden eliminar usuarios.
+    """
+    user = await crud_user.get(db, id=user_id)
+    if not user:
+        raise user_not_found()
+
+    require_not_self([user.id], current_user)
+
+    user = await crud_user.soft_delete(db, id=user_id)
+    return user
@@ -1,15 +1,105 @@
+from functools import lru_cache
+from typing import Any, Literal, cast
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
+    # Opcional: por defecto se deriva de DATABASE_URL (asyncpg / aiosqlite)
+    ASYNC_DATABASE_URL: str | None = None
+    # Réplicas de lectura, como lista JSON (ej. '["postgresql://r1/db"]').
+    # Las lecturas van a una réplica en round-robin; las escrituras y lo que
+    # la petición lee después de escribir, al primario. Una réplica que no
+    # responde queda fuera de la rotación DATABASE_REPLICA_EJECT_SECONDS
+    DATABASE_REPLICA_URLS: list[str] = []
+    DATABASE_REPLICA_EJECT_SECONDS: float = 30
 
     # Security
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # Throttling de /auth/login, antes de Argon2: token bucket por IP y por
+    # username (intentos por minuto y ráfaga) y tope de verificaciones en
+    # curso en este worker
+    LOGIN_THROTTLE_ENABLED: bool = True
+    LOGIN_IP_RATE_PER_MINUTE: float = 30
+    LOGIN_IP_BURST: int = 60
+    LOGIN_USERNAME_RATE_PER_MINUTE: float = 5
+    LOGIN_USERNAME_BURST: int = 10
+    LOGIN_MAX_CONCURRENT_VERIFICATIONS: int = 16
+
+    # Refresh tokens: vigencia (se renueva en cada rotación) y purga periódica
+    # de expirados por lotes. Intervalo 0 desactiva la purga en este worker.
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    REFRESH_TOKEN_PURGE_INTERVAL_SECONDS: int = 3600
+    REFRESH_TOKEN_PURGE_BATCH_SIZE: int = 1000
+
+    # Pool dedicado para Argon2 (hash/verify).
+    # Workers: None usa min(4, núcleos). Cola: tareas en espera antes de 503.
+    PASSWORD_HASH_WORKERS: int | None = None
+    PASSWORD_HASH_QUEUE_SIZE: int = 64
+    # Hashes en curso de un lote (importación masiva); None usa la mitad de
+    # los workers, así el login siempre tiene lugar en el pool
+    PASSWORD_HASH_BATCH_IN_FLIGHT: int | None = None
+
+    # Costo de Argon2id (por defecto, los de passlib). Calibrar con
+    # `python -m benchmarks.calibrate_argon2`; al cambiarlos, cada hash se
+    # actualiza en el siguiente login exitoso del usuario
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536  # KiB
+    ARGON2_PARALLELISM: int = 4
+
+    # Importación masiva de usuarios
+    USER_IMPORT_BATCH_SIZE: int = 500
+    USER_IMPORT_MAX_ERRORS: int = 1000
+
+    # Exportación de usuarios: filas por fetch del cursor / por bloque enviado
+    USER_EXPORT_BATCH_SIZE: int = 1000
+    USER_EXPORT_CHUNK_SIZE: int = 200
+
+    # Compresión de respuestas con br o gzip según Accept-Encoding, a partir
+    # de este tamaño en bytes (0 la desactiva). Niveles moderados: cada
+    # respuesta se comprime al vuelo
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+
+    # X-Total-Count en listados (`?count=exact|estimated`). El conteo exacto
+    # se cachea unos segundos; con `estimated`, si la tabla supera el umbral
+    # se usa la estimación del planner en lugar de COUNT(*)
+    COUNT_CACHE_TTL_SECONDS: int = 5
+    COUNT_ESTIMATE_THRESHOLD: int = 100_000
+
+    # Cache de usuarios autenticados (0 desactiva el cache)
+    USER_CACHE_TTL_SECONDS: int = 30
+    USER_CACHE_MAX_SIZE: int = 10_000
+
+    # Auth stateless: el token lleva role/is_superuser/token_version y las
+    # rutas que solo necesitan autorizar no consultan la DB
+    STATELESS_AUTH: bool = False
+    # Cada cuántos segundos se reintenta cargar de la DB las versiones de
+    # tokens (al arrancar o después de un reset del bus); mientras no están
+    # cargadas, la autorización consulta la DB
+    TOKEN_VERSIONS_SYNC_SECONDS: float = 1.0
+
+    # Invalidación de caches entre workers: cada cambio de un usuario se
+    # publica y todos los workers lo sacan de sus caches. "local" llega solo
+    # a este proceso (un worker); "postgres" usa LISTEN/NOTIFY en el canal
+    # CACHE_INVALIDATION_CHANNEL de DATABASE_URL (requiere psycopg2)
+    CACHE_INVALIDATION_BACKEND: Literal["local", "postgres"] = "local"
+    CACHE_INVALIDATION_CHANNEL: str = "optikt_cache_invalidation"
+    # Eventos en espera mientras no hay conexión; si se llena, se descartan
+    # y todos los workers vacían sus caches al reconectar
+    CACHE_INVALIDATION_OUTBOX_SIZE: int = 10_000
+
+    # Cache de access tokens ya verificados; cada entrada vence como
+    # máximo con el `exp` del token (0 desactiva el cache)
+    TOKEN_CACHE_TTL_SECONDS: int = 1800
+    TOKEN_CACHE_MAX_SIZE: int = 50_000
+
     # App
     PROJECT_NAME: str = "Optikt API"
     VERSION: str = "1.0.0"
@@ -17,10 +107,50 @@ class Settings(BaseSettings):
 
     DEBUG: bool = False
 
+    # Sirve los routers de auth y users con AsyncSession en lugar de Session
+    ASYNC_ROUTES: bool = False
+
+    # Métricas en formato Prometheus en /metrics (conteo/latencia por ruta,
+    # pool de conexiones y tiempos de Argon2)
+    METRICS_ENABLED: bool = True
+
+    # Estadísticas de SQL por petición (conteo, tiempo en DB, más lentas).
+    # Con DEBUG van en headers X-DB-*; siempre se loguean las peticiones que
+    # superan SLOW_REQUEST_MS o SLOW_REQUEST_MAX_QUERIES, o que repiten una
+    # sentencia QUERY_REPEAT_THRESHOLD veces o más (posible N+1)
+    QUERY_STATS_ENABLED: bool = True
+    QUERY_STATS_SLOWEST: int = 3
+    SLOW_REQUEST_MS: int = 500
+    SLOW_REQUEST_MAX_QUERIES: int = 20
+    QUERY_REPEAT_THRESHOLD: int = 5
+
     model_config = SettingsConfigDict(
         env_file=".env",
         case_sensitive=True,
     )
 
 
-settings = Settings()  # pyright: ignore
+@lru_cache
+def get_settings() -> Settings:
+    """Lee la configuración (entorno y .env) la primera vez que se pide"""
+    return Settings()  # pyright: ignore
+
+
+class _LazySettings:
+    """
+    Delega en `get_settings()`: importar un módulo que usa `settings` (ej.
+    los modelos, para alembic o scripts) no exige el entorno, solo leer un
+    valor. Los tests pueden reemplazar valores con `monkeypatch.setattr`.
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(get_settings(), name, value)
+
+    def __delattr__(self, name: str) -> None:
+        delattr(get_settings(), name)
+
+
+settings = cast(Settings, _LazySettings())
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, TypeVar
+from uuid import UUID
+
+from app.config import settings
+from app.core.invalidation import USER, InvalidationEvent, invalidation_bus
+from app.models.user import User
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Cache en memoria acotado (LRU) con expiración por TTL.
+    Es thread-safe: los endpoints sync corren en el threadpool de Starlette.
+    Con `ttl <= 0` o `maxsize <= 0` queda desactivado.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.maxsize > 0
+
+    def get(self, key: K) -> Optional[V]:
+        """Retorna el valor si existe y no expiró"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: K, value: V, ttl: Optional[float] = None) -> None:
+        """Guarda un valor; `ttl` permite acortar la expiración de esta entrada"""
+        if not self.enabled:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: K) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+
+# Usuarios autenticados resueltos en get_current_user, por id
+user_cache: TTLCache[UUID, User] = TTLCache(
+    "users",
+    maxsize=settings.USER_CACHE_MAX_SIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+)
+
+
+def _evict_user(event: InvalidationEvent) -> None:
+    user_cache.invalidate(UUID(event.id))
+
+
+# Cualquier worker que modifique un usuario lo saca del cache de todos
+invalidation_bus.subscribe(USER, _evict_user, on_reset=user_cache.clear)
+
+
+# Conteos exactos de listados (`X-Total-Count`), por (tabla, include_deleted)
+count_cache: TTLCache[tuple[str, bool], int] = TTLCache(
+    "counts", maxsize=256, ttl=settings.COUNT_CACHE_TTL_SECONDS
+)
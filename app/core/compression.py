@@ -0,0 +1,75 @@
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.negotiation import parse_qualities
+
+
+class BrotliResponder(IdentityResponder):
+    """Equivalente br del `GZipResponder` de Starlette"""
+
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        compressed: bytes = self.compressor.process(body)
+        # En streaming se vacía el buffer por bloque para no retener datos
+        tail: bytes = self.compressor.flush() if more_body else self.compressor.finish()
+        return compressed + tail
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI que comprime con br o gzip según `Accept-Encoding` (a
+    igual preferencia, br), solo respuestas de `minimum_size` bytes o más.
+
+    Al comprimir, el ETag fuerte pasa a débil (`W/"..."`): los bytes
+    difieren de los de la versión sin comprimir, pero la representación es
+    la misma y `If-None-Match` la sigue reconociendo.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        qualities = parse_qualities(Headers(scope=scope).get("accept-encoding", ""))
+        br_q, gzip_q = qualities.get("br", 0.0), qualities.get("gzip", 0.0)
+        responder: ASGIApp
+        if br_q > 0 and br_q >= gzip_q:
+            responder = BrotliResponder(
+                self.app, self.minimum_size, self.brotli_quality
+            )
+        elif gzip_q > 0:
+            responder = GZipResponder(
+                self.app, self.minimum_size, compresslevel=self.gzip_level
+            )
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_weak_etag(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                etag = headers.get("etag")
+                if etag and "content-encoding" in headers and etag[:2] != "W/":
+                    headers["ETag"] = f"W/{etag}"
+            await send(message)
+
+        await responder(scope, receive, send_with_weak_etag)
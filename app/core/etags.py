@@ -0,0 +1,60 @@
+import hashlib
+from datetime import datetime
+from typing import Any, Iterable, Optional
+from uuid import UUID
+
+from fastapi import Request, Response, status
+
+# Respuestas autenticadas: solo el navegador del usuario las guarda, y
+# siempre revalida con If-None-Match antes de reutilizarlas
+CACHE_CONTROL = "private, no-cache"
+
+
+def _digest(parts: Iterable[Any]) -> str:
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(str(part).encode())
+        hasher.update(b"\x1f")
+    return f'"{hasher.hexdigest()[:32]}"'
+
+
+def entity_etag(id: UUID, updated_at: datetime, *variant: Any) -> str:
+    """
+    ETag fuerte de un registro: cambia con cada UPDATE (`updated_at`).
+    `variant` distingue representaciones del mismo registro (ej. `fields`).
+    """
+    return _digest([id, updated_at.isoformat(), *variant])
+
+
+def collection_etag(items: Iterable[tuple[UUID, datetime]], *variant: Any) -> str:
+    """ETag de una página: cambia si entra, sale o se modifica algún registro"""
+    return _digest(
+        [*variant, *(f"{id}@{updated_at.isoformat()}" for id, updated_at in items)]
+    )
+
+
+def if_none_match(request: Request, etag: str) -> bool:
+    """
+    True si el cliente ya tiene esta versión (comparación débil, como pide
+    RFC 9110 para If-None-Match).
+    """
+    header: Optional[str] = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = (tag.strip().removeprefix("W/") for tag in header.split(","))
+    return etag in candidates
+
+
+def not_modified(etag: str, headers: Optional[dict[str, str]] = None) -> Response:
+    """304 sin cuerpo, con los mismos headers que tendría el 200"""
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={**(headers or {}), "ETag": etag, "Cache-Control": CACHE_CONTROL},
+    )
+
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
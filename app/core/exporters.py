@@ -0,0 +1,91 @@
+import csv
+import io
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Iterable,
+    Iterator,
+    List,
+    Type,
+    Union,
+)
+
+from pydantic import BaseModel
+
+from app.core.negotiation import MSGPACK_MEDIA_TYPE, packb
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    # Secuencia de mapas MessagePack, uno por registro (msgpack.Unpacker)
+    "msgpack": MSGPACK_MEDIA_TYPE,
+}
+
+Chunk = Union[str, bytes]
+
+
+class Exporter:
+    """Serializa registros (ORM o dicts) a NDJSON, CSV o MessagePack con un schema"""
+
+    def __init__(self, schema: Type[BaseModel], format: str):
+        self.schema = schema
+        self.format = format
+        self.media_type = EXPORT_MEDIA_TYPES[format]
+        self.fields = list(schema.model_fields)
+
+    def header(self) -> str:
+        if self.format != "csv":
+            return ""
+        return self._csv_rows([self.fields])
+
+    def encode(self, items: Iterable[Any]) -> Chunk:
+        """Serializa un bloque de registros, una línea (o mapa) por registro"""
+        validated = (self.schema.model_validate(item) for item in items)
+        if self.format == "ndjson":
+            return "".join(f"{item.model_dump_json()}\n" for item in validated)
+        if self.format == "msgpack":
+            return b"".join(packb(item.model_dump()) for item in validated)
+        return self._csv_rows(
+            [item.model_dump(mode="json")[f] for f in self.fields] for item in validated
+        )
+
+    @staticmethod
+    def _csv_rows(rows: Iterable[Iterable[Any]]) -> str:
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(rows)
+        return buffer.getvalue()
+
+
+def iter_export(
+    items: Iterable[Any], exporter: Exporter, chunk_size: int
+) -> Iterator[Chunk]:
+    """Genera el archivo en bloques de `chunk_size` registros"""
+    header = exporter.header()
+    if header:
+        yield header
+    chunk: List[Any] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield exporter.encode(chunk)
+            chunk = []
+    if chunk:
+        yield exporter.encode(chunk)
+
+
+async def aiter_export(
+    items: AsyncIterable[Any], exporter: Exporter, chunk_size: int
+) -> AsyncIterator[Chunk]:
+    """Versión async de `iter_export`"""
+    header = exporter.header()
+    if header:
+        yield header
+    chunk: List[Any] = []
+    async for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield exporter.encode(chunk)
+            chunk = []
+    if chunk:
+        yield exporter.encode(chunk)
@@ -0,0 +1,22 @@
+from typing import List, Optional, Sequence
+
+
+class InvalidFieldsError(ValueError):
+    """Se pidieron campos que el recurso no expone"""
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> List[str]:
+    """
+    Parsea el parámetro `fields=a,b,c` (sparse fieldsets).
+    Sin valor retorna todos los campos permitidos; mantiene el orden pedido.
+    """
+    if not fields:
+        return list(allowed)
+
+    requested = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise InvalidFieldsError(f"Campos desconocidos: {', '.join(unknown)}")
+    if not requested:
+        raise InvalidFieldsError("Se debe indicar al menos un campo")
+    return requested
@@ -0,0 +1,109 @@
+import codecs
+import csv
+import json
+from typing import IO, Any, Iterable, Iterator, List, Optional, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+SchemaType = TypeVar("SchemaType", bound=BaseModel)
+
+# Error por fila: (número de fila, mensaje)
+RowError = tuple[int, str]
+
+
+class UnsupportedFormatError(ValueError):
+    """El archivo no es CSV ni NDJSON"""
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> str:
+    """Determina el formato ("csv" o "ndjson") por extensión o content type"""
+    name = (filename or "").lower()
+    ctype = (content_type or "").lower()
+    if name.endswith(".csv") or "csv" in ctype:
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in ctype:
+        return "ndjson"
+    raise UnsupportedFormatError("Formato no soportado, usa CSV o NDJSON")
+
+
+def _iter_records(
+    file: IO[bytes], format: str
+) -> Iterator[tuple[int, dict[str, Any] | str]]:
+    """
+    Lee el archivo registro por registro, sin cargarlo completo en memoria.
+    Retorna (fila, datos) o (fila, mensaje de error) si la fila no se pudo leer.
+    """
+    # Línea por línea, sin traducir los fin de línea (como newline=""). No
+    # se usa io.TextIOWrapper: en 3.10 SpooledTemporaryFile (el archivo de
+    # UploadFile) no tiene readable() y el wrapper falla
+    text = codecs.iterdecode(file, "utf-8-sig")
+    records = _iter_csv(text) if format == "csv" else _iter_ndjson(text)
+    row = 0
+    while True:
+        # Un archivo que no es UTF-8 o un CSV mal formado no se puede seguir
+        # leyendo: se reporta como error de la fila y termina la importación
+        try:
+            row, record = next(records)
+        except StopIteration:
+            return
+        except UnicodeDecodeError:
+            yield row + 1, "El archivo no está codificado en UTF-8"
+            return
+        except csv.Error as e:
+            yield row + 1, f"CSV inválido: {e}"
+            return
+        yield row, record
+
+
+def _iter_csv(text: Iterable[str]) -> Iterator[tuple[int, dict[str, Any] | str]]:
+    for row, record in enumerate(csv.DictReader(text), start=1):
+        # Celdas vacías -> se usan los valores por defecto del schema
+        yield row, {k: v for k, v in record.items() if k and v not in ("", None)}
+
+
+def _iter_ndjson(text: Iterable[str]) -> Iterator[tuple[int, dict[str, Any] | str]]:
+    row = 0
+    for line in text:
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            yield row, "JSON inválido"
+            continue
+        if not isinstance(record, dict):
+            yield row, "Se esperaba un objeto JSON"
+            continue
+        yield row, record
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}"
+        for err in error.errors()
+    )
+
+
+def iter_validated_batches(
+    file: IO[bytes], format: str, schema: Type[SchemaType], batch_size: int
+) -> Iterator[tuple[List[tuple[int, SchemaType]], List[RowError]]]:
+    """
+    Parsea y valida el archivo en streaming, agrupando en lotes de
+    `batch_size` registros válidos junto con los errores de ese tramo.
+    """
+    valid: List[tuple[int, SchemaType]] = []
+    errors: List[RowError] = []
+    for row, record in _iter_records(file, format):
+        if isinstance(record, str):
+            errors.append((row, record))
+            continue
+        try:
+            valid.append((row, schema.model_validate(record)))
+        except ValidationError as e:
+            errors.append((row, _format_validation_error(e)))
+        if len(valid) >= batch_size:
+            yield valid, errors
+            valid, errors = [], []
+    if valid or errors:
+        yield valid, errors
@@ -0,0 +1,298 @@
+import logging
+import os
+import re
+import select
+import threading
+from collections import defaultdict, deque
+from typing import Any, Callable, NamedTuple, Optional, Protocol
+from uuid import uuid4
+
+import orjson
+from sqlalchemy import Engine
+
+from app.core.metrics import cache_invalidations_total
+
+logger = logging.getLogger(__name__)
+
+# Entidad de los eventos de usuarios (cache de usuarios y versión de tokens)
+USER = "user"
+
+# Mensaje del backend (no es un evento): los receptores vacían sus caches
+RESET_PAYLOAD = "reset"
+
+
+class InvalidationEvent(NamedTuple):
+    """
+    Un registro cambió: `entity` e `id` lo identifican y `version` es su
+    versión de tokens después del cambio (ver `TokenVersions`).
+    """
+
+    entity: str
+    id: str
+    version: int
+
+
+EventHandler = Callable[[InvalidationEvent], None]
+
+
+class InvalidationBackend(Protocol):
+    """
+    Transporte de eventos entre workers. `publish` no debe bloquear: se
+    llama después de cada escritura, también desde el event loop.
+    """
+
+    def start(
+        self, on_message: Callable[[str], None], on_reset: Callable[[], None]
+    ) -> None:
+        """
+        Empieza a entregar los mensajes publicados a `on_message`. Si pudo
+        perder mensajes (ej. se cayó la conexión) llama a `on_reset`.
+        """
+        ...
+
+    def publish(self, payload: str) -> None: ...
+
+    def stop(self) -> None: ...
+
+
+class LocalInvalidationBackend:
+    """
+    Entrega los mensajes en el mismo proceso, a cada bus conectado. Alcanza
+    con un solo worker; en tests, dos buses sobre el mismo backend hacen de
+    dos workers.
+    """
+
+    def __init__(self) -> None:
+        self._handlers: list[Callable[[str], None]] = []
+
+    def start(
+        self, on_message: Callable[[str], None], on_reset: Callable[[], None]
+    ) -> None:
+        if on_message not in self._handlers:
+            self._handlers.append(on_message)
+
+    def publish(self, payload: str) -> None:
+        for handler in list(self._handlers):
+            handler(payload)
+
+    def stop(self) -> None:
+        self._handlers.clear()
+
+
+class PostgresInvalidationBackend:
+    """
+    LISTEN/NOTIFY de Postgres sobre una conexión dedicada (psycopg2).
+
+    Un thread escucha el canal y también envía los NOTIFY encolados por
+    `publish`, así publicar no hace I/O en la petición. Si la conexión se
+    cae, reconecta y llama a `on_reset`: los eventos de ese intervalo se
+    perdieron. Los mensajes encolados se envían al reconectar; si la cola
+    supera `outbox_size` se descarta y en su lugar se envía un reset, que
+    hace vaciar los caches a todos los workers.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        channel: str,
+        reconnect_seconds: float = 1.0,
+        outbox_size: int = 10_000,
+    ) -> None:
+        if engine.dialect.name != "postgresql" or engine.dialect.driver != "psycopg2":
+            raise ValueError("LISTEN/NOTIFY requiere PostgreSQL con psycopg2")
+        if not re.fullmatch(r"[a-z_][a-z0-9_]*", channel):
+            raise ValueError(f"Nombre de canal inválido: {channel!r}")
+        self.engine = engine
+        self.channel = channel
+        self.reconnect_seconds = reconnect_seconds
+        self.outbox_size = outbox_size
+        self._outbox: deque[str] = deque()
+        self._outbox_lock = threading.Lock()
+        # Cambia cada vez que `publish` vacía la cola llena
+        self._outbox_generation = 0
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Pipe para despertar al thread (bloqueado en select) al publicar;
+        # se crea en `start` y se cierra en `stop`
+        self._wakeup_r: Optional[int] = None
+        self._wakeup_w: Optional[int] = None
+
+    def start(
+        self, on_message: Callable[[str], None], on_reset: Callable[[], None]
+    ) -> None:
+        self._stopping.clear()
+        wakeup_r, self._wakeup_w = os.pipe()
+        self._wakeup_r = wakeup_r
+        # Con el pipe lleno el thread ya tiene algo que leer: publicar no espera
+        os.set_blocking(self._wakeup_w, False)
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(on_message, on_reset, wakeup_r),
+            name="cache-invalidation",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def publish(self, payload: str) -> None:
+        with self._outbox_lock:
+            if len(self._outbox) >= self.outbox_size:
+                logger.warning(
+                    "Cola de invalidación llena (%d): se envía un reset",
+                    self.outbox_size,
+                )
+                self._outbox.clear()
+                self._outbox_generation += 1
+                payload = RESET_PAYLOAD
+            self._outbox.append(payload)
+        self._wake()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wake()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for fd in (self._wakeup_r, self._wakeup_w):
+            if fd is not None:
+                os.close(fd)
+        self._wakeup_r = self._wakeup_w = None
+
+    def _wake(self) -> None:
+        if self._wakeup_w is None:
+            return
+        try:
+            os.write(self._wakeup_w, b"\0")
+        except BlockingIOError:
+            pass
+
+    def _run(
+        self,
+        on_message: Callable[[str], None],
+        on_reset: Callable[[], None],
+        wakeup_r: int,
+    ) -> None:
+        connected_once = False
+        while not self._stopping.is_set():
+            try:
+                self._listen(on_message, on_reset, wakeup_r, connected_once)
+            except Exception:
+                logger.exception("Se perdió la conexión de invalidación de caches")
+                connected_once = True
+                self._stopping.wait(self.reconnect_seconds)
+
+    def _listen(
+        self,
+        on_message: Callable[[str], None],
+        on_reset: Callable[[], None],
+        wakeup_r: int,
+        reconnected: bool,
+    ) -> None:
+        # Fuera del pool: la conexión queda tomada mientras viva el thread
+        raw = self.engine.raw_connection()
+        raw.detach()
+        conn: Any = raw.driver_connection
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.channel}")
+            if reconnected:
+                on_reset()
+            while not self._stopping.is_set():
+                readable, _, _ = select.select([conn, wakeup_r], [], [], 5.0)
+                if wakeup_r in readable:
+                    os.read(wakeup_r, 4096)
+                self._send_outbox(conn)
+                conn.poll()
+                while conn.notifies:
+                    payload = conn.notifies.pop(0).payload
+                    if payload == RESET_PAYLOAD:
+                        on_reset()
+                    else:
+                        on_message(payload)
+        finally:
+            raw.close()
+
+    def _send_outbox(self, conn: Any) -> None:
+        # Se saca de la cola después de enviar: si falla, se reintenta
+        with conn.cursor() as cursor:
+            while True:
+                with self._outbox_lock:
+                    if not self._outbox:
+                        return
+                    payload = self._outbox[0]
+                    generation = self._outbox_generation
+                cursor.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+                with self._outbox_lock:
+                    # `publish` pudo vaciar la cola (llena) mientras tanto
+                    if self._outbox_generation == generation:
+                        self._outbox.popleft()
+
+
+class InvalidationBus:
+    """
+    Eventos de invalidación de caches entre workers.
+
+    `publish` aplica el evento en este worker (de forma síncrona) y lo envía
+    por el backend al resto; cada worker lo entrega a los handlers
+    suscritos a esa entidad. Los eventos propios que vuelven por el backend
+    se descartan por `origin`.
+    """
+
+    def __init__(self, backend: InvalidationBackend):
+        self.backend = backend
+        self.origin = uuid4().hex
+        self._handlers: defaultdict[str, list[EventHandler]] = defaultdict(list)
+        self._resets: list[Callable[[], None]] = []
+
+    def subscribe(
+        self,
+        entity: str,
+        handler: EventHandler,
+        on_reset: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """
+        `handler` recibe los eventos de `entity`; `on_reset` se llama si se
+        pudieron perder eventos (debería vaciar el cache).
+        """
+        self._handlers[entity].append(handler)
+        if on_reset is not None:
+            self._resets.append(on_reset)
+
+    def publish(self, entity: str, id: Any, version: int = 0) -> None:
+        event = InvalidationEvent(entity, str(id), version)
+        self._dispatch(event, "local")
+        payload = {**event._asdict(), "origin": self.origin}
+        self.backend.publish(orjson.dumps(payload).decode())
+
+    def start(self) -> None:
+        self.backend.start(self._receive, self._reset)
+
+    def stop(self) -> None:
+        self.backend.stop()
+
+    def _receive(self, payload: str) -> None:
+        try:
+            data = orjson.loads(payload)
+            if data["origin"] == self.origin:
+                return
+            event = InvalidationEvent(data["entity"], data["id"], int(data["version"]))
+        except (orjson.JSONDecodeError, KeyError, TypeError, ValueError):
+            logger.warning("Evento de invalidación inválido: %r", payload)
+            return
+        self._dispatch(event, "remote")
+
+    def _dispatch(self, event: InvalidationEvent, source: str) -> None:
+        cache_invalidations_total.inc(event.entity, source)
+        for handler in self._handlers.get(event.entity, ()):
+            try:
+                handler(event)
+            except Exception:
+                logger.exception("Falló un handler de invalidación: %r", event)
+
+    def _reset(self) -> None:
+        for reset in self._resets:
+            reset()
+
+
+# Con CACHE_INVALIDATION_BACKEND=postgres el lifespan cambia el backend
+invalidation_bus = InvalidationBus(LocalInvalidationBackend())
@@ -0,0 +1,279 @@
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Iterator, List, Sequence
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+Labels = tuple[str, ...]
+
+# Exposición en formato texto de Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return f"{{{pairs}}}"
+
+
+class _ShardedMetric(ABC):
+    """
+    Base para métricas sin lock en el camino caliente.
+
+    Cada hilo escribe en su propio shard (un dict por hilo, vía
+    `threading.local`); el lock solo se toma la primera vez que un hilo
+    registra su shard. Al exponer se suman todos los shards, así que una
+    lectura concurrente puede quedar una observación atrás, nunca corrupta.
+    Los shards de hilos terminados se suman a `_base` y se descartan, así
+    su cantidad no crece con cada hilo que alguna vez observó.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[tuple[threading.Thread, dict[Labels, List[float]]]] = []
+        self._base: dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def _shard(self) -> dict[Labels, List[float]]:
+        shard: dict[Labels, List[float]] | None = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            with self._lock:
+                self._prune()
+                self._shards.append((threading.current_thread(), shard))
+            self._local.shard = shard
+        return shard
+
+    def _prune(self) -> None:
+        # Con el lock tomado. Un hilo terminado ya no escribe en su shard
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+                continue
+            for labels, values in shard.items():
+                total = self._base.setdefault(labels, [0.0] * len(values))
+                for i, value in enumerate(values):
+                    total[i] += value
+        self._shards = alive
+
+    def _merged(self, width: int) -> dict[Labels, List[float]]:
+        with self._lock:
+            self._prune()
+            base = {labels: list(values) for labels, values in self._base.items()}
+            shards = [base, *(shard for _, shard in self._shards)]
+        merged: dict[Labels, List[float]] = {}
+        for shard in shards:
+            # dict(shard) copia en C sin soltar el GIL: no falla si el hilo
+            # dueño agrega una serie mientras tanto
+            for labels, values in dict(shard).items():
+                total = merged.setdefault(labels, [0.0] * width)
+                for i, value in enumerate(values):
+                    total[i] += value
+        return merged
+
+    def clear(self) -> None:
+        with self._lock:
+            self._base.clear()
+            for _, shard in self._shards:
+                shard.clear()
+
+    @abstractmethod
+    def collect(self) -> Iterator[str]: ...
+
+
+class Counter(_ShardedMetric):
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        shard = self._shard()
+        series = shard.get(labels)
+        if series is None:
+            series = shard[labels] = [0.0]
+        series[0] += amount
+
+    def collect(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for labels, (value,) in sorted(self._merged(1).items()):
+            yield (
+                f"{self.name}{_format_labels(self.labelnames, labels)} "
+                f"{_format_value(value)}"
+            )
+
+
+class Histogram(_ShardedMetric):
+    """
+    Histograma con buckets fijos. Por serie guarda el conteo de cada bucket
+    (no acumulado, más el de +Inf) y la suma; se acumula al exponer.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        shard = self._shard()
+        series = shard.get(labels)
+        if series is None:
+            series = shard[labels] = [0.0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def collect(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        bucket_names = (*self.labelnames, "le")
+        bounds = [*map(_format_value, self.buckets), "+Inf"]
+        for labels, series in sorted(self._merged(len(self.buckets) + 2).items()):
+            cumulative = 0.0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                bucket_labels = _format_labels(bucket_names, (*labels, bound))
+                yield f"{self.name}_bucket{bucket_labels} {_format_value(cumulative)}"
+            label_str = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_str} {_format_value(series[-1])}"
+            yield f"{self.name}_count{label_str} {_format_value(cumulative)}"
+
+
+class Gauge:
+    """Gauge cuyo valor se lee de `callback` al momento de exponer"""
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def collect(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} gauge"
+        yield f"{self.name} {_format_value(float(self.callback()))}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | Histogram | Gauge] = {}
+
+    def register(self, metric: Counter | Histogram | Gauge) -> None:
+        self._metrics[metric.name] = metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self.register(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.register(metric)
+        return metric
+
+    def gauge(
+        self, name: str, documentation: str, callback: Callable[[], float]
+    ) -> Gauge:
+        metric = Gauge(name, documentation, callback)
+        self.register(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests_total = registry.counter(
+    "http_requests_total",
+    "Peticiones HTTP atendidas",
+    ("method", "route", "status"),
+)
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds",
+    "Latencia de las peticiones HTTP, hasta enviar el último byte",
+    ("method", "route"),
+)
+password_hash_duration_seconds = registry.histogram(
+    "password_hash_duration_seconds",
+    "Tiempo de CPU de Argon2 por operación, sin la espera en la cola del pool",
+    ("operation",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+cache_invalidations_total = registry.counter(
+    "cache_invalidations_total",
+    "Eventos de invalidación de caches aplicados (local: de este worker)",
+    ("entity", "source"),
+)
+db_pool_wait_seconds = registry.histogram(
+    "db_pool_wait_seconds",
+    "Espera por una conexión libre del pool de SQLAlchemy",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que registra conteo y latencia por ruta.
+
+    La ruta es la plantilla (`/api/v1/users/{user_id}`), no el path real,
+    para que la cantidad de series no crezca con los ids.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            http_request_duration_seconds.observe(
+                time.perf_counter() - start, method, route_path
+            )
+            http_requests_total.inc(method, route_path, str(status_code))
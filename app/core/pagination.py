@@ -0,0 +1,24 @@
+import base64
+import json
+from datetime import datetime
+from uuid import UUID
+
+
+class InvalidCursorError(ValueError):
+    """El cursor recibido no se pudo decodificar"""
+
+
+def encode_cursor(created_at: datetime, id: UUID) -> str:
+    """Codifica la posición (created_at, id) en un cursor opaco"""
+    raw = json.dumps([created_at.isoformat(), str(id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    """Decodifica un cursor opaco a la posición (created_at, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), UUID(id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Cursor inválido") from e
@@ -0,0 +1,169 @@
+import heapq
+import json
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, List, Optional
+
+from sqlalchemy import Engine, event
+from sqlalchemy.engine.interfaces import DBAPICursor, ExecutionContext
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """Sentencias SQL ejecutadas durante una petición"""
+
+    def __init__(self, keep_slowest: int = 3):
+        self.count = 0
+        self.seconds = 0.0
+        self.keep_slowest = keep_slowest
+        # Min-heap de (duración, sentencia) con las `keep_slowest` más lentas
+        self._slowest: List[tuple[float, str]] = []
+        self.statements: Counter[str] = Counter()
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+        if len(self._slowest) < self.keep_slowest:
+            heapq.heappush(self._slowest, (seconds, statement))
+        elif self._slowest and seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, (seconds, statement))
+
+    @property
+    def slowest(self) -> List[tuple[float, str]]:
+        return sorted(self._slowest, reverse=True)
+
+    def repeated(self, threshold: int) -> List[tuple[str, int]]:
+        """Sentencias ejecutadas `threshold` veces o más: posible N+1"""
+        return [(s, n) for s, n in self.statements.most_common() if n >= threshold]
+
+
+# Stats de la petición en curso. Starlette copia el contexto al threadpool,
+# así que los endpoints sync registran sobre el mismo objeto
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "query_stats", default=None
+)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+
+def _before_cursor_execute(
+    conn: Any,
+    cursor: DBAPICursor,
+    statement: str,
+    parameters: Any,
+    context: Optional[ExecutionContext],
+    executemany: bool,
+) -> None:
+    if context is not None:
+        context._query_start = time.perf_counter()  # type: ignore[attr-defined]
+
+
+def _after_cursor_execute(
+    conn: Any,
+    cursor: DBAPICursor,
+    statement: str,
+    parameters: Any,
+    context: Optional[ExecutionContext],
+    executemany: bool,
+) -> None:
+    stats = _current_stats.get()
+    start = getattr(context, "_query_start", None)
+    if stats is not None and start is not None:
+        stats.record(statement, time.perf_counter() - start)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Registra los eventos que alimentan `QueryStats` (idempotente)"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryStatsMiddleware:
+    """
+    Middleware ASGI que cuenta las sentencias SQL de cada petición.
+
+    Con DEBUG agrega los headers X-DB-Query-Count, X-DB-Time-Ms y
+    X-DB-Slowest-Ms. Siempre loguea en JSON las peticiones lentas, con
+    demasiadas consultas o con sentencias repetidas (posible N+1).
+
+    En respuestas en streaming los headers salen antes del cuerpo, así que
+    solo cuentan las consultas previas; el log sí incluye todas.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(settings.QUERY_STATS_SLOWEST)
+        token = _current_stats.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_stats(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.DEBUG:
+                    headers = MutableHeaders(scope=message)
+                    headers["X-DB-Query-Count"] = str(stats.count)
+                    headers["X-DB-Time-Ms"] = f"{stats.seconds * 1000:.2f}"
+                    headers["X-DB-Slowest-Ms"] = ",".join(
+                        f"{seconds * 1000:.2f}" for seconds, _ in stats.slowest
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current_stats.reset(token)
+            log_if_slow(scope, status_code, time.perf_counter() - start, stats)
+
+
+def log_if_slow(
+    scope: Scope, status_code: int, seconds: float, stats: QueryStats
+) -> None:
+    repeated = stats.repeated(settings.QUERY_REPEAT_THRESHOLD)
+    if (
+        seconds * 1000 < settings.SLOW_REQUEST_MS
+        and stats.count <= settings.SLOW_REQUEST_MAX_QUERIES
+        and not repeated
+    ):
+        return
+
+    route = scope.get("route")
+    logger.warning(
+        json.dumps(
+            {
+                "event": "slow_request",
+                "method": scope["method"],
+                "route": getattr(route, "path", scope["path"]),
+                "status": status_code,
+                "duration_ms": round(seconds * 1000, 2),
+                "db_queries": stats.count,
+                "db_time_ms": round(stats.seconds * 1000, 2),
+                "slowest": [
+                    {"ms": round(s * 1000, 2), "statement": statement}
+                    for s, statement in stats.slowest
+                ],
+                "repeated": [
+                    {"count": n, "statement": statement} for statement, n in repeated
+                ],
+            }
+        )
+    )
@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Optional, Sequence, TypeVar
+
+from sqlalchemy import Connection, Engine, Select, event
+from sqlalchemy.engine import ExceptionContext
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import ClauseElement
+from sqlalchemy.sql.dml import UpdateBase
+from starlette.requests import Request
+
+logger = logging.getLogger(__name__)
+
+# Clave en `Session.info`: la sesión lee del primario de ahí en adelante
+USE_PRIMARY = "use_primary"
+
+# Métodos que no escriben: pueden leer de una réplica
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_primary_endpoints: set[Callable[..., Any]] = set()
+
+
+class ReplicaSet:
+    """
+    Réplicas de lectura repartidas en round-robin.
+
+    Una réplica que falla al conectar (o pierde la conexión) queda fuera
+    `eject_seconds` y después vuelve a la rotación; si no queda ninguna
+    disponible, `choose` retorna None y se lee del primario.
+    """
+
+    def __init__(self, engines: Sequence[Engine], eject_seconds: float):
+        self.engines = list(engines)
+        self.eject_seconds = eject_seconds
+        self._ejected_until: dict[Engine, float] = {}
+        self._next = 0
+        self._lock = threading.Lock()
+        for engine in self.engines:
+            event.listen(engine, "handle_error", self._on_error)
+
+    def choose(self) -> Optional[Engine]:
+        now = time.monotonic()
+        with self._lock:
+            for _ in range(len(self.engines)):
+                engine = self.engines[self._next % len(self.engines)]
+                self._next += 1
+                if self._ejected_until.get(engine, 0.0) <= now:
+                    return engine
+        return None
+
+    def eject(self, engine: Engine) -> None:
+        with self._lock:
+            self._ejected_until[engine] = time.monotonic() + self.eject_seconds
+        logger.warning(
+            "Réplica %s fuera de la rotación por %.0f s",
+            engine.url.render_as_string(hide_password=True),
+            self.eject_seconds,
+        )
+
+    def is_ejected(self, engine: Engine) -> bool:
+        return self._ejected_until.get(engine, 0.0) > time.monotonic()
+
+    def _on_error(self, context: ExceptionContext) -> None:
+        # Sin conexión: falló al conectar. Los errores de SQL no cuentan
+        if context.engine is not None and (
+            context.connection is None or context.is_disconnect
+        ):
+            self.eject(context.engine)
+
+    def dispose(self) -> None:
+        for engine in self.engines:
+            engine.dispose()
+
+
+class RoutingSession(Session):
+    """
+    Session que manda las lecturas a una réplica y el resto al primario.
+
+    Lee de réplica un SELECT sin FOR UPDATE. Desde la primera escritura
+    (flush o INSERT/UPDATE/DELETE) la sesión queda pegada al primario, así
+    que lo que la petición escribió lo vuelve a leer de ahí aunque la
+    réplica tenga retraso; `stick_to_primary` la pega desde el inicio.
+    Cada sesión usa una sola réplica, elegida en su primera lectura.
+    """
+
+    def __init__(self, *args: Any, replicas: Optional[ReplicaSet] = None, **kw: Any):
+        super().__init__(*args, **kw)
+        self.replicas = replicas
+        self._replica: Optional[Engine] = None
+
+    def get_bind(
+        self,
+        mapper: Any = None,
+        *,
+        clause: Optional[ClauseElement] = None,
+        **kw: Any,
+    ) -> Engine | Connection:
+        if self.replicas is not None and not self.info.get(USE_PRIMARY):
+            if self._flushing or isinstance(clause, UpdateBase):
+                self.info[USE_PRIMARY] = True
+            elif isinstance(clause, Select) and clause._for_update_arg is None:
+                if self._replica is None or self.replicas.is_ejected(self._replica):
+                    self._replica = self.replicas.choose()
+                if self._replica is not None:
+                    return self._replica
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+def stick_to_primary(session: Session | AsyncSession) -> None:
+    """Hace que la sesión lea del primario (datos recién escritos)"""
+    session.info[USE_PRIMARY] = True
+
+
+def read_from_primary(endpoint: F) -> F:
+    """
+    Marca un endpoint de lectura que debe ver lo recién escrito: su sesión
+    lee del primario. Va debajo de `@router.get(...)`.
+
+    Es un decorador y no una dependency porque las dependencies del router
+    (la autorización) consultan la DB antes que las de la ruta.
+    """
+    _primary_endpoints.add(endpoint)
+    return endpoint
+
+
+def request_uses_primary(request: Request) -> bool:
+    """
+    True si la petición lee del primario: escribe (un dato atrasado de una
+    réplica no debe decidir una escritura) o su endpoint usa
+    `read_from_primary`.
+    """
+    return (
+        request.method not in SAFE_METHODS
+        or request.scope.get("endpoint") in _primary_endpoints
+    )
@@ -1,29 +1,337 @@
+import asyncio
+import hashlib
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Callable, Iterable, List, Optional, TypeVar
+from uuid import UUID
 
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from pydantic import ValidationError
 
 from app.config import settings
+from app.core.cache import TTLCache
+from app.core.invalidation import USER, InvalidationEvent, invalidation_bus
+from app.core.metrics import password_hash_duration_seconds
+from app.models.user import User
 from app.schemas.access_token import AccessTokenData
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+# passlib y jose se importan en el primer uso (o en `warm_up`, desde el
+# lifespan): juntos son cerca de la mitad de lo que cuesta importar la app
+_pwd_context: Optional["CryptContext"] = None
+_pwd_context_lock = threading.Lock()
+
+
+def get_pwd_context() -> "CryptContext":
+    """Contexto de passlib con el costo de Argon2 configurado en ARGON2_*"""
+    global _pwd_context
+    if _pwd_context is None:
+        # Los hashes corren en varios threads del pool a la vez
+        with _pwd_context_lock:
+            if _pwd_context is None:
+                from passlib.context import CryptContext
+
+                _pwd_context = CryptContext(
+                    schemes=["argon2"],
+                    deprecated="auto",
+                    argon2__rounds=settings.ARGON2_TIME_COST,
+                    argon2__memory_cost=settings.ARGON2_MEMORY_COST,
+                    argon2__parallelism=settings.ARGON2_PARALLELISM,
+                )
+    return _pwd_context
+
+
+def warm_up() -> None:
+    """Crea el contexto de passlib e importa jose antes de la primera petición"""
+    get_pwd_context()
+    from jose import jwt  # noqa: F401
+
+
+T = TypeVar("T")
+
+
+class HashingPoolBusyError(Exception):
+    """El pool de hashing está lleno (workers ocupados y cola completa)"""
+
+
+class HashingPool:
+    """
+    Executor dedicado para Argon2, separado del threadpool de Starlette.
+
+    argon2-cffi libera el GIL mientras calcula el hash, así que un pool de
+    threads da paralelismo real. El tamaño acota cuántos hashes corren a la
+    vez y `queue_size` cuántos pueden esperar; por encima se rechaza con
+    `HashingPoolBusyError` en lugar de acumular trabajo.
+
+    Los lotes (`map`) usan a lo sumo `batch_in_flight` slots a la vez (por
+    defecto, la mitad de los workers): una importación masiva nunca deja
+    sin lugar al login y al registro.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int],
+        queue_size: int,
+        batch_in_flight: Optional[int] = None,
+    ):
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.queue_size = queue_size
+        self.batch_in_flight = batch_in_flight or max(1, self.workers // 2)
+        self._slots = threading.BoundedSemaphore(self.workers + queue_size)
+        self._batch_slots = threading.BoundedSemaphore(self.batch_in_flight)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Se crea en el primer uso para no levantar threads al importar
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="argon2"
+                    )
+        return self._executor
+
+    def submit(
+        self, fn: Callable[..., T], *args: object, wait: bool = False
+    ) -> "Future[T]":
+        """
+        Encola `fn(*args)`. Si el pool está lleno lanza `HashingPoolBusyError`,
+        o con `wait=True` espera a que se libere un slot (trabajos por lotes).
+        """
+        if not self._slots.acquire(blocking=wait):
+            raise HashingPoolBusyError("Demasiadas operaciones de hashing en curso")
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn: Callable[..., T], *args: object) -> T:
+        """Ejecuta en el pool y espera el resultado (para código sync)"""
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn: Callable[..., T], *args: object) -> T:
+        """Ejecuta en el pool sin bloquear el event loop"""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def map(self, fn: Callable[[Any], T], items: Iterable[Any]) -> List[T]:
+        """
+        Aplica `fn` a cada item en paralelo, con hasta `batch_in_flight`
+        en curso. Espera por slots libres en lugar de rechazar (lotes).
+        """
+        futures: List["Future[T]"] = []
+        for item in items:
+            self._batch_slots.acquire()
+            try:
+                future = self.submit(fn, item, wait=True)
+            except BaseException:
+                self._batch_slots.release()
+                raise
+            future.add_done_callback(lambda _: self._batch_slots.release())
+            futures.append(future)
+        return [future.result() for future in futures]
+
+    async def map_async(self, fn: Callable[[Any], T], items: Iterable[Any]) -> List[T]:
+        """Versión async de `map`; la espera por slots ocurre fuera del loop"""
+        return await asyncio.to_thread(self.map, fn, list(items))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+hashing_pool = HashingPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+    batch_in_flight=settings.PASSWORD_HASH_BATCH_IN_FLIGHT,
+)
+
+
+def _hash(password: str) -> str:
+    """`CryptContext.hash` midiendo su duración (corre dentro del pool)"""
+    start = time.perf_counter()
+    try:
+        return get_pwd_context().hash(password)
+    finally:
+        password_hash_duration_seconds.observe(time.perf_counter() - start, "hash")
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    """`CryptContext.verify` midiendo su duración (corre dentro del pool)"""
+    start = time.perf_counter()
+    try:
+        return get_pwd_context().verify(plain_password, hashed_password)
+    finally:
+        password_hash_duration_seconds.observe(time.perf_counter() - start, "verify")
+
+
+def _verify_and_update(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    """`CryptContext.verify_and_update` midiendo su duración (corre en el pool)"""
+    start = time.perf_counter()
+    try:
+        result: tuple[bool, Optional[str]] = get_pwd_context().verify_and_update(
+            plain_password, hashed_password
+        )
+        return result
+    finally:
+        password_hash_duration_seconds.observe(time.perf_counter() - start, "verify")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica si la contraseña en texto plano coincide con el hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashing_pool.run(_verify, plain_password, hashed_password)
+
+
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    """
+    Verifica la contraseña y, si el hash usa parámetros de Argon2 distintos a
+    los actuales, retorna también un hash nuevo para guardar (si no, None)
+    """
+    return hashing_pool.run(_verify_and_update, plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Hash una contraseña en texto plano"""
-    return pwd_context.hash(password)
+    return hashing_pool.run(_hash, password)
+
+
+def get_password_hashes(passwords: Iterable[str]) -> List[str]:
+    """Hash de varias contraseñas en paralelo (importaciones masivas)"""
+    return hashing_pool.map(_hash, passwords)
+
+
+async def get_password_hashes_async(passwords: Iterable[str]) -> List[str]:
+    """Versión async de `get_password_hashes`"""
+    return await hashing_pool.map_async(_hash, passwords)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Versión async de `verify_password`"""
+    return await hashing_pool.run_async(_verify, plain_password, hashed_password)
+
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    """Versión async de `verify_and_update_password`"""
+    return await hashing_pool.run_async(
+        _verify_and_update, plain_password, hashed_password
+    )
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Versión async de `get_password_hash`"""
+    return await hashing_pool.run_async(_hash, password)
+
+
+class TokenVersions:
+    """
+    Copia en memoria de `users.token_version`, para revocar tokens stateless
+    sin consultar la DB.
+
+    Cada cambio que afecta la autorización de un usuario (rol, activo,
+    password, eliminado) incrementa su versión en el mismo UPDATE; los
+    tokens emitidos con una versión anterior dejan de ser válidos. Los
+    usuarios sin cambios no ocupan espacio (versión 0).
+
+    Cada worker la carga de la DB (`load`) y recibe los incrementos por
+    `invalidation_bus`. Hasta la primera carga, y desde que el bus pudo
+    perder eventos (`desync`) hasta la siguiente, no está sincronizada
+    (`synced`) y no sirve para validar tokens.
+    """
+
+    def __init__(self) -> None:
+        self._versions: dict[UUID, int] = {}
+        self._lock = threading.Lock()
+        self._synced = False
+        # Cambia con cada `desync`: una carga leída antes no sincroniza
+        self.generation = 0
+
+    @property
+    def synced(self) -> bool:
+        return self._synced
+
+    def get(self, user_id: UUID) -> int:
+        return self._versions.get(user_id, 0)
+
+    def load(self, versions: dict[UUID, int], generation: int) -> None:
+        """
+        Carga las versiones leídas de la DB después de ver `generation`.
+        Conserva las mayores en memoria: un evento puede llegar mientras se
+        leen
+        """
+        with self._lock:
+            for user_id, version in versions.items():
+                if version > self._versions.get(user_id, 0):
+                    self._versions[user_id] = version
+            self._synced = generation == self.generation
+
+    def desync(self) -> None:
+        """Se pudieron perder incrementos: hay que volver a cargar"""
+        with self._lock:
+            self.generation += 1
+            self._synced = False
+
+    def advance(self, user_id: UUID, version: int) -> None:
+        """Lleva la versión a `version` si es mayor (evento de otro worker)"""
+        with self._lock:
+            if version > self._versions.get(user_id, 0):
+                self._versions[user_id] = version
+
+    def is_current(self, user_id: UUID, version: int) -> bool:
+        # Un token con versión mayor se acepta: este worker todavía no
+        # recibió el evento del cambio
+        return version >= self.get(user_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._versions.clear()
+            self.generation += 1
+            self._synced = False
+
+
+token_versions = TokenVersions()
+
+
+def _advance_token_version(event: InvalidationEvent) -> None:
+    token_versions.advance(UUID(event.id), event.version)
+
+
+invalidation_bus.subscribe(USER, _advance_token_version, on_reset=token_versions.desync)
+
+
+def access_token_data_for(user: User) -> AccessTokenData:
+    """Claims del access token de `user` (con claims de auth si es stateless)"""
+    if not settings.STATELESS_AUTH:
+        return AccessTokenData(sub=user.id)
+    return AccessTokenData(
+        sub=user.id,
+        role=user.role,
+        is_superuser=user.is_superuser,
+        token_version=user.token_version,
+    )
 
 
 def create_access_token(
     data: AccessTokenData, expires_delta: Optional[timedelta] = None
 ) -> str:
     """Crea un token JWT"""
+    from jose import jwt
+
     to_encode = data.model_copy()
 
     if expires_delta:
@@ -41,16 +349,92 @@ def create_access_token(
     )
 
 
+def create_refresh_token() -> tuple[str, str]:
+    """Genera un refresh token opaco; retorna (token, hash a guardar)"""
+    token = secrets.token_urlsafe(32)
+    return token, hash_refresh_token(token)
+
+
+def hash_refresh_token(token: str) -> str:
+    """
+    sha256 del refresh token. Con 256 bits aleatorios no hace falta un hash
+    lento como Argon2: la búsqueda al refrescar es una consulta por índice.
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class InvalidTokenError(Exception):
+    """El token JWT es inválido, expiró o sus claims no son válidos"""
+
+
+class TokenVerifier:
+    """
+    Verificador único de access tokens con cache de tokens ya verificados.
+
+    La clave es el sha256 del token (no se guarda el token en claro) y cada
+    entrada expira a más tardar en el `exp` del token, así que un token
+    vencido nunca se acepta desde el cache. Lleva la cuenta del tiempo
+    de decodificación para estimar cuánto se ahorra con cada hit.
+    """
+
+    def __init__(self, cache: TTLCache[bytes, AccessTokenData]):
+        self.cache = cache
+        self.decode_count = 0
+        self.decode_seconds = 0.0
+
+    def verify(self, token: str) -> AccessTokenData:
+        key = hashlib.sha256(token.encode()).digest()
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        from jose import JWTError, jwt
+
+        start = time.perf_counter()
+        try:
+            payload = jwt.decode(
+                token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+            )
+            token_data = AccessTokenData(**payload)
+        except (JWTError, ValidationError) as e:
+            raise InvalidTokenError(str(e)) from e
+        finally:
+            # Contadores aproximados: sin lock para no serializar requests
+            self.decode_count += 1
+            self.decode_seconds += time.perf_counter() - start
+
+        ttl = None
+        if token_data.exp is not None:
+            ttl = (token_data.exp - datetime.now(timezone.utc)).total_seconds()
+        self.cache.set(key, token_data, ttl=ttl)
+        return token_data
+
+    def stats(self) -> dict[str, int | float]:
+        stats = self.cache.stats()
+        avg_decode = self.decode_seconds / self.decode_count if self.decode_count else 0
+        stats["decode_count"] = self.decode_count
+        stats["avg_decode_ms"] = avg_decode * 1000
+        stats["decode_ms_saved"] = self.cache.hits * avg_decode * 1000
+        return stats
+
+
+token_verifier = TokenVerifier(
+    TTLCache(
+        "tokens",
+        maxsize=settings.TOKEN_CACHE_MAX_SIZE,
+        ttl=settings.TOKEN_CACHE_TTL_SECONDS,
+    )
+)
+
+
+def verify_access_token(token: str) -> AccessTokenData:
+    """Verifica un JWT (firma, exp y claims); lanza `InvalidTokenError`"""
+    return token_verifier.verify(token)
+
+
 def decode_access_token(token: str) -> Optional[AccessTokenData]:
     """Decodifica y valida un token JWT"""
     try:
-        decode_dict = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-
-        return AccessTokenData(**decode_dict)
-    except JWTError:
-        return None
-    except Exception as e:
-        print(f"decode_access_token error: {e}")
+        return verify_access_token(token)
+    except InvalidTokenError:
         return None
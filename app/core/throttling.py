@@ -0,0 +1,126 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, Optional, Protocol
+
+from app.config import settings
+
+
+class LoginThrottledError(Exception):
+    """Demasiados intentos de login; reintentar en `retry_after` segundos"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Reintentar en {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class ThrottleBackend(Protocol):
+    """
+    Almacén de token buckets. El de memoria es por proceso; para compartir
+    los límites entre workers se implementa este protocolo sobre un
+    almacén común (ej. Redis) y se asigna a `login_throttle.backend`.
+    """
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        """
+        Consume un token del bucket `key` (`rate` tokens/segundo, capacidad
+        `burst`). Retorna 0 si había token o los segundos hasta el próximo.
+        """
+        ...
+
+    def reset(self) -> None: ...
+
+
+class MemoryThrottleBackend:
+    """
+    Token buckets en memoria, thread-safe y acotados (LRU). Descartar el
+    bucket menos usado equivale a dejarlo lleno, su estado inicial.
+    """
+
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (float(burst), now))
+            tokens = min(float(burst), tokens + (now - updated_at) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class LoginThrottle:
+    """
+    Frena los intentos de login antes de llegar a Argon2.
+
+    - Un token bucket por IP y otro por username (en minúsculas), con los
+      límites de `settings.LOGIN_*`.
+    - Un tope global de verificaciones en curso: si se alcanza, se rechaza
+      al instante en lugar de encolar más trabajo de CPU.
+
+    Todo rechazo es un `LoginThrottledError` (429 con Retry-After).
+    """
+
+    def __init__(self, backend: ThrottleBackend, max_concurrent: int):
+        self.backend = backend
+        self.max_concurrent = max_concurrent
+        self._in_flight = threading.BoundedSemaphore(max_concurrent)
+
+    def check(self, username: str, client_ip: Optional[str]) -> None:
+        if not settings.LOGIN_THROTTLE_ENABLED:
+            return
+        if client_ip is not None:
+            wait = self.backend.take(
+                f"login:ip:{client_ip}",
+                settings.LOGIN_IP_RATE_PER_MINUTE / 60,
+                settings.LOGIN_IP_BURST,
+            )
+            if wait:
+                raise LoginThrottledError(wait)
+        wait = self.backend.take(
+            f"login:user:{username.lower()}",
+            settings.LOGIN_USERNAME_RATE_PER_MINUTE / 60,
+            settings.LOGIN_USERNAME_BURST,
+        )
+        if wait:
+            raise LoginThrottledError(wait)
+
+    @contextmanager
+    def verification(self) -> Iterator[None]:
+        """Reserva un lugar entre las verificaciones en curso o rechaza"""
+        if not settings.LOGIN_THROTTLE_ENABLED:
+            yield
+            return
+        if not self._in_flight.acquire(blocking=False):
+            raise LoginThrottledError(1)
+        try:
+            yield
+        finally:
+            self._in_flight.release()
+
+    def reset(self) -> None:
+        self.backend.reset()
+
+
+login_throttle = LoginThrottle(
+    MemoryThrottleBackend(), settings.LOGIN_MAX_CONCURRENT_VERIFICATIONS
+)
@@ -0,0 +1,229 @@
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Generic, List, Optional, Sequence, Type
+
+from sqlalchemy import ColumnElement, Row, Select, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.cache import count_cache
+from app.crud.base import (
+    CountMode,
+    CreateSchemaType,
+    ModelType,
+    UpdateSchemaType,
+    build_count_stmt,
+    build_estimate_stmt,
+    build_page_stmt,
+    parse_estimate,
+    split_page,
+)
+
+
+class AsyncCRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    """Variante de `CRUDBase` para AsyncSession, con la misma interfaz"""
+
+    def __init__(self, model: Type[ModelType]):
+        self.model = model
+
+    async def _update_db_obj(self, db: AsyncSession, obj: ModelType) -> None:
+        """Helper para commit y refresh de objetos"""
+        db.add(obj)
+        await db.commit()
+        await db.refresh(obj)
+
+    async def _commit_detached(
+        self, db: AsyncSession, objs: Sequence[ModelType]
+    ) -> None:
+        """Ver `CRUDBase._commit_detached`"""
+        for obj in objs:
+            db.expunge(obj)
+        await db.commit()
+
+    def _select(self, include_deleted: bool = False) -> Select[tuple[ModelType]]:
+        stmt = select(self.model)
+        if not include_deleted:
+            stmt = stmt.where(self.model.deleted_at.is_(None))
+        return stmt
+
+    async def get(
+        self, db: AsyncSession, id: Any, include_deleted: bool = False
+    ) -> Optional[ModelType]:
+        """Obtener un registro por ID"""
+        stmt = self._select(include_deleted).where(self.model.id == id)
+        return (await db.scalars(stmt.limit(1))).first()
+
+    async def get_row(
+        self,
+        db: AsyncSession,
+        id: Any,
+        columns: Sequence[str],
+        include_deleted: bool = False,
+    ) -> Optional[Row[Any]]:
+        """Ver `CRUDBase.get_row`"""
+        stmt = select(*(getattr(self.model, name) for name in columns)).where(
+            self.model.id == id
+        )
+        if not include_deleted:
+            stmt = stmt.where(self.model.deleted_at.is_(None))
+        return (await db.execute(stmt.limit(1))).first()
+
+    async def get_multi(
+        self,
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 100,
+        include_deleted: bool = False,
+    ) -> List[ModelType]:
+        """Obtener múltiples registros (paginación por offset)"""
+        stmt = self._select(include_deleted).order_by(
+            self.model.created_at, self.model.id
+        )
+        return list(await db.scalars(stmt.offset(skip).limit(limit)))
+
+    async def get_multi_keyset(
+        self,
+        db: AsyncSession,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        include_deleted: bool = False,
+    ) -> tuple[List[ModelType], Optional[str]]:
+        """Paginación por cursor (keyset), ver `CRUDBase.get_multi_keyset`"""
+        stmt = build_page_stmt(
+            self.model,
+            select(self.model),
+            cursor=cursor,
+            limit=limit,
+            include_deleted=include_deleted,
+        )
+        return split_page(list(await db.scalars(stmt)), limit)
+
+    async def get_page_rows(
+        self,
+        db: AsyncSession,
+        columns: Sequence[str],
+        cursor: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100,
+        include_deleted: bool = False,
+        filters: Sequence[ColumnElement[bool]] = (),
+    ) -> tuple[List[Row[Any]], Optional[str]]:
+        """Ver `CRUDBase.get_page_rows`"""
+        names = dict.fromkeys([*columns, "created_at", "id"])
+        stmt = build_page_stmt(
+            self.model,
+            select(*(getattr(self.model, name) for name in names)).where(*filters),
+            cursor=cursor,
+            skip=skip,
+            limit=limit,
+            include_deleted=include_deleted,
+        )
+        return split_page(list(await db.execute(stmt)), limit)
+
+    async def count(self, db: AsyncSession, include_deleted: bool = False) -> int:
+        """Ver `CRUDBase.count`; comparte el cache con la versión sync"""
+        key = (self.model.__tablename__, include_deleted)
+        total = count_cache.get(key)
+        if total is None:
+            stmt = build_count_stmt(self.model, include_deleted)
+            total = (await db.scalar(stmt)) or 0
+            count_cache.set(key, total)
+        return total
+
+    async def count_estimate(self, db: AsyncSession) -> Optional[int]:
+        """Ver `CRUDBase.count_estimate`"""
+        stmt = build_estimate_stmt(self.model, db.get_bind().dialect.name)
+        if stmt is None:
+            return None
+        return parse_estimate(await db.scalar(stmt))
+
+    async def total_count(
+        self, db: AsyncSession, mode: CountMode, include_deleted: bool = False
+    ) -> tuple[int, bool]:
+        """Ver `CRUDBase.total_count`"""
+        if mode == "estimated":
+            estimate = await self.count_estimate(db)
+            if estimate is not None and estimate >= settings.COUNT_ESTIMATE_THRESHOLD:
+                return estimate, False
+        return await self.count(db, include_deleted), True
+
+    async def iter_all(
+        self, db: AsyncSession, batch_size: int = 1000, include_deleted: bool = False
+    ) -> AsyncIterator[ModelType]:
+        """Ver `CRUDBase.iter_all`"""
+        stmt = self._select(include_deleted).order_by(
+            self.model.created_at, self.model.id
+        )
+        result = await db.stream_scalars(stmt.execution_options(yield_per=batch_size))
+        async for obj in result:
+            yield obj
+
+    async def create(self, db: AsyncSession, obj_in: CreateSchemaType) -> ModelType:
+        """Crear un nuevo registro"""
+        db_obj = self.model(**obj_in.model_dump())
+        await self._update_db_obj(db, db_obj)
+        return db_obj
+
+    async def update(
+        self, db: AsyncSession, db_obj: ModelType, obj_in: UpdateSchemaType
+    ) -> ModelType:
+        """Actualizar un registro existente"""
+        obj_data = obj_in.model_dump(exclude_unset=True)
+        for field, value in obj_data.items():
+            setattr(db_obj, field, value)
+        await self._update_db_obj(db, db_obj)
+        return db_obj
+
+    async def soft_delete(self, db: AsyncSession, id: Any) -> Optional[ModelType]:
+        """Soft delete: marca como eliminado sin borrar"""
+        obj = await self.get(db, id)
+        if obj:
+            obj.deleted_at = datetime.now(timezone.utc)
+            await self._update_db_obj(db, obj)
+        return obj
+
+    async def hard_delete(self, db: AsyncSession, id: Any) -> Optional[ModelType]:
+        """Hard delete: elimina permanentemente de la DB"""
+        obj = await self.get(db, id, include_deleted=True)
+        if obj:
+            await db.delete(obj)
+            await db.commit()
+        return obj
+
+    async def create_multi(
+        self, db: AsyncSession, objs_in: Sequence[CreateSchemaType]
+    ) -> List[ModelType]:
+        """Crear varios registros con un INSERT multi-fila y un solo commit"""
+        if not objs_in:
+            return []
+        objs = list(
+            await db.scalars(
+                insert(self.model).returning(self.model),
+                [obj_in.model_dump() for obj_in in objs_in],
+            )
+        )
+        await self._commit_detached(db, objs)
+        return objs
+
+    async def update_multi(
+        self, db: AsyncSession, ids: Sequence[Any], values: dict[str, Any]
+    ) -> List[ModelType]:
+        """Ver `CRUDBase.update_multi`"""
+        if not ids or not values:
+            return []
+        stmt = (
+            update(self.model)
+            .where(self.model.id.in_(ids), self.model.deleted_at.is_(None))
+            .values(**values)
+            .returning(self.model)
+        )
+        objs = list(await db.scalars(stmt))
+        await self._commit_detached(db, objs)
+        return objs
+
+    async def soft_delete_multi(
+        self, db: AsyncSession, ids: Sequence[Any]
+    ) -> List[ModelType]:
+        """Soft delete de varios registros en un solo UPDATE"""
+        return await self.update_multi(
+            db, ids, {"deleted_at": datetime.now(timezone.utc)}
+        )
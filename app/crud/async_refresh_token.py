@@ -0,0 +1,62 @@
+from typing import Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.refresh_token import (
+    InvalidRefreshTokenError,
+    RefreshTokenReuseError,
+    delete_expired_batch,
+    mark_used,
+    new_refresh_token,
+    revoke_family,
+    revoke_for_users,
+    rowcount,
+    select_valid,
+)
+
+
+class AsyncCRUDRefreshToken:
+    """Variante async de `CRUDRefreshToken`"""
+
+    async def issue(
+        self, db: AsyncSession, user_id: UUID, family_id: Optional[UUID] = None
+    ) -> str:
+        token, db_obj = new_refresh_token(user_id, family_id)
+        db.add(db_obj)
+        await db.commit()
+        return token
+
+    async def rotate(self, db: AsyncSession, token: str) -> tuple[UUID, str]:
+        db_obj = await db.scalar(select_valid(token))
+        if db_obj is None:
+            raise InvalidRefreshTokenError()
+
+        if rowcount(await db.execute(mark_used(db_obj))) == 0:
+            await db.execute(revoke_family(db_obj.family_id))
+            await db.commit()
+            raise RefreshTokenReuseError()
+
+        user_id = db_obj.user_id
+        return user_id, await self.issue(db, user_id, db_obj.family_id)
+
+    async def revoke_all_for_user(self, db: AsyncSession, user_id: UUID) -> int:
+        """Ver `CRUDRefreshToken.revoke_all_for_user` (no hace commit)"""
+        return await self.revoke_all_for_users(db, [user_id])
+
+    async def revoke_all_for_users(
+        self, db: AsyncSession, user_ids: Sequence[UUID]
+    ) -> int:
+        return rowcount(await db.execute(revoke_for_users(user_ids)))
+
+    async def purge_expired(self, db: AsyncSession, batch_size: int) -> int:
+        total = 0
+        while True:
+            deleted = rowcount(await db.execute(delete_expired_batch(batch_size)))
+            await db.commit()
+            total += deleted
+            if deleted < batch_size:
+                return total
+
+
+refresh_token = AsyncCRUDRefreshToken()
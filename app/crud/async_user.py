@@ -0,0 +1,206 @@
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import Row, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import user_cache
+from app.core.security import (
+    get_password_hash_async,
+    get_password_hashes_async,
+    verify_and_update_password_async,
+)
+from app.crud.async_base import AsyncCRUDBase
+from app.crud.async_refresh_token import refresh_token as crud_refresh_token
+from app.crud.refresh_token import rowcount
+from app.crud.user import (
+    SESSION_FIELDS,
+    SearchMatch,
+    build_search_filters,
+    invalidate_user,
+    new_user_values,
+    rehash_password,
+    revoking_values,
+    snapshot_user,
+    to_duplicate_error,
+    token_versions_stmt,
+)
+from app.models.user import User
+from app.schemas.user import UserCreate, UserUpdate
+
+
+class AsyncCRUDUser(AsyncCRUDBase[User, UserCreate, UserUpdate]):
+    """Variante async de `CRUDUser`; comparte `user_cache` con la versión sync"""
+
+    async def _save(self, db: AsyncSession, db_obj: User) -> None:
+        """Ver `CRUDUser._save`"""
+        try:
+            await self._update_db_obj(db, db_obj)
+        except IntegrityError as e:
+            await db.rollback()
+            duplicate = to_duplicate_error(e)
+            if duplicate is None:
+                raise
+            raise duplicate from e
+
+    async def get_cached(self, db: AsyncSession, id: UUID) -> Optional[User]:
+        """Obtener usuario activo por ID pasando por `user_cache`"""
+        cached = user_cache.get(id)
+        if cached is not None:
+            return cached
+
+        db_obj = await self.get(db, id=id)
+        if db_obj is None:
+            return None
+
+        snapshot = snapshot_user(db_obj)
+        user_cache.set(id, snapshot)
+        return snapshot
+
+    async def search_rows(
+        self,
+        db: AsyncSession,
+        columns: Sequence[str],
+        q: Optional[str] = None,
+        match: SearchMatch = "prefix",
+        role: Optional[str] = None,
+        is_active: Optional[bool] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+    ) -> tuple[List[Row[Any]], Optional[str]]:
+        """Ver `CRUDUser.search_rows`"""
+        filters = build_search_filters(
+            db.get_bind().dialect.name, q, match, role, is_active
+        )
+        return await self.get_page_rows(
+            db, columns, cursor=cursor, limit=limit, filters=filters
+        )
+
+    async def get_by_email(self, db: AsyncSession, email: str) -> Optional[User]:
+        """Obtener usuario por email"""
+        stmt = self._select().where(User.email == email)
+        return (await db.scalars(stmt.limit(1))).first()
+
+    async def get_by_username(self, db: AsyncSession, username: str) -> Optional[User]:
+        """Obtener usuario por username"""
+        stmt = self._select().where(User.username == username)
+        return (await db.scalars(stmt.limit(1))).first()
+
+    async def create(self, db: AsyncSession, obj_in: UserCreate) -> User:
+        """Crear usuario con password hashed"""
+        db_obj = User(
+            **new_user_values(obj_in, await get_password_hash_async(obj_in.password))
+        )
+        await self._save(db, db_obj)
+        return db_obj
+
+    async def create_multi(
+        self, db: AsyncSession, objs_in: Sequence[UserCreate]
+    ) -> List[User]:
+        """Ver `CRUDUser.create_multi`"""
+        if not objs_in:
+            return []
+        hashed_passwords = await get_password_hashes_async(
+            obj_in.password for obj_in in objs_in
+        )
+        rows = [
+            new_user_values(obj_in, hashed_password)
+            for obj_in, hashed_password in zip(objs_in, hashed_passwords)
+        ]
+        try:
+            objs = list(await db.scalars(insert(User).returning(User), rows))
+        except IntegrityError as e:
+            await db.rollback()
+            duplicate = to_duplicate_error(e)
+            if duplicate is None:
+                raise
+            raise duplicate from e
+        await self._commit_detached(db, objs)
+        return objs
+
+    async def update(self, db: AsyncSession, db_obj: User, obj_in: UserUpdate) -> User:
+        """Actualizar usuario, hace hash del password si se proporciona"""
+        update_data = obj_in.model_dump(exclude_unset=True)
+
+        if "password" in update_data:
+            hashed_password = await get_password_hash_async(update_data["password"])
+            del update_data["password"]
+            update_data["hashed_password"] = hashed_password
+
+        if "role" in update_data:
+            update_data["role"] = update_data["role"].value
+
+        for field, value in revoking_values(update_data).items():
+            setattr(db_obj, field, value)
+
+        if not SESSION_FIELDS.isdisjoint(update_data):
+            await crud_refresh_token.revoke_all_for_user(db, db_obj.id)
+        await self._save(db, db_obj)
+        invalidate_user(db_obj.id, db_obj.token_version)
+        return db_obj
+
+    async def soft_delete(self, db: AsyncSession, id: Any) -> Optional[User]:
+        """Ver `CRUDUser.soft_delete`"""
+        await crud_refresh_token.revoke_all_for_user(db, id)
+        obj = await self.get(db, id)
+        if obj:
+            for field, value in revoking_values(
+                {"deleted_at": datetime.now(timezone.utc)}
+            ).items():
+                setattr(obj, field, value)
+            await self._update_db_obj(db, obj)
+            invalidate_user(id, obj.token_version)
+        return obj
+
+    async def hard_delete(self, db: AsyncSession, id: Any) -> Optional[User]:
+        """Ver `CRUDUser.hard_delete`"""
+        obj = await super().hard_delete(db, id)
+        if obj:
+            invalidate_user(id, obj.token_version + 1)
+        return obj
+
+    async def update_multi(
+        self, db: AsyncSession, ids: Sequence[Any], values: dict[str, Any]
+    ) -> List[User]:
+        """Actualización masiva que además invalida el cache de cada usuario"""
+        if ids and not SESSION_FIELDS.isdisjoint(values):
+            await crud_refresh_token.revoke_all_for_users(db, ids)
+        users = await super().update_multi(db, ids, revoking_values(values))
+        for user in users:
+            invalidate_user(user.id, user.token_version)
+        return users
+
+    async def get_token_versions(self, db: AsyncSession) -> dict[UUID, int]:
+        """Ver `CRUDUser.get_token_versions`"""
+        return dict((await db.execute(token_versions_stmt())).tuples().all())
+
+    async def authenticate(
+        self, db: AsyncSession, username: str, password: str
+    ) -> Optional[User]:
+        """Autenticar usuario (usado en login)"""
+        user = await self.get_by_username(db, username)
+        if not user:
+            return None
+        if not user.is_active:
+            return None
+
+        # El verify corre en el pool de hashing sin bloquear el event loop
+        valid, new_hash = await verify_and_update_password_async(
+            password, user.hashed_password
+        )
+        if not valid:
+            return None
+
+        # Rehash con los parámetros actuales de Argon2 (ver `CRUDUser`)
+        if new_hash is not None:
+            replaced = rowcount(await db.execute(rehash_password(user, new_hash)))
+            await db.commit()
+            if replaced:
+                invalidate_user(user.id)
+        return user
+
+
+# Instancia única para usar en los endpoints async
+user = AsyncCRUDUser(User)
@@ -1,9 +1,35 @@
 from datetime import datetime, timezone
-from typing import Any, Generic, List, Optional, Type, TypeVar
+from typing import (
+    Any,
+    Generic,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Type,
+    TypeVar,
+)
 
 from pydantic import BaseModel as PydanticBaseModel
+from sqlalchemy import (
+    ColumnElement,
+    Executable,
+    Row,
+    Select,
+    func,
+    insert,
+    literal_column,
+    select,
+    text,
+    tuple_,
+    update,
+)
 from sqlalchemy.orm import Session
 
+from app.config import settings
+from app.core.cache import count_cache
+from app.core.pagination import decode_cursor, encode_cursor
 from app.models.base import BaseModel
 
 ModelType = TypeVar("ModelType", bound=BaseModel)
@@ -11,6 +37,80 @@ CreateSchemaType = TypeVar("CreateSchemaType", bound=PydanticBaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=PydanticBaseModel)
 
 
+RowType = TypeVar("RowType", bound=Any)
+
+CountMode = Literal["exact", "estimated"]
+
+
+def build_page_stmt(
+    model: Type[BaseModel],
+    stmt: Select[Any],
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    include_deleted: bool = False,
+) -> Select[Any]:
+    """
+    Aplica filtro de eliminados, orden (created_at, id) y paginación a `stmt`.
+    Con `cursor` pagina por keyset; si no, por offset. Pide `limit + 1`
+    filas para que `split_page` sepa si hay otra página.
+    """
+    if not include_deleted:
+        stmt = stmt.where(model.deleted_at.is_(None))
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(model.created_at, model.id) > (created_at, id))
+    stmt = stmt.order_by(model.created_at, model.id)
+    return stmt.offset(skip).limit(limit + 1)
+
+
+def split_page(items: List[RowType], limit: int) -> tuple[List[RowType], Optional[str]]:
+    """Recorta la fila extra y arma el cursor de la siguiente página"""
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    last = items[-1]
+    return items, encode_cursor(last.created_at, last.id)
+
+
+def build_count_stmt(
+    model: Type[BaseModel], include_deleted: bool = False
+) -> Select[tuple[int]]:
+    """COUNT(*) directo sobre la tabla, sin la subconsulta de `Query.count()`"""
+    stmt = select(func.count()).select_from(model)
+    if not include_deleted:
+        stmt = stmt.where(model.deleted_at.is_(None))
+    return stmt
+
+
+def build_estimate_stmt(
+    model: Type[BaseModel], dialect_name: str
+) -> Optional[Executable]:
+    """
+    Consulta de costo constante que aproxima la cantidad de filas, o None si
+    el dialecto no tiene una. Cuenta también las filas eliminadas.
+
+    - PostgreSQL: `pg_class.reltuples`, la estimación que mantienen VACUUM y
+      ANALYZE (-1 si la tabla nunca se analizó).
+    - SQLite: `max(rowid)`, que sale del final del B-tree; sobreestima si
+      hubo borrados físicos.
+    """
+    if dialect_name == "postgresql":
+        return text(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"
+        ).bindparams(table=model.__tablename__)
+    if dialect_name == "sqlite":
+        return select(func.max(literal_column("rowid"))).select_from(model)
+    return None
+
+
+def parse_estimate(value: Any) -> Optional[int]:
+    """Normaliza el resultado de `build_estimate_stmt`; None si no hay dato"""
+    if value is None or value < 0:
+        return None
+    return int(value)
+
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def __init__(self, model: Type[ModelType]):
         self.model = model
@@ -21,6 +121,16 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         db.commit()
         db.refresh(obj)
 
+    def _commit_detached(self, db: Session, objs: Sequence[ModelType]) -> None:
+        """
+        Commit de objetos que ya traen todas sus columnas (vía RETURNING).
+        Se sacan de la sesión antes del commit para que no queden expirados
+        y leerlos después no dispare un SELECT por objeto.
+        """
+        for obj in objs:
+            db.expunge(obj)
+        db.commit()
+
     def get(
         self, db: Session, id: Any, include_deleted: bool = False
     ) -> Optional[ModelType]:
@@ -30,6 +140,21 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             query = query.filter(self.model.deleted_at.is_(None))
         return query.first()
 
+    def get_row(
+        self,
+        db: Session,
+        id: Any,
+        columns: Sequence[str],
+        include_deleted: bool = False,
+    ) -> Optional[Row[Any]]:
+        """Obtener solo `columns` de un registro por ID, como fila de Core"""
+        stmt = select(*(getattr(self.model, name) for name in columns)).where(
+            self.model.id == id
+        )
+        if not include_deleted:
+            stmt = stmt.where(self.model.deleted_at.is_(None))
+        return db.execute(stmt.limit(1)).first()
+
     def get_multi(
         self,
         db: Session,
@@ -37,12 +162,112 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         limit: int = 100,
         include_deleted: bool = False,
     ) -> List[ModelType]:
-        """Obtener múltiples registros"""
+        """Obtener múltiples registros (paginación por offset)"""
         query = db.query(self.model)
         if not include_deleted:
             query = query.filter(self.model.deleted_at.is_(None))
+        query = query.order_by(self.model.created_at, self.model.id)
         return query.offset(skip).limit(limit).all()
 
+    def get_multi_keyset(
+        self,
+        db: Session,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        include_deleted: bool = False,
+    ) -> tuple[List[ModelType], Optional[str]]:
+        """
+        Obtener múltiples registros con paginación por cursor (keyset).
+        Ordena por (created_at, id) y retorna los registros junto con el
+        cursor de la siguiente página, o None si no hay más.
+        """
+        stmt = build_page_stmt(
+            self.model,
+            select(self.model),
+            cursor=cursor,
+            limit=limit,
+            include_deleted=include_deleted,
+        )
+        return split_page(list(db.scalars(stmt)), limit)
+
+    def get_page_rows(
+        self,
+        db: Session,
+        columns: Sequence[str],
+        cursor: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100,
+        include_deleted: bool = False,
+        filters: Sequence[ColumnElement[bool]] = (),
+    ) -> tuple[List[Row[Any]], Optional[str]]:
+        """
+        Como `get_multi_keyset`, pero selecciona solo `columns` y retorna
+        filas de Core, sin hidratar objetos ORM ni llenar el identity map.
+        Pensado para respuestas de listado que se serializan directo.
+        `filters` se agregan al WHERE (ej. los de una búsqueda).
+        """
+        # created_at e id siempre hacen falta para armar el cursor
+        names = dict.fromkeys([*columns, "created_at", "id"])
+        stmt = build_page_stmt(
+            self.model,
+            select(*(getattr(self.model, name) for name in names)).where(*filters),
+            cursor=cursor,
+            skip=skip,
+            limit=limit,
+            include_deleted=include_deleted,
+        )
+        return split_page(list(db.execute(stmt)), limit)
+
+    def count(self, db: Session, include_deleted: bool = False) -> int:
+        """
+        Conteo exacto de registros. Se cachea COUNT_CACHE_TTL_SECONDS por
+        worker, así un paginador no repite el COUNT(*) en cada página.
+        """
+        key = (self.model.__tablename__, include_deleted)
+        total = count_cache.get(key)
+        if total is None:
+            total = db.scalar(build_count_stmt(self.model, include_deleted)) or 0
+            count_cache.set(key, total)
+        return total
+
+    def count_estimate(self, db: Session) -> Optional[int]:
+        """Cantidad aproximada de filas, ver `build_estimate_stmt`"""
+        stmt = build_estimate_stmt(self.model, db.get_bind().dialect.name)
+        if stmt is None:
+            return None
+        return parse_estimate(db.scalar(stmt))
+
+    def total_count(
+        self, db: Session, mode: CountMode, include_deleted: bool = False
+    ) -> tuple[int, bool]:
+        """
+        Total para `X-Total-Count`: retorna (total, es_exacto).
+
+        Con `estimated`, la estimación reemplaza al COUNT(*) solo si supera
+        COUNT_ESTIMATE_THRESHOLD; en tablas chicas (o sin estimación) se usa
+        el conteo exacto cacheado, que es barato.
+        """
+        if mode == "estimated":
+            estimate = self.count_estimate(db)
+            if estimate is not None and estimate >= settings.COUNT_ESTIMATE_THRESHOLD:
+                return estimate, False
+        return self.count(db, include_deleted), True
+
+    def iter_all(
+        self, db: Session, batch_size: int = 1000, include_deleted: bool = False
+    ) -> Iterator[ModelType]:
+        """
+        Recorre todos los registros ordenados por (created_at, id) usando un
+        cursor del lado del servidor (`yield_per` implica `stream_results`):
+        se traen `batch_size` filas a la vez y la memoria se mantiene estable
+        sin importar el tamaño de la tabla.
+        """
+        stmt = select(self.model)
+        if not include_deleted:
+            stmt = stmt.where(self.model.deleted_at.is_(None))
+        stmt = stmt.order_by(self.model.created_at, self.model.id)
+        yield from db.scalars(stmt.execution_options(yield_per=batch_size))
+
     def create(self, db: Session, obj_in: CreateSchemaType) -> ModelType:
         """Crear un nuevo registro"""
         obj_in_data = obj_in.model_dump()
@@ -75,3 +300,42 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             db.delete(obj)
             db.commit()
         return obj
+
+    def create_multi(
+        self, db: Session, objs_in: Sequence[CreateSchemaType]
+    ) -> List[ModelType]:
+        """Crear varios registros con un INSERT multi-fila y un solo commit"""
+        if not objs_in:
+            return []
+        objs = list(
+            db.scalars(
+                insert(self.model).returning(self.model),
+                [obj_in.model_dump() for obj_in in objs_in],
+            )
+        )
+        self._commit_detached(db, objs)
+        return objs
+
+    def update_multi(
+        self, db: Session, ids: Sequence[Any], values: dict[str, Any]
+    ) -> List[ModelType]:
+        """
+        Aplica los mismos `values` a varios registros con un solo
+        UPDATE ... WHERE id IN (...) RETURNING. Ignora los eliminados y
+        retorna solo los registros efectivamente actualizados.
+        """
+        if not ids or not values:
+            return []
+        stmt = (
+            update(self.model)
+            .where(self.model.id.in_(ids), self.model.deleted_at.is_(None))
+            .values(**values)
+            .returning(self.model)
+        )
+        objs = list(db.scalars(stmt))
+        self._commit_detached(db, objs)
+        return objs
+
+    def soft_delete_multi(self, db: Session, ids: Sequence[Any]) -> List[ModelType]:
+        """Soft delete de varios registros en un solo UPDATE"""
+        return self.update_multi(db, ids, {"deleted_at": datetime.now(timezone.utc)})
@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional, Sequence, cast
+from uuid import UUID, uuid4
+
+from sqlalchemy import (
+    CursorResult,
+    Delete,
+    Result,
+    Select,
+    Update,
+    delete,
+    select,
+    update,
+)
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.security import create_refresh_token, hash_refresh_token
+from app.models.refresh_token import RefreshToken
+
+
+class InvalidRefreshTokenError(Exception):
+    """El refresh token no existe o expiró"""
+
+
+class RefreshTokenReuseError(InvalidRefreshTokenError):
+    """Se presentó un refresh token ya rotado; se revocó toda su familia"""
+
+
+# Sentencias compartidas por la versión sync y la async
+
+
+def new_refresh_token(
+    user_id: UUID, family_id: Optional[UUID] = None
+) -> tuple[str, RefreshToken]:
+    """Token en claro y la fila a insertar (familia nueva si no se indica)"""
+    token, token_hash = create_refresh_token()
+    db_obj = RefreshToken(
+        user_id=user_id,
+        token_hash=token_hash,
+        family_id=family_id or uuid4(),
+        expires_at=datetime.now(timezone.utc)
+        + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    return token, db_obj
+
+
+def select_valid(token: str) -> Select[tuple[RefreshToken]]:
+    """Token no expirado por su hash (puede estar revocado)"""
+    return select(RefreshToken).where(
+        RefreshToken.token_hash == hash_refresh_token(token),
+        RefreshToken.expires_at > datetime.now(timezone.utc),
+    )
+
+
+def mark_used(db_obj: RefreshToken) -> Update:
+    """
+    Revoca el token solo si nadie lo usó antes: con dos peticiones
+    concurrentes, solo una afecta la fila y la otra cuenta como reuso.
+    """
+    return (
+        update(RefreshToken)
+        .where(RefreshToken.id == db_obj.id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+    )
+
+
+def revoke_family(family_id: UUID) -> Update:
+    return (
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+    )
+
+
+def revoke_for_users(user_ids: Sequence[UUID]) -> Update:
+    """Revoca todos los refresh tokens vigentes de estos usuarios"""
+    return (
+        update(RefreshToken)
+        .where(RefreshToken.user_id.in_(user_ids), RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+    )
+
+
+def delete_expired_batch(batch_size: int) -> Delete:
+    """Borra hasta `batch_size` tokens expirados (revocados o no)"""
+    expired_ids = (
+        select(RefreshToken.id)
+        .where(RefreshToken.expires_at <= datetime.now(timezone.utc))
+        .limit(batch_size)
+    )
+    return delete(RefreshToken).where(RefreshToken.id.in_(expired_ids))
+
+
+def rowcount(result: Result[Any]) -> int:
+    """Filas afectadas por un UPDATE/DELETE ejecutado con `session.execute`"""
+    return cast(CursorResult[Any], result).rowcount
+
+
+class CRUDRefreshToken:
+    def issue(
+        self, db: Session, user_id: UUID, family_id: Optional[UUID] = None
+    ) -> str:
+        """Emite un refresh token y retorna el valor en claro"""
+        token, db_obj = new_refresh_token(user_id, family_id)
+        db.add(db_obj)
+        db.commit()
+        return token
+
+    def rotate(self, db: Session, token: str) -> tuple[UUID, str]:
+        """
+        Consume `token` y emite su reemplazo en la misma familia.
+        Retorna (user_id, nuevo token).
+        """
+        db_obj = db.scalar(select_valid(token))
+        if db_obj is None:
+            raise InvalidRefreshTokenError()
+
+        if rowcount(db.execute(mark_used(db_obj))) == 0:
+            db.execute(revoke_family(db_obj.family_id))
+            db.commit()
+            raise RefreshTokenReuseError()
+
+        user_id = db_obj.user_id
+        return user_id, self.issue(db, user_id, db_obj.family_id)
+
+    def revoke_all_for_user(self, db: Session, user_id: UUID) -> int:
+        """
+        Revoca las sesiones (refresh tokens) del usuario. No hace commit:
+        se confirma junto con el cambio que la motiva (password, baja).
+        """
+        return self.revoke_all_for_users(db, [user_id])
+
+    def revoke_all_for_users(self, db: Session, user_ids: Sequence[UUID]) -> int:
+        """Igual que `revoke_all_for_user`, para varios usuarios"""
+        return rowcount(db.execute(revoke_for_users(user_ids)))
+
+    def purge_expired(self, db: Session, batch_size: int) -> int:
+        """
+        Borra los tokens expirados por lotes, con un commit por lote para no
+        retener bloqueos sobre la tabla. Retorna cuántos se borraron.
+        """
+        total = 0
+        while True:
+            deleted = rowcount(db.execute(delete_expired_batch(batch_size)))
+            db.commit()
+            total += deleted
+            if deleted < batch_size:
+                return total
+
+
+refresh_token = CRUDRefreshToken()
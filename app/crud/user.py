@@ -1,14 +1,234 @@
-from typing import Optional
+from datetime import datetime, timezone
+from typing import Any, List, Literal, Optional, Sequence
+from uuid import UUID
 
+from sqlalchemy import (
+    ColumnElement,
+    Row,
+    Select,
+    Update,
+    and_,
+    func,
+    insert,
+    inspect,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from app.core.security import get_password_hash, verify_password
+from app.core.cache import user_cache
+from app.core.importers import RowError
+from app.core.invalidation import USER, invalidation_bus
+from app.core.security import (
+    get_password_hash,
+    get_password_hash_async,
+    get_password_hashes,
+    token_versions,
+    verify_and_update_password,
+    verify_and_update_password_async,
+)
 from app.crud.base import CRUDBase
-from app.models.user import User
+from app.crud.refresh_token import refresh_token as crud_refresh_token
+from app.crud.refresh_token import rowcount
+from app.models.user import SEARCH_FIELDS, User
 from app.schemas.user import UserCreate, UserUpdate
 
 
+class DuplicateUserError(Exception):
+    """Ya existe un usuario activo con el mismo email o username"""
+
+    def __init__(self, field: str):
+        super().__init__(f"Ya existe un usuario con ese {field}")
+        self.field = field
+
+
+# Índices únicos parciales (WHERE deleted_at IS NULL) -> campo duplicado.
+# Postgres reporta el nombre del índice, SQLite la columna ("users.email").
+UNIQUE_INDEX_FIELDS = {
+    "uq_users_email_active": "email",
+    "uq_users_username_active": "username",
+}
+
+
+# Mensaje por campo duplicado al crear usuarios
+DUPLICATE_MESSAGES = {
+    "email": "El email ya está registrado",
+    "username": "El username ya está en uso",
+}
+
+
+def to_duplicate_error(exc: IntegrityError) -> Optional[DuplicateUserError]:
+    """Traduce la violación de unicidad de email/username, si es una"""
+    message = str(exc.orig)
+    for index_name, field in UNIQUE_INDEX_FIELDS.items():
+        if index_name in message or f"users.{field}" in message:
+            return DuplicateUserError(field)
+    return None
+
+
+def snapshot_user(db_obj: User) -> User:
+    """Copia transitoria (fuera de toda sesión) de las columnas del usuario"""
+    return User(
+        **{attr.key: getattr(db_obj, attr.key) for attr in inspect(User).column_attrs}
+    )
+
+
+def new_user_values(obj_in: UserCreate, hashed_password: str) -> dict[str, Any]:
+    """Columnas de un usuario nuevo (compartido por la versión sync y async)"""
+    return {
+        "email": obj_in.email,
+        "username": obj_in.username,
+        "full_name": obj_in.full_name,
+        "hashed_password": hashed_password,
+        "role": obj_in.role.value,
+        "is_active": True,
+        "is_superuser": False,
+    }
+
+
+# Columnas que cambian lo que el usuario puede hacer: modificarlas revoca sus
+# tokens stateless (ver `TokenVersions`)
+AUTH_FIELDS = frozenset(
+    {"role", "is_active", "is_superuser", "hashed_password", "deleted_at"}
+)
+
+
+# Columnas cuyo cambio cierra las sesiones del usuario: se revocan sus
+# refresh tokens en la misma transacción
+SESSION_FIELDS = frozenset({"hashed_password", "is_active", "deleted_at"})
+
+
+def invalidate_user(id: UUID, token_version: Optional[int] = None) -> None:
+    """
+    Saca al usuario de `user_cache` y publica su `token_version` (la
+    persistida), en este worker y en los demás (`invalidation_bus`)
+    """
+    if token_version is None:
+        token_version = token_versions.get(id)
+    invalidation_bus.publish(USER, id, token_version)
+
+
+def revoking_values(values: dict[str, Any]) -> dict[str, Any]:
+    """
+    `values` más el incremento de `token_version` si cambian campos de
+    autorización, para revocar los tokens en el mismo UPDATE
+    """
+    if AUTH_FIELDS.isdisjoint(values):
+        return values
+    return {**values, "token_version": User.token_version + 1}
+
+
+def token_versions_stmt() -> Select[tuple[UUID, int]]:
+    """
+    Versiones de token persistidas, para cargar `token_versions`. Incluye a
+    los eliminados: sus tokens tienen que seguir revocados
+    """
+    return select(User.id, User.token_version).where(User.token_version > 0)
+
+
+def rehash_password(user: User, new_hash: str) -> Update:
+    """
+    Reemplaza el hash solo si sigue siendo el que se verificó: si el
+    password cambió mientras corría Argon2, el UPDATE no afecta la fila y
+    se mantiene el nuevo.
+    """
+    return (
+        update(User)
+        .where(User.id == user.id, User.hashed_password == user.hashed_password)
+        .values(hashed_password=new_hash)
+        .execution_options(synchronize_session=False)
+    )
+
+
+SearchMatch = Literal["prefix", "contains"]
+
+# Con menos de 3 caracteres no hay trigramas completos y el índice GIN no
+# descarta filas: la búsqueda por subcadena terminaría leyendo toda la tabla
+MIN_CONTAINS_LENGTH = 3
+
+
+def escape_like(value: str) -> str:
+    """Escapa los comodines de LIKE (con `\\` como carácter de escape)"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def build_search_filters(
+    dialect_name: str,
+    q: Optional[str] = None,
+    match: SearchMatch = "prefix",
+    role: Optional[str] = None,
+    is_active: Optional[bool] = None,
+) -> List[ColumnElement[bool]]:
+    """
+    Condiciones de `search_rows`. `q` se compara sin distinguir mayúsculas
+    contra username, email o full_name, con la misma expresión lower(col)
+    de los índices de búsqueda para que el planner los use (ver
+    `SEARCH_FIELDS`).
+    """
+    filters: List[ColumnElement[bool]] = []
+    if role is not None:
+        filters.append(User.role == role)
+    if is_active is not None:
+        filters.append(User.is_active == is_active)
+    if q:
+        term = q.lower()
+        pattern = escape_like(term)
+        pattern = f"{pattern}%" if match == "prefix" else f"%{pattern}%"
+        conditions: List[ColumnElement[bool]] = []
+        for field in SEARCH_FIELDS:
+            lowered = func.lower(getattr(User, field))
+            # Cada rama repite la condición de los índices parciales: SQLite
+            # solo los considera si está dentro de la misma rama del OR
+            condition: ColumnElement[bool] = and_(
+                User.deleted_at.is_(None), lowered.like(pattern, escape="\\")
+            )
+            if match == "prefix" and dialect_name != "postgresql":
+                # SQLite solo usa el índice con un rango; el LIKE queda como
+                # filtro exacto dentro del rango
+                upper = term[:-1] + chr(ord(term[-1]) + 1)
+                condition = and_(lowered >= term, lowered < upper, condition)
+            conditions.append(condition)
+        filters.append(or_(*conditions))
+    return filters
+
+
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
+    def _save(self, db: Session, db_obj: User) -> None:
+        """
+        Commit del usuario en un solo INSERT/UPDATE, sin consultas previas:
+        la unicidad la garantizan los índices parciales y aquí se traduce
+        la violación a `DuplicateUserError`.
+        """
+        try:
+            self._update_db_obj(db, db_obj)
+        except IntegrityError as e:
+            db.rollback()
+            duplicate = to_duplicate_error(e)
+            if duplicate is None:
+                raise
+            raise duplicate from e
+
+    def get_cached(self, db: Session, id: UUID) -> Optional[User]:
+        """
+        Obtener usuario activo por ID pasando por `user_cache`.
+        Retorna una copia desacoplada de la sesión: sirve para leer atributos,
+        pero no se debe modificar ni agregar a una sesión.
+        """
+        cached = user_cache.get(id)
+        if cached is not None:
+            return cached
+
+        db_obj = self.get(db, id=id)
+        if db_obj is None:
+            return None
+
+        snapshot = snapshot_user(db_obj)
+        user_cache.set(id, snapshot)
+        return snapshot
+
     def get_by_email(self, db: Session, email: str) -> Optional[User]:
         """Obtener usuario por email"""
         return (
@@ -25,20 +245,131 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
             .first()
         )
 
+    def search_rows(
+        self,
+        db: Session,
+        columns: Sequence[str],
+        q: Optional[str] = None,
+        match: SearchMatch = "prefix",
+        role: Optional[str] = None,
+        is_active: Optional[bool] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+    ) -> tuple[List[Row[Any]], Optional[str]]:
+        """
+        Buscar usuarios no eliminados por texto, rol y estado. Pagina por
+        cursor como `get_page_rows`, de la que es un caso particular.
+        """
+        filters = build_search_filters(
+            db.get_bind().dialect.name, q, match, role, is_active
+        )
+        return self.get_page_rows(
+            db, columns, cursor=cursor, limit=limit, filters=filters
+        )
+
     def create(self, db: Session, obj_in: UserCreate) -> User:
         """Crear usuario con password hashed"""
-        db_obj = User(
-            email=obj_in.email,
-            username=obj_in.username,
-            full_name=obj_in.full_name,
-            hashed_password=get_password_hash(obj_in.password),
-            role=obj_in.role.value,
-            is_active=True,
-            is_superuser=False,
-        )
-        self._update_db_obj(db, db_obj)
+        db_obj = User(**new_user_values(obj_in, get_password_hash(obj_in.password)))
+        self._save(db, db_obj)
+        return db_obj
+
+    async def create_async(self, db: Session, obj_in: UserCreate) -> User:
+        """
+        `create` para endpoints async con sesión sync: el hash se espera en
+        el pool sin ocupar un thread y el INSERT corre en el threadpool.
+        """
+        hashed_password = await get_password_hash_async(obj_in.password)
+        db_obj = User(**new_user_values(obj_in, hashed_password))
+        await run_in_threadpool(self._save, db, db_obj)
         return db_obj
 
+    def create_multi(self, db: Session, objs_in: Sequence[UserCreate]) -> List[User]:
+        """
+        Crear varios usuarios con un INSERT multi-fila y un solo commit. Los
+        passwords se hashean en el pool; un duplicado de email/username
+        cancela todo el lote con `DuplicateUserError`.
+        """
+        if not objs_in:
+            return []
+        hashed_passwords = get_password_hashes(obj_in.password for obj_in in objs_in)
+        rows = [
+            new_user_values(obj_in, hashed_password)
+            for obj_in, hashed_password in zip(objs_in, hashed_passwords)
+        ]
+        try:
+            objs = list(db.scalars(insert(User).returning(User), rows))
+        except IntegrityError as e:
+            db.rollback()
+            duplicate = to_duplicate_error(e)
+            if duplicate is None:
+                raise
+            raise duplicate from e
+        self._commit_detached(db, objs)
+        return objs
+
+    def create_batch(
+        self,
+        db: Session,
+        users_in: Sequence[tuple[int, UserCreate]],
+        hashed_passwords: Sequence[str],
+    ) -> List[RowError]:
+        """
+        Crear un lote de usuarios (importación masiva) con un INSERT multi-fila
+        y un solo commit. `users_in` son pares (fila, usuario) y
+        `hashed_passwords` sus hashes ya calculados, en el mismo orden.
+
+        Los duplicados se detectan con una sola consulta por lote y se
+        reportan por fila; el resto del lote se crea igual.
+        """
+        errors: List[RowError] = []
+        existing = db.execute(
+            select(User.email, User.username).where(
+                User.deleted_at.is_(None),
+                or_(
+                    User.email.in_({u.email for _, u in users_in}),
+                    User.username.in_({u.username for _, u in users_in}),
+                ),
+            )
+        ).all()
+        taken_emails = {r.email for r in existing}
+        taken_usernames = {r.username for r in existing}
+
+        rows: List[tuple[int, dict[str, Any]]] = []
+        for (row, user_in), hashed_password in zip(users_in, hashed_passwords):
+            # Detecta también duplicados dentro del mismo archivo
+            if user_in.email in taken_emails:
+                errors.append((row, DUPLICATE_MESSAGES["email"]))
+                continue
+            if user_in.username in taken_usernames:
+                errors.append((row, DUPLICATE_MESSAGES["username"]))
+                continue
+            taken_emails.add(user_in.email)
+            taken_usernames.add(user_in.username)
+            rows.append((row, new_user_values(user_in, hashed_password)))
+
+        if not rows:
+            return errors
+
+        try:
+            db.execute(insert(User), [values for _, values in rows])
+            db.commit()
+        except IntegrityError:
+            # Otro request creó un duplicado entre la consulta y el INSERT:
+            # se reintenta fila por fila para aislar las que fallan
+            db.rollback()
+            for row, values in rows:
+                try:
+                    with db.begin_nested():
+                        db.execute(insert(User).values(**values))
+                except IntegrityError as e:
+                    duplicate = to_duplicate_error(e)
+                    if duplicate is None:
+                        raise
+                    errors.append((row, DUPLICATE_MESSAGES[duplicate.field]))
+            db.commit()
+
+        return errors
+
     def update(self, db: Session, db_obj: User, obj_in: UserUpdate) -> User:
         """Actualizar usuario, hace hash del password si se proporciona"""
         update_data = obj_in.model_dump(exclude_unset=True)
@@ -51,12 +382,57 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         if "role" in update_data:
             update_data["role"] = update_data["role"].value
 
-        for field, value in update_data.items():
+        for field, value in revoking_values(update_data).items():
             setattr(db_obj, field, value)
 
-        self._update_db_obj(db, db_obj)
+        if not SESSION_FIELDS.isdisjoint(update_data):
+            crud_refresh_token.revoke_all_for_user(db, db_obj.id)
+        self._save(db, db_obj)
+        invalidate_user(db_obj.id, db_obj.token_version)
         return db_obj
 
+    def soft_delete(self, db: Session, id: Any) -> Optional[User]:
+        """
+        Soft delete que además invalida el cache y revoca los tokens (access
+        y refresh), todo en la misma transacción
+        """
+        crud_refresh_token.revoke_all_for_user(db, id)
+        obj = self.get(db, id)
+        if obj:
+            for field, value in revoking_values(
+                {"deleted_at": datetime.now(timezone.utc)}
+            ).items():
+                setattr(obj, field, value)
+            self._update_db_obj(db, obj)
+            invalidate_user(id, obj.token_version)
+        return obj
+
+    def hard_delete(self, db: Session, id: Any) -> Optional[User]:
+        """
+        Hard delete que además invalida el cache y revoca los tokens. La
+        fila ya no existe: la versión nueva queda solo en memoria y se
+        pierde con un reinicio (sin endpoint que lo use)
+        """
+        obj = super().hard_delete(db, id)
+        if obj:
+            invalidate_user(id, obj.token_version + 1)
+        return obj
+
+    def update_multi(
+        self, db: Session, ids: Sequence[Any], values: dict[str, Any]
+    ) -> List[User]:
+        """Actualización masiva que además invalida el cache de cada usuario"""
+        if ids and not SESSION_FIELDS.isdisjoint(values):
+            crud_refresh_token.revoke_all_for_users(db, ids)
+        users = super().update_multi(db, ids, revoking_values(values))
+        for user in users:
+            invalidate_user(user.id, user.token_version)
+        return users
+
+    def get_token_versions(self, db: Session) -> dict[UUID, int]:
+        """Versiones de token persistidas (solo las distintas de 0)"""
+        return dict(db.execute(token_versions_stmt()).tuples().all())
+
     def authenticate(self, db: Session, username: str, password: str) -> Optional[User]:
         """Autenticar usuario (usado en login)"""
         user = self.get_by_username(db, username)
@@ -65,8 +441,43 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         if not user.is_active:
             return None
 
-        # Si `verify_password` es true, se retorna el user, si no None
-        return user if verify_password(password, user.hashed_password) else None
+        valid, new_hash = verify_and_update_password(password, user.hashed_password)
+        if not valid:
+            return None
+        if new_hash is not None:
+            self._rehash(db, user, new_hash)
+        return user
+
+    async def authenticate_async(
+        self, db: Session, username: str, password: str
+    ) -> Optional[User]:
+        """
+        `authenticate` para endpoints async con sesión sync: las consultas
+        corren en el threadpool y la verificación se espera en el pool de
+        hashing, sin bloquear un thread mientras corre Argon2.
+        """
+        user = await run_in_threadpool(self.get_by_username, db, username)
+        if not user:
+            return None
+        if not user.is_active:
+            return None
+
+        valid, new_hash = await verify_and_update_password_async(
+            password, user.hashed_password
+        )
+        if not valid:
+            return None
+        if new_hash is not None:
+            await run_in_threadpool(self._rehash, db, user, new_hash)
+        return user
+
+    def _rehash(self, db: Session, user: User, new_hash: str) -> None:
+        # Hash con parámetros de Argon2 anteriores: se reemplaza aprovechando
+        # que tenemos el password en claro. No revoca tokens (no cambió nada)
+        replaced = rowcount(db.execute(rehash_password(user, new_hash)))
+        db.commit()
+        if replaced:
+            invalidate_user(user.id)
 
 
 # Instancia única para usar en los endpoints
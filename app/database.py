@@ -1,15 +1,211 @@
-from typing import Any, Generator
+import time
+from typing import Any, AsyncGenerator, Callable, Generator
 
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, create_engine, make_url
+from sqlalchemy.engine.default import DefaultDialect
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+from sqlalchemy.pool import ConnectionPoolEntry, QueuePool
+from starlette.requests import Request
 
 from app.config import settings
+from app.core.metrics import db_pool_wait_seconds, registry
+from app.core.query_stats import instrument_engine
+from app.core.replicas import (
+    ReplicaSet,
+    RoutingSession,
+    request_uses_primary,
+    stick_to_primary,
+)
 
-# Crear el engine
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, echo=settings.DEBUG)
 
-# SessionLocal
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+class TimedQueuePool(QueuePool):
+    """QueuePool que mide cuánto se espera por una conexión libre"""
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_wait_seconds.observe(time.perf_counter() - start)
+
+
+def _pool_class(url: str) -> type[QueuePool] | None:
+    """TimedQueuePool si el dialecto usa QueuePool; si no, el pool por defecto"""
+    parsed = make_url(url)
+    dialect = parsed.get_dialect()
+    if issubclass(dialect, DefaultDialect) and issubclass(
+        dialect.get_pool_class(parsed), QueuePool
+    ):
+        return TimedQueuePool
+    return None
+
+
+# El engine sync se crea en el primer uso (o en el lifespan de la app):
+# importar la app no abre conexiones ni requiere una DATABASE_URL alcanzable
+_engine: Engine | None = None
+_replicas: ReplicaSet | None = None
+_SessionLocal: sessionmaker[RoutingSession] | None = None
+
+
+def register_pool_metrics() -> None:
+    """Gauges del pool del engine sync, leídos al exponer /metrics"""
+
+    def pool_stat(name: str) -> Callable[[], float]:
+        def read() -> float:
+            # El engine puede no existir aún y engine.pool cambia tras
+            # dispose(); solo QueuePool tiene estos datos
+            pool = _engine.pool if _engine is not None else None
+            stat = getattr(pool, name, None)
+            return stat() if callable(stat) else 0
+
+        return read
+
+    for name, method, documentation in (
+        ("db_pool_size", "size", "Conexiones permanentes del pool"),
+        ("db_pool_checked_out", "checkedout", "Conexiones en uso"),
+        ("db_pool_checked_in", "checkedin", "Conexiones libres en el pool"),
+        ("db_pool_overflow", "overflow", "Conexiones abiertas por encima de size"),
+    ):
+        registry.gauge(name, documentation, pool_stat(method))
+
+
+register_pool_metrics()
+
+
+def _create_engine(url: str) -> Engine:
+    engine = create_engine(
+        url,
+        pool_pre_ping=True,
+        echo=settings.DEBUG,
+        poolclass=_pool_class(url),
+    )
+    instrument_engine(engine)
+    return engine
+
+
+def get_engine() -> Engine:
+    global _engine
+    if _engine is None:
+        _engine = _create_engine(settings.DATABASE_URL)
+    return _engine
+
+
+def get_replicas() -> ReplicaSet | None:
+    """Réplicas de lectura de DATABASE_REPLICA_URLS (None si no hay)"""
+    global _replicas
+    if _replicas is None and settings.DATABASE_REPLICA_URLS:
+        _replicas = ReplicaSet(
+            [_create_engine(url) for url in settings.DATABASE_REPLICA_URLS],
+            eject_seconds=settings.DATABASE_REPLICA_EJECT_SECONDS,
+        )
+    return _replicas
+
+
+def get_sessionmaker() -> sessionmaker[RoutingSession]:
+    global _SessionLocal
+    if _SessionLocal is None:
+        _SessionLocal = sessionmaker(
+            class_=RoutingSession,
+            autocommit=False,
+            autoflush=False,
+            bind=get_engine(),
+            replicas=get_replicas(),
+        )
+    return _SessionLocal
+
+
+def dispose_engine() -> None:
+    global _engine, _replicas, _SessionLocal
+    if _engine is not None:
+        _engine.dispose()
+    if _replicas is not None:
+        _replicas.dispose()
+    _engine = None
+    _replicas = None
+    _SessionLocal = None
+
+
+# Driver async equivalente a cada backend sync
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Convierte una URL de DB sync a su driver async (asyncpg / aiosqlite)"""
+    parsed = make_url(url)
+    if parsed.get_dialect().is_async:
+        return url
+    drivername = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if drivername is None:
+        raise ValueError(f"No hay driver async para '{parsed.drivername}'")
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+# El engine async se crea en el primer uso para que importar la app no
+# requiera asyncpg/aiosqlite si solo se usan las rutas sync
+_async_engine: AsyncEngine | None = None
+_async_replica_engines: list[AsyncEngine] = []
+_AsyncSessionLocal: async_sessionmaker[AsyncSession] | None = None
+
+
+def _create_async_engine(url: str) -> AsyncEngine:
+    engine = create_async_engine(url, pool_pre_ping=True, echo=settings.DEBUG)
+    instrument_engine(engine.sync_engine)
+    return engine
+
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = _create_async_engine(
+            settings.ASYNC_DATABASE_URL or to_async_url(settings.DATABASE_URL)
+        )
+    return _async_engine
+
+
+def get_async_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    global _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        replicas = None
+        if settings.DATABASE_REPLICA_URLS:
+            _async_replica_engines[:] = [
+                _create_async_engine(to_async_url(url))
+                for url in settings.DATABASE_REPLICA_URLS
+            ]
+            # La sesión async enruta con la Session sync que envuelve
+            replicas = ReplicaSet(
+                [engine.sync_engine for engine in _async_replica_engines],
+                eject_seconds=settings.DATABASE_REPLICA_EJECT_SECONDS,
+            )
+        # expire_on_commit=False: en async no se pueden hacer lazy loads
+        # implícitos al leer atributos después del commit
+        _AsyncSessionLocal = async_sessionmaker(
+            bind=get_async_engine(),
+            autoflush=False,
+            expire_on_commit=False,
+            sync_session_class=RoutingSession,
+            replicas=replicas,
+        )
+    return _AsyncSessionLocal
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    for engine in _async_replica_engines:
+        await engine.dispose()
+    _async_replica_engines.clear()
+    _async_engine = None
+    _AsyncSessionLocal = None
 
 
 # Base moderna con mejor type checking
@@ -18,9 +214,19 @@ class Base(DeclarativeBase):
 
 
 # Dependency para obtener la sesión de DB
-def get_db() -> Generator[Session, Any, None]:
-    db = SessionLocal()
+def get_db(request: Request) -> Generator[Session, Any, None]:
+    db = get_sessionmaker()()
+    if request_uses_primary(request):
+        stick_to_primary(db)
     try:
         yield db
     finally:
         db.close()
+
+
+# Dependency para obtener la sesión async de DB
+async def get_async_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    async with get_async_sessionmaker()() as db:
+        if request_uses_primary(request):
+            stick_to_primary(db)
+        yield db
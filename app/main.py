@@ -1,16 +1,127 @@
-from fastapi import Depends, FastAPI
+import asyncio
+import contextlib
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import Depends, FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from sqlalchemy.orm import Session
 
-from app.api.v1 import auth, users
 from app.config import settings
-from app.database import get_db
+from app.core import metrics
+from app.core.cache import count_cache, user_cache
+from app.core.compression import CompressionMiddleware
+from app.core.invalidation import PostgresInvalidationBackend, invalidation_bus
+from app.core.query_stats import QueryStatsMiddleware
+from app.core.security import (
+    HashingPoolBusyError,
+    hashing_pool,
+    token_verifier,
+    token_versions,
+    warm_up,
+)
+from app.core.throttling import LoginThrottledError
+from app.crud.base import build_count_stmt
+from app.crud.refresh_token import refresh_token as crud_refresh_token
+from app.crud.user import user as crud_user
+from app.database import (
+    dispose_async_engine,
+    dispose_engine,
+    get_db,
+    get_engine,
+    get_sessionmaker,
+)
 from app.models import User
 
+logger = logging.getLogger(__name__)
+
+
+def purge_expired_refresh_tokens() -> int:
+    with get_sessionmaker()() as db:
+        return crud_refresh_token.purge_expired(
+            db, batch_size=settings.REFRESH_TOKEN_PURGE_BATCH_SIZE
+        )
+
+
+def load_token_versions() -> None:
+    generation = token_versions.generation
+    with get_sessionmaker()() as db:
+        token_versions.load(crud_user.get_token_versions(db), generation)
+
+
+async def sync_token_versions_periodically(interval: float) -> None:
+    """
+    Carga `token_versions` de la DB al arrancar y cada vez que el bus de
+    invalidación la desincroniza (reconexión o reset), reintentando cada
+    `interval` segundos si falla
+    """
+    while True:
+        if not token_versions.synced:
+            try:
+                await asyncio.to_thread(load_token_versions)
+            except Exception:
+                logger.exception("Falló la carga de versiones de tokens")
+        await asyncio.sleep(interval)
+
+
+async def purge_refresh_tokens_periodically(interval: int) -> None:
+    """Purga los refresh tokens expirados cada `interval` segundos"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            purged = await asyncio.to_thread(purge_expired_refresh_tokens)
+        except Exception:
+            logger.exception("Falló la purga de refresh tokens expirados")
+        else:
+            logger.info("Refresh tokens expirados purgados: %d", purged)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Lo que no se crea al importar se crea acá, antes de aceptar peticiones
+    engine = get_engine()
+    warm_up()
+    if settings.CACHE_INVALIDATION_BACKEND == "postgres":
+        invalidation_bus.backend = PostgresInvalidationBackend(
+            engine,
+            settings.CACHE_INVALIDATION_CHANNEL,
+            outbox_size=settings.CACHE_INVALIDATION_OUTBOX_SIZE,
+        )
+    invalidation_bus.start()
+    # Después de suscribirse al bus, así no se pierde un incremento que
+    # llegue mientras se leen las versiones
+    sync_task = None
+    if settings.STATELESS_AUTH:
+        sync_task = asyncio.create_task(
+            sync_token_versions_periodically(settings.TOKEN_VERSIONS_SYNC_SECONDS)
+        )
+    purge_task = None
+    if settings.REFRESH_TOKEN_PURGE_INTERVAL_SECONDS > 0:
+        purge_task = asyncio.create_task(
+            purge_refresh_tokens_periodically(
+                settings.REFRESH_TOKEN_PURGE_INTERVAL_SECONDS
+            )
+        )
+    yield
+    for task in (sync_task, purge_task):
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+    invalidation_bus.stop()
+    # Espera a que terminen los hashes en curso antes de salir
+    hashing_pool.shutdown()
+    dispose_engine()
+    await dispose_async_engine()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 # Configurar CORS para que tu frontend (SvelteKit) pueda comunicarse
@@ -22,11 +133,57 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.COMPRESSION_MIN_SIZE > 0:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    )
+
+if settings.QUERY_STATS_ENABLED:
+    app.add_middleware(QueryStatsMiddleware)
+
+# Agregado al final para quedar por fuera de los demás middlewares y medir
+# la petición completa
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+
+@app.exception_handler(HashingPoolBusyError)
+def hashing_pool_busy_handler(
+    request: Request, exc: HashingPoolBusyError
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Servicio ocupado, intenta de nuevo en unos segundos"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(LoginThrottledError)
+def login_throttled_handler(request: Request, exc: LoginThrottledError) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Demasiados intentos de login, intenta más tarde"},
+        headers={"Retry-After": exc.retry_after_header},
+    )
+
+
+# Con ASYNC_ROUTES se sirven las mismas rutas sobre AsyncSession. Solo se
+# importa la variante en uso
+if settings.ASYNC_ROUTES:
+    from app.api.v1.auth_async import router as auth_router
+    from app.api.v1.users_async import router as users_router
+else:
+    from app.api.v1.auth import router as auth_router
+    from app.api.v1.users import router as users_router
+
 # Incluir Auth router bajo /v1/auth
-app.include_router(auth.router, prefix=f"{settings.API_V1_STR}/auth", tags=["auth"])
+app.include_router(auth_router, prefix=f"{settings.API_V1_STR}/auth", tags=["auth"])
 
 # Incluir Auth router bajo /v1/users
-app.include_router(users.router, prefix=f"{settings.API_V1_STR}/users", tags=["users"])
+app.include_router(users_router, prefix=f"{settings.API_V1_STR}/users", tags=["users"])
 
 
 # Ruta de prueba
@@ -47,9 +204,30 @@ def health_check() -> dict[str, str]:
 
 @app.get("/test-db")
 def test_database(db: Session = Depends(get_db)) -> dict[str, str | int]:
-    user_count = db.query(User).count()
+    # Sin cache: este endpoint verifica la conexión
+    user_count = db.scalar(build_count_stmt(User, include_deleted=True)) or 0
     return {
         "status": "Database connected!",
         "users_count": user_count,
         "table": "users with UUID, soft delete, and timestamps",
     }
+
+
+@app.get("/cache-stats")
+def cache_stats() -> dict[str, dict[str, int | float]]:
+    """Contadores de hits/misses de los caches en memoria de este worker"""
+    return {
+        user_cache.name: user_cache.stats(),
+        count_cache.name: count_cache.stats(),
+        token_verifier.cache.name: token_verifier.stats(),
+    }
+
+
+if settings.METRICS_ENABLED:
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics_endpoint() -> PlainTextResponse:
+        """Métricas de este worker en formato de exposición de Prometheus"""
+        return PlainTextResponse(
+            metrics.registry.render(), media_type=metrics.CONTENT_TYPE
+        )
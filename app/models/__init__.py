@@ -1,9 +1,11 @@
 from app.models.base import BaseModel
 from app.models.enums import UserRole
+from app.models.refresh_token import RefreshToken
 from app.models.user import User
 
 __all__ = [
     "UserRole",
     "BaseModel",
     "User",
+    "RefreshToken",
 ]
@@ -7,6 +7,10 @@ from sqlalchemy.orm import Mapped, mapped_column
 from app.database import Base
 
 
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
 class BaseModel(Base):
     __abstract__ = True  # Indica que esta clase no crea tabla propia
 
@@ -16,11 +20,10 @@ class BaseModel(Base):
     # Soft delete
     deleted_at: Mapped[Optional[datetime]] = mapped_column(default=None)
 
-    # Timestamps
-    created_at: Mapped[datetime] = mapped_column(default=datetime.now(timezone.utc))
-    updated_at: Mapped[datetime] = mapped_column(
-        default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc)
-    )
+    # Timestamps: se pasa la función (no su resultado) para que se evalúe
+    # en cada INSERT/UPDATE y no una sola vez al importar el módulo
+    created_at: Mapped[datetime] = mapped_column(default=utcnow)
+    updated_at: Mapped[datetime] = mapped_column(default=utcnow, onupdate=utcnow)
 
     @property
     def is_deleted(self) -> bool:
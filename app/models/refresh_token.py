@@ -0,0 +1,31 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import BaseModel
+
+
+class RefreshToken(BaseModel):
+    """
+    Refresh token opaco. Solo se guarda su hash: el token en claro lo
+    tiene únicamente el cliente.
+
+    Cada uso lo rota: se marca `revoked_at` y se emite otro en la misma
+    familia (`family_id`). Presentar un token ya rotado indica que fue
+    robado, y se revoca toda la familia.
+    """
+
+    __tablename__ = "refresh_tokens"
+
+    user_id: Mapped[UUID] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), index=True
+    )
+    # sha256 del token; la búsqueda al refrescar es por este índice único
+    token_hash: Mapped[str] = mapped_column(unique=True)
+    family_id: Mapped[UUID] = mapped_column(index=True)
+    # Indexado para la purga por lotes de tokens expirados
+    expires_at: Mapped[datetime] = mapped_column(index=True)
+    revoked_at: Mapped[Optional[datetime]] = mapped_column(default=None)
@@ -1,3 +1,4 @@
+from sqlalchemy import DDL, Index, event, func, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.base import BaseModel
@@ -6,12 +7,73 @@ from app.models.enums import UserRole
 
 class User(BaseModel):
     __tablename__ = "users"
+    __table_args__ = (
+        # Soporta la paginación por cursor ordenada por (created_at, id)
+        Index("ix_users_created_at_id", "created_at", "id"),
+        # Email y username únicos solo entre usuarios no eliminados, así un
+        # usuario con soft delete no bloquea volver a usar su email/username
+        Index(
+            "uq_users_email_active",
+            "email",
+            unique=True,
+            postgresql_where=text("deleted_at IS NULL"),
+            sqlite_where=text("deleted_at IS NULL"),
+        ),
+        Index(
+            "uq_users_username_active",
+            "username",
+            unique=True,
+            postgresql_where=text("deleted_at IS NULL"),
+            sqlite_where=text("deleted_at IS NULL"),
+        ),
+    )
 
     # Con Mapped, el type checker entiende los tipos correctamente
-    email: Mapped[str] = mapped_column(unique=True, index=True)
-    username: Mapped[str] = mapped_column(unique=True, index=True)
+    email: Mapped[str] = mapped_column()
+    username: Mapped[str] = mapped_column()
     full_name: Mapped[str] = mapped_column()
     hashed_password: Mapped[str] = mapped_column()
     is_active: Mapped[bool] = mapped_column(default=True)
     is_superuser: Mapped[bool] = mapped_column(default=False)
     role: Mapped[str] = mapped_column(default=UserRole.SELLER.value)
+    # Se incrementa en el mismo UPDATE que cambia rol, password, activo o
+    # elimina al usuario; los tokens stateless con una versión anterior
+    # dejan de valer (ver `TokenVersions`)
+    token_version: Mapped[int] = mapped_column(default=0, server_default=text("0"))
+
+
+# Búsqueda case-insensitive por prefijo y subcadena (ver `build_search_filters`),
+# sobre lower(columna) y solo filas no eliminadas:
+# - btree con text_pattern_ops: `LIKE 'ana%'` usa el índice con cualquier
+#   collation. En SQLite es un btree común y el prefijo se busca por rango,
+#   porque SQLite no aplica la optimización de LIKE a expresiones.
+# - GIN de trigramas (pg_trgm, solo Postgres): `LIKE '%ana%'`. En SQLite la
+#   subcadena recorre la tabla; sirve para desarrollo, no para volumen.
+SEARCH_FIELDS = ("username", "email", "full_name")
+
+for _field in SEARCH_FIELDS:
+    _lowered = func.lower(getattr(User, _field)).label(f"{_field}_lower")
+    Index(
+        f"ix_users_{_field}_lower",
+        _lowered,
+        postgresql_ops={_lowered.name: "text_pattern_ops"},
+        postgresql_where=text("deleted_at IS NULL"),
+        sqlite_where=text("deleted_at IS NULL"),
+    )
+    Index(
+        f"ix_users_{_field}_trgm",
+        _lowered,
+        postgresql_using="gin",
+        postgresql_ops={_lowered.name: "gin_trgm_ops"},
+        postgresql_where=text("deleted_at IS NULL"),
+    ).ddl_if(dialect="postgresql")
+
+# Con create_all (tests, benchmarks) la extensión se crea junto a la tabla;
+# en despliegues la crea la migración
+event.listen(
+    User.__table__,
+    "before_create",
+    DDL(  # type: ignore[no-untyped-call]
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+    ).execute_if(dialect="postgresql"),
+)
@@ -1,9 +1,14 @@
 from app.schemas.access_token import AccessTokenData
 from app.schemas.user import (
+    ImportRowError,
+    RefreshTokenRequest,
     Token,
     TokenData,
     UserBase,
+    UserBulkIds,
+    UserBulkUpdate,
     UserCreate,
+    UserImportSummary,
     UserLogin,
     UserResponse,
     UserUpdate,
@@ -16,6 +21,11 @@ __all__ = [
     "UserResponse",
     "UserLogin",
     "Token",
+    "RefreshTokenRequest",
     "TokenData",
     "AccessTokenData",
+    "ImportRowError",
+    "UserImportSummary",
+    "UserBulkIds",
+    "UserBulkUpdate",
 ]
@@ -16,6 +16,12 @@ class AccessTokenData(BaseModel):
     # Expiration timestamp - optional for definition, but usually present
     exp: Optional[datetime] = None
 
+    # Claims de autorización, solo presentes con STATELESS_AUTH
+    role: Optional[str] = None
+    is_superuser: Optional[bool] = None
+    # Versión de tokens del usuario al emitirlo; si luego cambia, se revoca
+    token_version: Optional[int] = None
+
     # mode="plain" means runs for python & json mode, but you can specify mode="json"
     @field_serializer("sub", mode="plain")
     @classmethod
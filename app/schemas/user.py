@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, ConfigDict, EmailStr, Field
@@ -43,6 +43,30 @@ class UserResponse(UserBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+# Operaciones masivas sobre una lista de usuarios
+class UserBulkIds(BaseModel):
+    ids: List[UUID] = Field(..., min_length=1, max_length=1000)
+
+
+class UserBulkUpdate(UserBulkIds):
+    role: Optional[UserRole] = None
+    is_active: Optional[bool] = None
+
+
+# Resultado de la importación masiva de usuarios
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+
+class UserImportSummary(BaseModel):
+    total: int = 0
+    created: int = 0
+    failed: int = 0
+    # Se limita a USER_IMPORT_MAX_ERRORS; `failed` siempre es el total real
+    errors: List[ImportRowError] = []
+
+
 # Para login
 class UserLogin(BaseModel):
     username: str
@@ -53,6 +77,12 @@ class UserLogin(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    # Opaco; se canjea en /auth/refresh por un nuevo par de tokens
+    refresh_token: Optional[str] = None
+
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 
 class TokenData(BaseModel):
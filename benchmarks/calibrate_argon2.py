@@ -0,0 +1,122 @@
+"""
+Calibración de Argon2id para este host.
+
+Mide hashes con distintos parámetros y elige el costo más alto que entra en
+el presupuesto de latencia por verificación. Se usa la mayor memoria
+permitida y se sube `time_cost`; si ni con `time_cost=1` entra, se reduce
+la memoria (sin bajar de `--min-memory-mib`).
+
+    python -m benchmarks.calibrate_argon2 --target-ms 250
+
+Imprime las variables ARGON2_* para el `.env`. Al cambiarlas, los hashes
+existentes se actualizan en el siguiente login de cada usuario.
+"""
+
+import argparse
+import os
+import statistics
+import time
+from typing import List, Optional
+
+from passlib.hash import argon2
+
+
+def measure_ms(
+    time_cost: int, memory_cost: int, parallelism: int, samples: int
+) -> float:
+    """Mediana en ms de `samples` hashes con estos parámetros"""
+    hasher = argon2.using(
+        rounds=time_cost, memory_cost=memory_cost, parallelism=parallelism
+    )
+    timings: List[float] = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        hasher.hash("calibration-password")
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(
+    target_ms: float,
+    max_memory_kib: int,
+    min_memory_kib: int,
+    parallelism: int,
+    samples: int,
+) -> tuple[int, int, float]:
+    """Retorna (time_cost, memory_cost, ms medidos)"""
+
+    def trial(time_cost: int, memory_cost: int) -> float:
+        elapsed = measure_ms(time_cost, memory_cost, parallelism, samples)
+        print(
+            f"  t={time_cost:<3} m={memory_cost // 1024:>5} MiB "
+            f"p={parallelism}  {elapsed:8.1f} ms"
+        )
+        return elapsed
+
+    memory_cost = max_memory_kib
+    elapsed = trial(1, memory_cost)
+    while elapsed > target_ms and memory_cost // 2 >= min_memory_kib:
+        memory_cost //= 2
+        elapsed = trial(1, memory_cost)
+    if elapsed > target_ms:
+        return 1, memory_cost, elapsed
+
+    time_cost = 1
+    while True:
+        next_elapsed = trial(time_cost + 1, memory_cost)
+        if next_elapsed > target_ms:
+            return time_cost, memory_cost, elapsed
+        time_cost, elapsed = time_cost + 1, next_elapsed
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1].strip())
+    parser.add_argument(
+        "--target-ms",
+        type=float,
+        default=250,
+        help="Latencia máxima de un hash/verify",
+    )
+    parser.add_argument("--max-memory-mib", type=int, default=64)
+    parser.add_argument(
+        "--min-memory-mib",
+        type=int,
+        default=19,
+        help="Piso de memoria (19 MiB es el mínimo que recomienda OWASP)",
+    )
+    parser.add_argument(
+        "--parallelism",
+        type=int,
+        default=min(4, os.cpu_count() or 1),
+        help="Hilos por hash (por defecto, min(4, núcleos))",
+    )
+    parser.add_argument("--samples", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"Calibrando Argon2id para {args.target_ms:.0f} ms por hash:")
+    time_cost, memory_cost, elapsed = calibrate(
+        args.target_ms,
+        args.max_memory_mib * 1024,
+        args.min_memory_mib * 1024,
+        args.parallelism,
+        args.samples,
+    )
+    if elapsed > args.target_ms:
+        print(
+            f"\nAviso: el mínimo de seguridad ya tarda {elapsed:.0f} ms, "
+            "por encima del presupuesto."
+        )
+
+    # El pool de hashing corre min(4, núcleos) verificaciones a la vez
+    workers = min(4, os.cpu_count() or 1)
+    print(
+        f"\n~{elapsed:.0f} ms por login, hasta ~{workers * 1000 / elapsed:.0f} "
+        f"logins/s por worker con {workers} hilos de hashing.\n"
+    )
+    print(f"ARGON2_TIME_COST={time_cost}")
+    print(f"ARGON2_MEMORY_COST={memory_cost}")
+    print(f"ARGON2_PARALLELISM={args.parallelism}")
+
+
+if __name__ == "__main__":
+    main()
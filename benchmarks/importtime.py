@@ -0,0 +1,110 @@
+"""
+Presupuesto de tiempo de arranque: cuánto tarda `import app.main`.
+
+Importa el módulo en procesos nuevos con `python -X importtime`, toma la
+mediana del tiempo acumulado y falla (exit 1) si supera `--budget-ms` o si
+se importó algún módulo de `--forbid`, que debe cargarse recién en el
+lifespan o en el primer uso.
+
+    python -m benchmarks.importtime --budget-ms 1500
+
+Imprime los paquetes que más aportan, para saber qué diferir.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+# Se crean en el lifespan o en el primer uso (ver app.core.security)
+DEFAULT_FORBIDDEN = ("jose", "passlib")
+
+
+def run_importtime(module: str) -> Dict[str, tuple[int, int]]:
+    """
+    Importa `module` en un proceso nuevo; retorna {módulo: (self, acumulado)}
+    en microsegundos, según `-X importtime`.
+    """
+    env = dict(os.environ)
+    # Valores para poder importar sin .env; no se abre ninguna conexión
+    env.setdefault("DATABASE_URL", "sqlite://")
+    env.setdefault("SECRET_KEY", "importtime-secret-key-not-for-production")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    timings: Dict[str, tuple[int, int]] = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            continue  # encabezado
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def by_package(timings: Dict[str, tuple[int, int]]) -> Dict[str, int]:
+    """Tiempo propio (us) sumado por paquete de primer nivel"""
+    totals: Dict[str, int] = defaultdict(int)
+    for name, (self_us, _) in timings.items():
+        totals[name.split(".")[0]] += self_us
+    return dict(totals)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1].strip())
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=1500,
+        help="Tiempo máximo (mediana) para importar el módulo",
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--forbid",
+        nargs="*",
+        default=list(DEFAULT_FORBIDDEN),
+        help="Módulos que no deben importarse con el módulo",
+    )
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    # La primera corrida compila los .pyc; no cuenta
+    run_importtime(args.module)
+    runs = [run_importtime(args.module) for _ in range(args.runs)]
+    totals_ms = [run[args.module][1] / 1000 for run in runs]
+    median_ms = statistics.median(totals_ms)
+
+    packages = by_package(runs[-1])
+    print(f"import {args.module}: {median_ms:.0f} ms (mediana de {args.runs})\n")
+    for name, self_us in sorted(packages.items(), key=lambda item: -item[1])[
+        : args.top
+    ]:
+        print(f"  {name:<24} {self_us / 1000:8.1f} ms")
+
+    failures: List[str] = []
+    if median_ms > args.budget_ms:
+        failures.append(f"supera el presupuesto de {args.budget_ms:.0f} ms")
+    imported = sorted(
+        name
+        for name in args.forbid
+        if any(module.split(".")[0] == name for module in runs[-1])
+    )
+    if imported:
+        failures.append(f"importa {', '.join(imported)} al arrancar")
+    if failures:
+        sys.exit(f"\nimport {args.module} " + "; ".join(failures))
+    print(f"\nDentro del presupuesto de {args.budget_ms:.0f} ms.")
+
+
+if __name__ == "__main__":
+    main()
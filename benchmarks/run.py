@@ -0,0 +1,398 @@
+"""
+Benchmarks de auth y users.
+
+Corre la app en proceso (TestClient, sin red) contra SQLite o un Postgres
+local y escribe un JSON con p50/p95/p99 y throughput por caso, para comparar
+cambios de cache, paginación o serialización contra una línea base.
+
+    python -m benchmarks.run                          # SQLite temporal
+    python -m benchmarks.run --output base.json
+    python -m benchmarks.run --baseline base.json     # compara contra base
+    python -m benchmarks.run --database-url postgresql://u:p@localhost/bench \\
+        --reset-db
+
+Con Postgres se usa una base descartable: `--reset-db` borra y recrea las
+tablas. El throughput es de un solo cliente secuencial.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+Result = Dict[str, Any]
+
+PAGE_SIZES = (10, 100, 1000)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Percentil por rango más cercano sobre valores ya ordenados"""
+    index = max(
+        0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1)
+    )
+    return sorted_values[index]
+
+
+def measure(
+    fn: Callable[[], Any],
+    iterations: int,
+    warmup: int,
+    setup: Optional[Callable[[], Any]] = None,
+) -> Result:
+    """Mide `fn` `iterations` veces; `setup` corre antes de cada una, sin medirse"""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+
+    timings: List[float] = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    total = sum(timings)
+    return {
+        "iterations": iterations,
+        "p50_ms": round(percentile(timings, 50) * 1000, 4),
+        "p95_ms": round(percentile(timings, 95) * 1000, 4),
+        "p99_ms": round(percentile(timings, 99) * 1000, 4),
+        "mean_ms": round(total / iterations * 1000, 4),
+        "throughput_rps": round(iterations / total, 2),
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--database-url",
+        help="URL de la DB (por defecto, un SQLite en un directorio temporal)",
+    )
+    parser.add_argument(
+        "--reset-db",
+        action="store_true",
+        help="Borrar y recrear las tablas (obligatorio fuera de SQLite)",
+    )
+    parser.add_argument("--users", type=int, default=5000, help="Usuarios a sembrar")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument(
+        "--hash-iterations",
+        type=int,
+        default=20,
+        help="Iteraciones de los casos con Argon2 (login, create_user)",
+    )
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument(
+        "--only", help="Correr solo los casos cuyo nombre contenga este texto"
+    )
+    parser.add_argument("--output", type=Path, help="Archivo JSON de resultados")
+    parser.add_argument(
+        "--baseline", type=Path, help="JSON de una corrida anterior para comparar"
+    )
+    return parser.parse_args(argv)
+
+
+def configure_environment(args: argparse.Namespace) -> str:
+    """
+    Fija DATABASE_URL antes de importar la app: `settings` se crea al
+    importar.
+    """
+    database_url = args.database_url
+    if database_url is None:
+        directory = tempfile.mkdtemp(prefix="optikt-bench-")
+        database_url = f"sqlite:///{directory}/bench.db"
+    elif not database_url.startswith("sqlite") and not args.reset_db:
+        sys.exit("Fuera de SQLite se requiere --reset-db (borra las tablas)")
+
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-not-for-production")
+    # El caso de login repite el mismo usuario: sin throttling daría 429
+    os.environ.setdefault("LOGIN_THROTTLE_ENABLED", "false")
+    return database_url
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    import gzip
+
+    import brotli
+    import msgpack
+    import orjson
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert, select
+
+    import app.models  # noqa: F401  (registra todas las tablas)
+    from app.api.deps import get_current_user
+    from app.api.v1.users import USER_LIST_COLUMNS
+    from app.config import settings
+    from app.core.cache import TTLCache, user_cache
+    from app.core.negotiation import packb
+    from app.core.pagination import encode_cursor
+    from app.core.security import (
+        TokenVerifier,
+        access_token_data_for,
+        create_access_token,
+        get_password_hash,
+        token_verifier,
+    )
+    from app.crud.user import user as crud_user
+    from app.database import Base, get_engine, get_sessionmaker
+    from app.main import app
+    from app.models.enums import UserRole
+    from app.models.user import User
+
+    engine = get_engine()
+    SessionLocal = get_sessionmaker()
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    # Un solo hash de Argon2 para todos: sembrar miles de hashes tardaría minutos
+    password = "benchmark-password"
+    hashed_password = get_password_hash(password)
+    base_time = datetime.now(timezone.utc) - timedelta(days=1)
+    rows = [
+        {
+            "email": f"bench{i}@example.com",
+            "username": f"bench{i}",
+            "full_name": f"Bench {i}",
+            "hashed_password": hashed_password,
+            "role": UserRole.SUPER_ADMIN.value if i == 0 else UserRole.SELLER.value,
+            "is_superuser": i == 0,
+            "created_at": base_time + timedelta(milliseconds=i),
+            "updated_at": base_time + timedelta(milliseconds=i),
+        }
+        for i in range(args.users)
+    ]
+    with SessionLocal() as db:
+        for start in range(0, len(rows), 1000):
+            db.execute(insert(User), rows[start : start + 1000])
+        db.commit()
+        admin = db.scalar(select(User).where(User.username == "bench0"))
+        assert admin is not None
+        token = create_access_token(access_token_data_for(admin))
+        admin_id = admin.id
+
+    headers = {"Authorization": f"Bearer {token}"}
+    results: Dict[str, Result] = {}
+
+    def bench(
+        name: str,
+        fn: Callable[[], Any],
+        iterations: Optional[int] = None,
+        setup: Optional[Callable[[], Any]] = None,
+        size: Optional[int] = None,
+    ) -> None:
+        if args.only and args.only not in name:
+            return
+        results[name] = measure(fn, iterations or args.iterations, args.warmup, setup)
+        if size is not None:
+            results[name]["bytes"] = size
+        print(
+            f"{name:<36} p50={results[name]['p50_ms']:>9.3f}ms  "
+            f"p99={results[name]['p99_ms']:>9.3f}ms  "
+            f"{results[name]['throughput_rps']:>9.1f} req/s"
+            + (f"  {size:>9} B" if size is not None else "")
+        )
+
+    # JWT
+    uncached_verifier = TokenVerifier(TTLCache("bench_tokens", maxsize=0, ttl=0))
+    bench("jwt_encode", lambda: create_access_token(access_token_data_for(admin)))
+    bench("jwt_decode_uncached", lambda: uncached_verifier.verify(token))
+    bench("jwt_decode_cached", lambda: token_verifier.verify(token))
+
+    # Resolución del usuario actual, sin HTTP
+    with SessionLocal() as db:
+        bench(
+            "get_current_user_cold",
+            lambda: get_current_user(db, token),
+            setup=user_cache.clear,
+        )
+        bench("get_current_user_warm", lambda: get_current_user(db, token))
+
+    def expect_ok(response: Any) -> None:
+        if response.status_code >= 400:
+            raise RuntimeError(f"{response.request.url}: {response.status_code}")
+
+    # Serialización de una página: tamaño y tiempo de cada formato, sin HTTP
+    with SessionLocal() as db:
+        page_size = min(max(PAGE_SIZES), args.users)
+        rows, _ = crud_user.get_page_rows(db, USER_LIST_COLUMNS, limit=page_size)
+        page = [dict(row._mapping) for row in rows]
+    as_json = orjson.dumps(page)
+    encoders: Dict[str, Callable[[], bytes]] = {
+        "json": lambda: orjson.dumps(page),
+        "msgpack": lambda: packb(page),
+        "json_gzip": lambda: gzip.compress(
+            orjson.dumps(page), compresslevel=settings.COMPRESSION_GZIP_LEVEL
+        ),
+        "json_br": lambda: brotli.compress(
+            orjson.dumps(page), quality=settings.COMPRESSION_BROTLI_QUALITY
+        ),
+    }
+    for format, encode in encoders.items():
+        bench(f"encode_page{page_size}_{format}", encode, size=len(encode()))
+    # El cliente decodifica lo que recibe: el costo del otro lado
+    bench(f"decode_page{page_size}_json", lambda: orjson.loads(as_json))
+    as_msgpack = packb(page)
+    bench(f"decode_page{page_size}_msgpack", lambda: msgpack.unpackb(as_msgpack))
+
+    # Sin compresión salvo en los casos que la piden, para comparar con
+    # corridas anteriores
+    with TestClient(app, headers={"Accept-Encoding": "identity"}) as client:
+        bench(
+            "login",
+            lambda: expect_ok(
+                client.post(
+                    f"{settings.API_V1_STR}/auth/login",
+                    data={"username": "bench1", "password": password},
+                )
+            ),
+            iterations=args.hash_iterations,
+        )
+
+        counter = iter(range(10**9))
+
+        def create_user() -> None:
+            n = next(counter)
+            expect_ok(
+                client.post(
+                    f"{settings.API_V1_STR}/users/create",
+                    json={
+                        "email": f"created{n}@example.com",
+                        "username": f"created{n}",
+                        "full_name": f"Created {n}",
+                        "password": password,
+                    },
+                    headers=headers,
+                )
+            )
+
+        bench("create_user", create_user, iterations=args.hash_iterations)
+
+        bench(
+            "read_user_by_id",
+            lambda: expect_ok(
+                client.get(f"{settings.API_V1_STR}/users/{admin_id}", headers=headers)
+            ),
+        )
+
+        # Listado: primera página, y página profunda por offset y por cursor
+        with SessionLocal() as db:
+            for limit in PAGE_SIZES:
+                if limit > args.users:
+                    continue
+                depth = args.users - limit
+                url = f"{settings.API_V1_STR}/users/?limit={limit}"
+                bench(
+                    f"list_users_limit{limit}_first",
+                    lambda url=url: expect_ok(client.get(url, headers=headers)),
+                )
+                bench(
+                    f"list_users_limit{limit}_offset{depth}",
+                    lambda url=url, depth=depth: expect_ok(
+                        client.get(f"{url}&skip={depth}", headers=headers)
+                    ),
+                )
+                if limit == max(PAGE_SIZES):
+                    for variant, extra in [
+                        ("msgpack", {"Accept": "application/msgpack"}),
+                        ("gzip", {"Accept-Encoding": "gzip"}),
+                        ("br", {"Accept-Encoding": "br"}),
+                    ]:
+                        bench(
+                            f"list_users_limit{limit}_first_{variant}",
+                            lambda url=url, extra=extra: expect_ok(
+                                client.get(url, headers={**headers, **extra})
+                            ),
+                        )
+                if depth == 0:
+                    continue
+                created_at, id = db.execute(
+                    select(User.created_at, User.id)
+                    .order_by(User.created_at, User.id)
+                    .offset(depth - 1)
+                    .limit(1)
+                ).one()
+                cursor = encode_cursor(created_at, id)
+                bench(
+                    f"list_users_limit{limit}_cursor{depth}",
+                    lambda url=url, cursor=cursor: expect_ok(
+                        client.get(f"{url}&cursor={cursor}", headers=headers)
+                    ),
+                )
+
+    return results
+
+
+def compare(results: Dict[str, Result], baseline: Dict[str, Any]) -> None:
+    """Imprime la variación de p50/p99 contra la línea base"""
+    print(f"\n{'caso':<36} {'p50':>10} {'Δp50':>8} {'p99':>10} {'Δp99':>8}")
+    for name, result in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        deltas = [
+            (result[key] - base[key]) / base[key] * 100 if base[key] else 0.0
+            for key in ("p50_ms", "p99_ms")
+        ]
+        print(
+            f"{name:<36} {result['p50_ms']:>8.3f}ms {deltas[0]:>+7.1f}% "
+            f"{result['p99_ms']:>8.3f}ms {deltas[1]:>+7.1f}%"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    database_url = configure_environment(args)
+
+    import logging
+
+    # Los benchmarks disparan el log de peticiones lentas a propósito
+    logging.getLogger("app.core.query_stats").setLevel(logging.ERROR)
+
+    results = run(args)
+
+    from sqlalchemy import __version__ as sqlalchemy_version
+    from sqlalchemy import make_url
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy_version,
+            "database": make_url(database_url).get_backend_name(),
+            "users": args.users,
+        },
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\nResultados en {args.output}")
+    if args.baseline:
+        compare(results, json.loads(args.baseline.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,13 @@
 from uuid import uuid4
 
 from app.core.security import get_password_hash
-from app.database import SessionLocal
+from app.database import get_sessionmaker
 from app.models.enums import UserRole
 from app.models.user import User
 
 
 def create_superuser() -> None:
-    db = SessionLocal()
+    db = get_sessionmaker()()
 
     username = "optikt"
 
@@ -1,7 +1,51 @@
-import pytest
-from fastapi.testclient import TestClient
+import os
+from contextlib import contextmanager
+from typing import Iterator
 
-from app.main import app
+# Valores por defecto para poder importar la app sin un .env
+os.environ.setdefault("SECRET_KEY", "testing-secret-key-safe-to-share")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app.core.cache import count_cache, user_cache  # noqa: E402
+from app.core.query_stats import QueryStats, instrument_engine  # noqa: E402
+from app.core.security import (  # noqa: E402
+    access_token_data_for,
+    create_access_token,
+    token_verifier,
+    token_versions,
+)
+from app.core.throttling import login_throttle  # noqa: E402
+from app.database import Base, get_db  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.enums import UserRole  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+# SQLite en memoria compartida entre hilos (TestClient usa un threadpool)
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+instrument_engine(engine)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+app.dependency_overrides[get_db] = override_get_db
 
 
 @pytest.fixture(scope="module")
@@ -9,3 +53,81 @@ def client():
     """Returns a TestClient instance for the FastAPI application."""
     with TestClient(app) as c:
         yield c
+
+
+@pytest.fixture
+def db():
+    """Sesión de prueba; limpia todas las tablas al terminar el test."""
+    session = TestingSessionLocal()
+    # `token_versions` sincronizada con la DB, vacía al empezar cada test
+    token_versions.load({}, token_versions.generation)
+    try:
+        yield session
+    finally:
+        session.close()
+        with engine.begin() as conn:
+            for table in reversed(Base.metadata.sorted_tables):
+                conn.execute(table.delete())
+        user_cache.clear()
+        count_cache.clear()
+        token_verifier.cache.clear()
+        token_versions.clear()
+        login_throttle.reset()
+
+
+def make_user(db, username: str, **kwargs) -> User:
+    """Crea un usuario directamente en la DB (sin hashear con Argon2)."""
+    values = {
+        "email": f"{username}@example.com",
+        "username": username,
+        "full_name": username.title(),
+        "hashed_password": "not-a-real-hash",
+        "role": UserRole.SELLER.value,
+    }
+    values.update(kwargs)
+    user = User(**values)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryStats]:
+    """
+    Falla si el bloque ejecuta más de `limit` sentencias SQL. Cuenta en
+    cualquier hilo, así que incluye las del TestClient.
+
+        with assert_max_queries(2):
+            client.get("/api/v1/users/", headers=headers)
+    """
+    stats = QueryStats(keep_slowest=0)
+
+    def record(conn, cursor, statement, *args) -> None:
+        stats.record(statement, 0.0)
+
+    event.listen(engine, "after_cursor_execute", record)
+    try:
+        yield stats
+    finally:
+        event.remove(engine, "after_cursor_execute", record)
+
+    statements = "\n".join(f"{n}x {s}" for s, n in stats.statements.most_common())
+    assert stats.count <= limit, (
+        f"Se esperaban a lo sumo {limit} consultas y hubo {stats.count}:\n{statements}"
+    )
+
+
+def auth_headers(user: User) -> dict[str, str]:
+    token = create_access_token(access_token_data_for(user))
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def superuser(db) -> User:
+    return make_user(db, "root", role=UserRole.SUPER_ADMIN.value, is_superuser=True)
+
+
+@pytest.fixture
+def superuser_headers(superuser) -> dict[str, str]:
+    return auth_headers(superuser)
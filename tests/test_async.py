@@ -0,0 +1,139 @@
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.api.deps import get_authorized_superuser_async, get_authorized_user_async
+from app.api.v1 import auth_async, users_async
+from app.core.cache import count_cache, user_cache
+from app.core.importers import iter_validated_batches
+from app.database import Base, get_async_db, to_async_url
+
+
+@pytest.fixture(scope="module")
+def async_client():
+    """App con los routers async sobre aiosqlite en memoria."""
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    session_local = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with session_local() as db:
+            yield db
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    app = FastAPI()
+    app.include_router(auth_async.router, prefix="/api/v1/auth")
+    app.include_router(users_async.router, prefix="/api/v1/users")
+    app.dependency_overrides[get_async_db] = override_get_async_db
+
+    with TestClient(app) as c:
+        c.portal.call(create_tables)
+        yield c
+        c.portal.call(engine.dispose)
+    user_cache.clear()
+    count_cache.clear()
+
+
+def test_to_async_url():
+    assert to_async_url("sqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+    assert (
+        to_async_url("postgresql://u:p@localhost/optikt")
+        == "postgresql+asyncpg://u:p@localhost/optikt"
+    )
+
+
+def test_async_register_login_and_list(async_client):
+    for username in ("ana", "beto", "carla"):
+        response = async_client.post(
+            "/api/v1/auth/register",
+            json={
+                "email": f"{username}@example.com",
+                "username": username,
+                "full_name": username.title(),
+                "password": "supersecreta",
+            },
+        )
+        assert response.status_code == 201
+
+    response = async_client.post(
+        "/api/v1/auth/register",
+        json={
+            "email": "ana@example.com",
+            "username": "otra",
+            "full_name": "Otra",
+            "password": "supersecreta",
+        },
+    )
+    assert response.status_code == 400
+
+    response = async_client.post(
+        "/api/v1/auth/login", data={"username": "ana", "password": "supersecreta"}
+    )
+    assert response.status_code == 200
+    response = async_client.post(
+        "/api/v1/auth/refresh",
+        json={"refresh_token": response.json()["refresh_token"]},
+    )
+    assert response.status_code == 200
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = async_client.get("/api/v1/users/me", headers=headers)
+    assert response.json()["username"] == "ana"
+
+    response = async_client.get("/api/v1/users/?limit=2", headers=headers)
+    assert len(response.json()) == 2
+    cursor = response.headers["X-Next-Cursor"]
+    response = async_client.get(
+        f"/api/v1/users/?limit=2&cursor={cursor}", headers=headers
+    )
+    assert len(response.json()) == 1
+    assert "X-Next-Cursor" not in response.headers
+
+    response = async_client.get("/api/v1/users/?count=estimated", headers=headers)
+    assert response.headers["X-Total-Count"] == "3"
+    assert response.headers["X-Total-Count-Type"] == "exact"
+
+    response = async_client.get("/api/v1/users/search?q=CAR", headers=headers)
+    assert [u["username"] for u in response.json()] == ["carla"]
+
+    response = async_client.get("/api/v1/users/export", headers=headers)
+    assert response.status_code == 403
+
+
+def test_async_import_parses_in_worker_threads(async_client, monkeypatch):
+    threads = []
+
+    def recording_batches(*args, **kwargs):
+        for batch in iter_validated_batches(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            yield batch
+
+    monkeypatch.setattr(users_async, "iter_validated_batches", recording_batches)
+    monkeypatch.setattr(users_async.settings, "USER_IMPORT_BATCH_SIZE", 1)
+    for dependency in (get_authorized_user_async, get_authorized_superuser_async):
+        monkeypatch.setitem(
+            async_client.app.dependency_overrides, dependency, lambda: None
+        )
+    content = "".join(
+        f'{{"email": "{name}@example.com", "username": "{name}", '
+        f'"full_name": "{name.title()}", "password": "supersecreta"}}\n'
+        for name in ("dario", "elena")
+    )
+    response = async_client.post(
+        "/api/v1/users/import",
+        files={"file": ("users.ndjson", content, "application/x-ndjson")},
+    )
+    assert response.status_code == 200
+    assert response.json()["created"] == 2
+    # El parseo de cada lote corre fuera del event loop
+    assert threads == ["AnyIO worker thread"] * 2
@@ -1,3 +1,43 @@
+import threading
+import time
+from datetime import timedelta
+from importlib import import_module
+from uuid import uuid4
+
+import pytest
+from passlib.hash import argon2
+from sqlalchemy import event, func, select, update
+from sqlalchemy.exc import OperationalError
+
+from app import main
+from app.api import deps
+from app.config import settings
+from app.core.cache import TTLCache
+from app.core.invalidation import invalidation_bus
+from app.core.security import (
+    HashingPool,
+    HashingPoolBusyError,
+    InvalidTokenError,
+    TokenVerifier,
+    access_token_data_for,
+    create_access_token,
+    decode_access_token,
+    get_pwd_context,
+    token_versions,
+)
+from app.core.throttling import (
+    LoginThrottle,
+    LoginThrottledError,
+    MemoryThrottleBackend,
+)
+from app.crud.refresh_token import refresh_token as crud_refresh_token
+from app.models.enums import UserRole
+from app.models.refresh_token import RefreshToken
+from app.models.user import User
+from app.schemas.access_token import AccessTokenData
+from tests.conftest import TestingSessionLocal, auth_headers, engine, make_user
+
+
 def test_health_check(client):
     response = client.get("/health")
 
@@ -6,3 +46,396 @@ def test_health_check(client):
     data = response.json()
 
     assert data["status"] == "ok"
+
+
+def test_register_and_login(client, db):
+    response = client.post(
+        "/api/v1/auth/register",
+        json={
+            "email": "ana@example.com",
+            "username": "ana",
+            "full_name": "Ana",
+            "password": "supersecreta",
+        },
+    )
+    assert response.status_code == 201
+
+    response = client.post(
+        "/api/v1/auth/login", data={"username": "ana", "password": "supersecreta"}
+    )
+    assert response.status_code == 200
+    assert response.json()["token_type"] == "bearer"
+
+    response = client.post(
+        "/api/v1/auth/login", data={"username": "ana", "password": "incorrecta"}
+    )
+    assert response.status_code == 401
+
+
+def test_refresh_rotates_and_detects_reuse(client, db):
+    ana = make_user(db, "ana")
+    first = crud_refresh_token.issue(db, ana.id)
+
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": first})
+    assert response.status_code == 200
+    second = response.json()["refresh_token"]
+    assert second != first
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    assert client.get("/api/v1/auth/me", headers=headers).json()["username"] == "ana"
+
+    # Reusar un token ya rotado revoca toda la familia, incluido el nuevo
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": first})
+    assert response.status_code == 401
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": second})
+    assert response.status_code == 401
+
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": "nope"})
+    assert response.status_code == 401
+
+
+def test_password_change_and_delete_revoke_refresh_tokens(
+    client, db, superuser_headers
+):
+    ana = make_user(db, "ana")
+    old = crud_refresh_token.issue(db, ana.id)
+    role_only = crud_refresh_token.issue(db, ana.id)
+
+    # Un cambio de rol no cierra las sesiones
+    response = client.put(
+        f"/api/v1/users/{ana.id}",
+        json={"role": UserRole.ADMIN.value},
+        headers=superuser_headers,
+    )
+    assert response.status_code == 200
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": role_only})
+    assert response.status_code == 200
+
+    response = client.put(
+        f"/api/v1/users/{ana.id}",
+        json={"password": "nueva-contraseña"},
+        headers=superuser_headers,
+    )
+    assert response.status_code == 200
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": old})
+    assert response.status_code == 401
+
+    fresh = crud_refresh_token.issue(db, ana.id)
+    response = client.delete(f"/api/v1/users/{ana.id}", headers=superuser_headers)
+    assert response.status_code == 200
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": fresh})
+    assert response.status_code == 401
+
+
+def test_purge_expired_refresh_tokens(db, monkeypatch):
+    ana = make_user(db, "ana")
+    monkeypatch.setattr(settings, "REFRESH_TOKEN_EXPIRE_DAYS", -1)
+    for _ in range(3):
+        crud_refresh_token.issue(db, ana.id)
+    monkeypatch.setattr(settings, "REFRESH_TOKEN_EXPIRE_DAYS", 30)
+    alive = crud_refresh_token.issue(db, ana.id)
+
+    assert crud_refresh_token.purge_expired(db, batch_size=2) == 3
+    assert db.scalar(select(func.count()).select_from(RefreshToken)) == 1
+    assert crud_refresh_token.rotate(db, alive)[0] == ana.id
+
+
+def test_hashing_pool_batches_leave_room_for_logins():
+    pool = HashingPool(workers=2, queue_size=0)
+    assert pool.batch_in_flight == 1
+    release = threading.Event()
+    started = threading.Semaphore(0)
+
+    def slow(item: int) -> int:
+        started.release()
+        release.wait()
+        return item
+
+    batch = threading.Thread(target=pool.map, args=(slow, range(5)))
+    batch.start()
+    try:
+        assert started.acquire(timeout=5)
+        # El lote ocupa un solo slot: un login entra aunque el lote siga
+        assert pool.run(lambda: 42) == 42
+    finally:
+        release.set()
+        batch.join()
+        pool.shutdown()
+
+
+def test_hashing_pool_rejects_when_full():
+    pool = HashingPool(workers=1, queue_size=0)
+    release = threading.Event()
+    try:
+        pool.submit(release.wait)
+        with pytest.raises(HashingPoolBusyError):
+            pool.submit(release.wait)
+    finally:
+        release.set()
+        pool.shutdown()
+    # Al liberarse el worker vuelve a aceptar trabajo
+    assert pool.run(lambda: 42) == 42
+    pool.shutdown()
+
+
+def test_token_verifier_caches_until_exp():
+    verifier = TokenVerifier(TTLCache("tokens", maxsize=10, ttl=60))
+    data = AccessTokenData(sub=uuid4())
+    token = create_access_token(data)
+
+    assert verifier.verify(token).sub == data.sub
+    assert verifier.verify(token).sub == data.sub
+    assert verifier.cache.hits == 1
+    assert verifier.decode_count == 1
+
+    with pytest.raises(InvalidTokenError):
+        verifier.verify(token[:-2] + "xx")
+
+    expired = create_access_token(data, expires_delta=timedelta(seconds=-1))
+    with pytest.raises(InvalidTokenError):
+        verifier.verify(expired)
+    assert decode_access_token(expired) is None
+
+
+def test_stateless_auth_skips_db_and_revokes_on_change(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "STATELESS_AUTH", True)
+    root = make_user(db, "root", role=UserRole.SUPER_ADMIN.value, is_superuser=True)
+    ana = make_user(db, "ana")
+    root_headers, ana_headers = auth_headers(root), auth_headers(ana)
+
+    def no_db(*args, **kwargs):
+        raise AssertionError("la autorización no debería consultar la DB")
+
+    with monkeypatch.context() as m:
+        m.setattr(deps.crud_user, "get_cached", no_db)
+        response = client.get(f"/api/v1/users/{ana.id}", headers=ana_headers)
+        assert response.status_code == 200
+        response = client.get(f"/api/v1/users/{root.id}", headers=ana_headers)
+        assert response.status_code == 403
+
+    # /me necesita los datos completos del usuario
+    response = client.get("/api/v1/users/me", headers=ana_headers)
+    assert response.json()["username"] == "ana"
+
+    # Cambios que no afectan la autorización no revocan el token
+    response = client.put(
+        f"/api/v1/users/{ana.id}", json={"full_name": "Ana"}, headers=root_headers
+    )
+    assert response.status_code == 200
+    response = client.get(f"/api/v1/users/{ana.id}", headers=ana_headers)
+    assert response.status_code == 200
+
+    # Cambiar el rol o desactivar sí: el token anterior deja de valer
+    response = client.put(
+        f"/api/v1/users/{ana.id}",
+        json={"role": UserRole.ADMIN.value},
+        headers=root_headers,
+    )
+    assert response.status_code == 200
+    response = client.get(f"/api/v1/users/{ana.id}", headers=ana_headers)
+    assert response.status_code == 401
+
+    db.refresh(ana)
+    ana_headers = auth_headers(ana)
+    response = client.get(f"/api/v1/users/{root.id}", headers=ana_headers)
+    assert response.status_code == 200
+
+    response = client.post(
+        "/api/v1/users/bulk/delete", json={"ids": [str(ana.id)]}, headers=root_headers
+    )
+    assert response.status_code == 200
+    response = client.get(f"/api/v1/users/{root.id}", headers=ana_headers)
+    assert response.status_code == 401
+
+
+def test_stateless_revocation_survives_restart(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "STATELESS_AUTH", True)
+    monkeypatch.setattr(main, "get_sessionmaker", lambda: TestingSessionLocal)
+    root = make_user(db, "root", role=UserRole.SUPER_ADMIN.value, is_superuser=True)
+    ana = make_user(db, "ana")
+    ana_headers = auth_headers(ana)
+
+    response = client.put(
+        f"/api/v1/users/{ana.id}",
+        json={"role": UserRole.ADMIN.value},
+        headers=auth_headers(root),
+    )
+    assert response.status_code == 200
+    db.refresh(ana)
+    assert ana.token_version == 1
+
+    # Un worker reiniciado carga la versión persistida: el token sigue revocado
+    token_versions.clear()
+    main.load_token_versions()
+    assert token_versions.get(ana.id) == 1
+    response = client.get(f"/api/v1/users/{root.id}", headers=ana_headers)
+    assert response.status_code == 401
+
+    # Los tokens nuevos llevan la versión de la columna
+    assert access_token_data_for(ana).token_version == 1
+    response = client.get(f"/api/v1/users/{root.id}", headers=auth_headers(ana))
+    assert response.status_code == 200
+
+
+def test_stateless_auth_uses_db_until_versions_reload(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "STATELESS_AUTH", True)
+    ana = make_user(db, "ana")
+    ana_headers = auth_headers(ana)
+
+    # Otro worker la desactivó y el evento se perdió (el bus se reconectó)
+    db.execute(
+        update(User).where(User.id == ana.id).values(is_active=False, token_version=1)
+    )
+    db.commit()
+    invalidation_bus._reset()
+    assert not token_versions.synced
+
+    # Sin versiones sincronizadas se consulta la DB, aunque falle la carga
+    def unavailable():
+        raise OperationalError("SELECT", {}, Exception("sin conexión"))
+
+    monkeypatch.setattr(main, "get_sessionmaker", unavailable)
+    with pytest.raises(OperationalError):
+        main.load_token_versions()
+    assert not token_versions.synced
+    response = client.get(f"/api/v1/users/{ana.id}", headers=ana_headers)
+    assert response.status_code == 403
+
+    monkeypatch.setattr(main, "get_sessionmaker", lambda: TestingSessionLocal)
+    main.load_token_versions()
+    assert token_versions.synced
+    response = client.get(f"/api/v1/users/{ana.id}", headers=ana_headers)
+    assert response.status_code == 401
+
+
+def test_login_is_throttled_before_hashing(client, db, monkeypatch):
+    make_user(db, "ana")
+    verifications = []
+
+    async def verify_and_update(password: str, hashed: str) -> tuple[bool, None]:
+        verifications.append(password)
+        return False, None
+
+    monkeypatch.setattr(
+        import_module("app.crud.user"),
+        "verify_and_update_password_async",
+        verify_and_update,
+    )
+    monkeypatch.setattr(settings, "LOGIN_USERNAME_BURST", 2)
+
+    for _ in range(2):
+        response = client.post(
+            "/api/v1/auth/login", data={"username": "ana", "password": "x" * 8}
+        )
+        assert response.status_code == 401
+
+    # El username se normaliza: "ANA" comparte bucket con "ana"
+    response = client.post(
+        "/api/v1/auth/login", data={"username": "ANA", "password": "x" * 8}
+    )
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert len(verifications) == 2
+
+
+def test_login_throttle_caps_concurrent_verifications():
+    throttle = LoginThrottle(MemoryThrottleBackend(), max_concurrent=1)
+    with throttle.verification():
+        with pytest.raises(LoginThrottledError):
+            with throttle.verification():
+                pass
+    with throttle.verification():
+        pass
+
+
+def test_memory_throttle_backend_refills():
+    backend = MemoryThrottleBackend()
+    assert backend.take("k", rate=1000, burst=1) == 0
+    assert backend.take("k", rate=0.5, burst=1) > 0
+    time.sleep(0.01)
+    assert backend.take("k", rate=1000, burst=1) == 0
+
+
+def test_login_rehashes_outdated_argon2_parameters(client, db):
+    old_hash = argon2.using(rounds=1, memory_cost=1024, parallelism=1).hash(
+        "supersecreta"
+    )
+    ana = make_user(db, "ana", hashed_password=old_hash)
+    pwd_context = get_pwd_context()
+    assert pwd_context.needs_update(old_hash)
+
+    response = client.post(
+        "/api/v1/auth/login", data={"username": "ana", "password": "supersecreta"}
+    )
+    assert response.status_code == 200
+
+    db.refresh(ana)
+    assert ana.hashed_password != old_hash
+    assert not pwd_context.needs_update(ana.hashed_password)
+    assert pwd_context.verify("supersecreta", ana.hashed_password)
+
+
+def test_login_rehash_keeps_concurrent_password_change(client, db, monkeypatch):
+    ana = make_user(db, "ana", hashed_password="hash-viejo")
+
+    async def verify_and_update(password: str, hashed: str) -> tuple[bool, str]:
+        # El password cambia mientras corre Argon2 para el login
+        with engine.begin() as conn:
+            conn.execute(
+                update(User)
+                .where(User.id == ana.id)
+                .values(hashed_password="hash-del-cambio")
+            )
+        return True, "hash-del-rehash"
+
+    monkeypatch.setattr(
+        import_module("app.crud.user"),
+        "verify_and_update_password_async",
+        verify_and_update,
+    )
+    response = client.post(
+        "/api/v1/auth/login", data={"username": "ana", "password": "supersecreta"}
+    )
+    assert response.status_code == 200
+
+    db.refresh(ana)
+    assert ana.hashed_password == "hash-del-cambio"
+
+
+def test_async_auth_endpoints_run_sql_in_worker_threads(client, db, superuser_headers):
+    old_hash = argon2.using(rounds=1, memory_cost=1024, parallelism=1).hash(
+        "supersecreta"
+    )
+    make_user(db, "ana", hashed_password=old_hash)
+    threads = []
+
+    def record_thread(*args: object) -> None:
+        threads.append(threading.current_thread().name)
+
+    # login (con rehash), register y create son async sobre una Session sync:
+    # ninguna consulta debe correr en el event loop
+    event.listen(engine, "before_cursor_execute", record_thread)
+    try:
+        response = client.post(
+            "/api/v1/auth/login", data={"username": "ana", "password": "supersecreta"}
+        )
+        assert response.status_code == 200
+        for path, username, headers in (
+            ("/api/v1/auth/register", "beto", {}),
+            ("/api/v1/users/create", "carla", superuser_headers),
+        ):
+            response = client.post(
+                path,
+                json={
+                    "email": f"{username}@example.com",
+                    "username": username,
+                    "full_name": username.title(),
+                    "password": "supersecreta",
+                },
+                headers=headers,
+            )
+            assert response.status_code == 201
+    finally:
+        event.remove(engine, "before_cursor_execute", record_thread)
+
+    assert threads
+    assert set(threads) == {"AnyIO worker thread"}
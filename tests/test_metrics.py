@@ -0,0 +1,82 @@
+import json
+import logging
+import threading
+
+from app.config import settings
+from app.core.metrics import Registry
+from tests.conftest import auth_headers, make_user
+
+
+def test_histogram_merges_thread_shards():
+    registry = Registry()
+    histogram = registry.histogram(
+        "work_seconds", "Trabajo", ("kind",), buckets=(0.1, 1.0)
+    )
+
+    def observe() -> None:
+        for _ in range(1000):
+            histogram.observe(0.05, "a")
+        histogram.observe(5.0, "a")
+
+    threads = [threading.Thread(target=observe) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    text = registry.render()
+    assert 'work_seconds_bucket{kind="a",le="0.1"} 4000' in text
+    assert 'work_seconds_bucket{kind="a",le="1"} 4000' in text
+    assert 'work_seconds_bucket{kind="a",le="+Inf"} 4004' in text
+    assert 'work_seconds_count{kind="a"} 4004' in text
+
+    # Los shards de los hilos terminados se sumaron a la base y se descartaron
+    assert histogram._shards == []
+    histogram.observe(0.5, "a")
+    assert 'work_seconds_count{kind="a"} 4005' in registry.render()
+
+
+def test_metrics_endpoint_reports_route_templates(client, db):
+    ana = make_user(db, "ana")
+    for _ in range(2):
+        response = client.get(f"/api/v1/users/{ana.id}", headers=auth_headers(ana))
+        assert response.status_code == 200
+    client.get("/no-existe")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+
+    # Las series usan la plantilla de la ruta, nunca el id real
+    assert str(ana.id) not in text
+    assert (
+        'http_requests_total{method="GET",route="/api/v1/users/{user_id}",'
+        'status="200"}' in text
+    )
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"}' in text
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    assert "# TYPE db_pool_checked_out gauge" in text
+
+
+def test_query_stats_debug_headers_and_slow_log(
+    client, db, superuser_headers, monkeypatch, caplog
+):
+    make_user(db, "ana")
+    monkeypatch.setattr(settings, "DEBUG", True)
+    monkeypatch.setattr(settings, "SLOW_REQUEST_MAX_QUERIES", 1)
+
+    with caplog.at_level(logging.WARNING, logger="app.core.query_stats"):
+        response = client.get("/api/v1/users/", headers=superuser_headers)
+
+    # Usuario autenticado (cache vacío) + listado
+    assert response.headers["X-DB-Query-Count"] == "2"
+    assert float(response.headers["X-DB-Time-Ms"]) > 0
+    assert len(response.headers["X-DB-Slowest-Ms"].split(",")) == 2
+
+    (record,) = caplog.records
+    log = json.loads(record.getMessage())
+    assert log["event"] == "slow_request"
+    assert log["route"] == "/api/v1/users/"
+    assert log["db_queries"] == 2
+    assert log["slowest"][0]["statement"].startswith("SELECT")
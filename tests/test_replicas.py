@@ -0,0 +1,177 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+
+from app import database
+from app.config import settings
+from app.core.cache import user_cache
+from app.core.replicas import ReplicaSet, RoutingSession, stick_to_primary
+from app.database import Base, get_db, to_async_url
+from app.main import app
+from app.models.enums import UserRole
+from app.models.user import User
+from tests.conftest import auth_headers, make_user
+
+
+def full_names(db: Session) -> list[str]:
+    return list(db.scalars(select(User.full_name).order_by(User.full_name)))
+
+
+@pytest.fixture
+def primary_and_replica(tmp_path):
+    """
+    Primario y réplica en dos archivos SQLite. Cada test escribe en cada uno
+    por separado, así se ve de cuál leyó la sesión (una réplica "atrasada").
+    """
+    engines = []
+    for name in ("primary", "replica"):
+        engine = create_engine(f"sqlite:///{tmp_path / name}.db")
+        Base.metadata.create_all(engine)
+        engines.append(engine)
+    yield engines
+    for engine in engines:
+        engine.dispose()
+
+
+def add_user(engine, username: str, full_name: str, **kwargs) -> None:
+    with Session(engine) as db:
+        make_user(db, username, full_name=full_name, **kwargs)
+
+
+def test_routing_session_reads_replica_until_first_write(primary_and_replica):
+    primary, replica = primary_and_replica
+    add_user(primary, "ana", "Ana Primario")
+    add_user(replica, "ana", "Ana Réplica")
+
+    with RoutingSession(bind=primary, replicas=ReplicaSet([replica], 30)) as db:
+        assert full_names(db) == ["Ana Réplica"]
+        # El dialecto se consulta con get_bind() sin sentencia: primario
+        assert db.get_bind() is primary
+
+        make_user(db, "beto")
+
+        # Después de escribir, lee lo que escribió (del primario)
+        assert full_names(db) == ["Ana Primario", "Beto"]
+
+
+def test_stick_to_primary_and_for_update(primary_and_replica):
+    primary, replica = primary_and_replica
+    add_user(primary, "ana", "Ana Primario")
+    add_user(replica, "ana", "Ana Réplica")
+    replicas = ReplicaSet([replica], 30)
+
+    with RoutingSession(bind=primary, replicas=replicas) as db:
+        stmt = select(User.full_name).with_for_update()
+        assert list(db.scalars(stmt)) == ["Ana Primario"]
+
+    with RoutingSession(bind=primary, replicas=replicas) as db:
+        stick_to_primary(db)
+        assert full_names(db) == ["Ana Primario"]
+
+
+def test_replica_set_round_robin_and_ejection(primary_and_replica, tmp_path):
+    primary, replica = primary_and_replica
+    add_user(primary, "ana", "Ana Primario")
+    add_user(replica, "ana", "Ana Réplica")
+    down = create_engine(f"sqlite:///{tmp_path}/no-existe/replica.db")
+    replicas = ReplicaSet([down, replica], eject_seconds=30)
+
+    assert [replicas.choose() for _ in range(4)] == [down, replica, down, replica]
+
+    # La réplica caída falla al conectar y queda fuera de la rotación
+    with RoutingSession(bind=primary, replicas=replicas) as db:
+        with pytest.raises(OperationalError):
+            full_names(db)
+    assert replicas.is_ejected(down)
+    assert [replicas.choose() for _ in range(3)] == [replica] * 3
+
+    # Sin réplicas disponibles se lee del primario
+    replicas.eject(replica)
+    with RoutingSession(bind=primary, replicas=replicas) as db:
+        assert full_names(db) == ["Ana Primario"]
+
+    replicas._ejected_until.clear()
+    assert replicas.choose() is not None
+    down.dispose()
+
+
+@pytest.fixture
+def replicated_app(primary_and_replica, monkeypatch, client):
+    """La app con el get_db real sobre el primario y una réplica en SQLite"""
+    primary, replica = primary_and_replica
+    monkeypatch.setattr(settings, "DATABASE_URL", str(primary.url))
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_URLS", [str(replica.url)])
+    monkeypatch.delitem(app.dependency_overrides, get_db)
+    database.dispose_engine()
+    yield primary, replica
+    database.dispose_engine()
+    user_cache.clear()
+
+
+def test_get_db_routes_reads_and_writes(replicated_app, client):
+    primary, replica = replicated_app
+    root_id, ana_id = uuid4(), uuid4()
+    for engine, suffix in ((primary, "Primario"), (replica, "Réplica")):
+        add_user(
+            engine,
+            "root",
+            f"Root {suffix}",
+            id=root_id,
+            role=UserRole.SUPER_ADMIN.value,
+            is_superuser=True,
+        )
+        add_user(engine, "ana", f"Ana {suffix}", id=ana_id)
+    root = User(id=root_id, role=UserRole.SUPER_ADMIN.value, is_superuser=True)
+    headers = auth_headers(root)
+
+    # /me lee del primario (read_from_primary)
+    response = client.get("/api/v1/users/me", headers=headers)
+    assert response.json()["full_name"] == "Root Primario"
+
+    response = client.get(f"/api/v1/users/{ana_id}", headers=headers)
+    assert response.json()["full_name"] == "Ana Réplica"
+
+    # Un PUT lee y escribe en el primario; la réplica no cambia
+    response = client.put(
+        f"/api/v1/users/{ana_id}",
+        json={"role": UserRole.ADMIN.value},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["full_name"] == "Ana Primario"
+    assert response.json()["role"] == UserRole.ADMIN.value
+    with Session(replica) as db:
+        assert db.get(User, ana_id).role == UserRole.SELLER.value
+
+
+def test_async_session_routes_through_routing_session(primary_and_replica):
+    primary, replica = primary_and_replica
+    add_user(primary, "ana", "Ana Primario")
+    add_user(replica, "ana", "Ana Réplica")
+
+    async def read_names() -> tuple[list[str], list[str]]:
+        async_primary = create_async_engine(to_async_url(str(primary.url)))
+        async_replica = create_async_engine(to_async_url(str(replica.url)))
+        session_local = async_sessionmaker(
+            bind=async_primary,
+            sync_session_class=RoutingSession,
+            replicas=ReplicaSet([async_replica.sync_engine], 30),
+        )
+        stmt = select(User.full_name)
+        try:
+            async with session_local() as db:
+                replica_names = list(await db.scalars(stmt))
+            async with session_local() as db:
+                stick_to_primary(db)
+                primary_names = list(await db.scalars(stmt))
+        finally:
+            await async_primary.dispose()
+            await async_replica.dispose()
+        return replica_names, primary_names
+
+    assert asyncio.run(read_names()) == (["Ana Réplica"], ["Ana Primario"])
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.importtime import DEFAULT_FORBIDDEN, run_importtime
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_import_app_defers_engine_and_crypto():
+    timings = run_importtime("app.main")
+
+    assert "app.main" in timings
+    # El router async no se importa si no se sirve (ASYNC_ROUTES=False)
+    assert "app.api.v1.users_async" not in timings
+    imported = {name.split(".")[0] for name in timings}
+    assert imported.isdisjoint(DEFAULT_FORBIDDEN)
+
+
+def test_engine_is_created_lazily(client):
+    from app import database
+
+    # El fixture `client` corre el lifespan, que crea el engine al arrancar
+    assert database._engine is not None
+    database.dispose_engine()
+    assert database._engine is None
+    assert database.get_sessionmaker().kw["bind"] is database.get_engine()
+
+
+def test_import_models_without_environment(tmp_path):
+    # Sin DATABASE_URL ni SECRET_KEY (ej. alembic o un script): la
+    # configuración se lee recién al usar un valor
+    env = {
+        "PATH": os.environ.get("PATH", ""),
+        "PYTHONPATH": str(ROOT),
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", "import app.models"],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=tmp_path,
+    )
+    assert result.returncode == 0, result.stderr
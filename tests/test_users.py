@@ -0,0 +1,574 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+import msgpack
+import orjson
+import pytest
+from sqlalchemy import select, text
+
+from app.config import settings
+from app.core.cache import count_cache, user_cache
+from app.core.security import verify_password
+from app.crud.base import build_page_stmt
+from app.crud.user import DuplicateUserError, build_search_filters
+from app.crud.user import user as crud_user
+from app.models.enums import UserRole
+from app.models.user import User
+from app.schemas.user import UserCreate, UserResponse
+from tests.conftest import assert_max_queries, auth_headers, make_user
+
+
+def test_list_users_cursor_pagination(client, db, superuser, superuser_headers):
+    for i in range(4):
+        make_user(db, f"seller{i}")
+
+    seen = []
+    response = client.get("/api/v1/users/?limit=2", headers=superuser_headers)
+    assert response.status_code == 200
+    seen += [u["id"] for u in response.json()]
+
+    while "X-Next-Cursor" in response.headers:
+        cursor = response.headers["X-Next-Cursor"]
+        response = client.get(
+            f"/api/v1/users/?limit=2&cursor={cursor}", headers=superuser_headers
+        )
+        assert response.status_code == 200
+        seen += [u["id"] for u in response.json()]
+
+    # 4 sellers + el superusuario, sin duplicados
+    assert len(seen) == 5
+    assert len(set(seen)) == 5
+
+
+def test_list_users_offset_matches_cursor_order(
+    client, db, superuser, superuser_headers
+):
+    for i in range(3):
+        make_user(db, f"seller{i}")
+
+    first = client.get("/api/v1/users/?limit=2", headers=superuser_headers)
+    cursor = first.headers["X-Next-Cursor"]
+    by_cursor = client.get(
+        f"/api/v1/users/?limit=2&cursor={cursor}", headers=superuser_headers
+    )
+    by_offset = client.get("/api/v1/users/?limit=2&skip=2", headers=superuser_headers)
+
+    assert by_offset.json() == by_cursor.json()
+
+
+def test_list_users_invalid_cursor(client, db, superuser_headers):
+    response = client.get("/api/v1/users/?cursor=basura", headers=superuser_headers)
+    assert response.status_code == 400
+
+
+def test_current_user_is_cached_and_invalidated(
+    client, db, superuser, superuser_headers
+):
+    user_cache.clear()
+    client.get("/api/v1/users/me", headers=superuser_headers)
+    hits = user_cache.hits
+    response = client.get("/api/v1/users/me", headers=superuser_headers)
+    assert response.status_code == 200
+    assert user_cache.hits == hits + 1
+
+    response = client.put(
+        f"/api/v1/users/{superuser.id}",
+        json={"full_name": "Nuevo Nombre"},
+        headers=superuser_headers,
+    )
+    assert response.status_code == 200
+
+    response = client.get("/api/v1/users/me", headers=superuser_headers)
+    assert response.json()["full_name"] == "Nuevo Nombre"
+
+
+def test_create_user_duplicates_map_to_400(client, db, superuser_headers):
+    make_user(db, "ana")
+    payload = {
+        "email": "ana@example.com",
+        "username": "otra",
+        "full_name": "Otra",
+        "password": "supersecreta",
+    }
+    response = client.post(
+        "/api/v1/users/create", json=payload, headers=superuser_headers
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "El email ya está registrado"
+
+    payload.update(email="otra@example.com", username="ana")
+    response = client.post(
+        "/api/v1/users/create", json=payload, headers=superuser_headers
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "El username ya está en uso"
+
+
+def test_soft_deleted_user_email_can_be_reused(client, db, superuser_headers):
+    ana = make_user(db, "ana")
+    response = client.delete(f"/api/v1/users/{ana.id}", headers=superuser_headers)
+    assert response.status_code == 200
+
+    response = client.post(
+        "/api/v1/users/create",
+        json={
+            "email": "ana@example.com",
+            "username": "ana",
+            "full_name": "Ana",
+            "password": "supersecreta",
+        },
+        headers=superuser_headers,
+    )
+    assert response.status_code == 201
+
+
+def test_update_user_duplicate_username(client, db, superuser_headers):
+    make_user(db, "ana")
+    beto = make_user(db, "beto")
+    response = client.put(
+        f"/api/v1/users/{beto.id}", json={"username": "ana"}, headers=superuser_headers
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "El username ya está en uso"
+
+
+def test_import_users_csv(client, db, superuser_headers):
+    make_user(db, "existente")
+    content = (
+        "email,username,full_name,password,role\n"
+        "ana@example.com,ana,Ana,supersecreta,\n"
+        "beto@example.com,beto,Beto,supersecreta,MANAGER\n"
+        "no-es-email,carla,Carla,supersecreta,\n"
+        "ana2@example.com,ana,Ana Dos,supersecreta,\n"
+        "existente@example.com,nuevo,Nuevo,supersecreta,\n"
+    )
+    response = client.post(
+        "/api/v1/users/import",
+        files={"file": ("users.csv", content, "text/csv")},
+        headers=superuser_headers,
+    )
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["total"] == 5
+    assert summary["created"] == 2
+    assert summary["failed"] == 3
+    assert [e["row"] for e in summary["errors"]] == [3, 4, 5]
+
+    response = client.get("/api/v1/users/?limit=10", headers=superuser_headers)
+    roles = {u["username"]: u["role"] for u in response.json()}
+    assert roles["ana"] == "SELLER"
+    assert roles["beto"] == "MANAGER"
+
+
+def test_import_users_ndjson(client, db, superuser_headers):
+    content = (
+        '{"email": "ana@example.com", "username": "ana", '
+        '"full_name": "Ana", "password": "supersecreta"}\n'
+        "{no es json\n"
+    )
+    response = client.post(
+        "/api/v1/users/import",
+        files={"file": ("users.ndjson", content, "application/x-ndjson")},
+        headers=superuser_headers,
+    )
+    assert response.json()["created"] == 1
+    assert response.json()["errors"] == [{"row": 2, "error": "JSON inválido"}]
+
+
+def test_import_users_reports_malformed_files(client, superuser_headers):
+    header = "email,username,full_name,password\n"
+    # (contenido, encoding, filas creadas, error)
+    uploads = [
+        (
+            header + "ana@example.com,ana,Ana,supersecreta\nb\xe9to,B\n",
+            "latin-1",
+            1,
+            {"row": 2, "error": "El archivo no está codificado en UTF-8"},
+        ),
+        # Una celda más grande que csv.field_size_limit()
+        (
+            header + "carla@example.com,carla,Carla,supersecreta\n" + "x" * 200_000,
+            "utf-8",
+            1,
+            {"row": 2, "error": "CSV inválido: field larger than field limit (131072)"},
+        ),
+    ]
+    for content, encoding, created, error in uploads:
+        response = client.post(
+            "/api/v1/users/import",
+            files={"file": ("users.csv", content.encode(encoding), "text/csv")},
+            headers=superuser_headers,
+        )
+        # Se corta la lectura, no es un 500; lo anterior se importó
+        assert response.status_code == 200
+        summary = response.json()
+        assert summary["created"] == created
+        assert summary["errors"] == [error]
+
+
+def test_crud_create_multi_hashes_passwords(db):
+    users_in = [
+        UserCreate(
+            email=f"{name}@example.com",
+            username=name,
+            full_name=name.title(),
+            password="supersecreta",
+        )
+        for name in ("ana", "beto")
+    ]
+    users = crud_user.create_multi(db, users_in)
+
+    assert [u.username for u in users] == ["ana", "beto"]
+    assert all(verify_password("supersecreta", u.hashed_password) for u in users)
+    assert crud_user.authenticate(db, "beto", "supersecreta") is not None
+
+    with pytest.raises(DuplicateUserError):
+        crud_user.create_multi(db, users_in[:1])
+    assert crud_user.create_multi(db, []) == []
+
+
+def test_bulk_update_and_delete(client, db, superuser, superuser_headers):
+    ana = make_user(db, "ana")
+    beto = make_user(db, "beto")
+    ids = [str(ana.id), str(beto.id)]
+
+    response = client.post(
+        "/api/v1/users/bulk/update",
+        json={"ids": ids, "is_active": False, "role": "VIEWER"},
+        headers=superuser_headers,
+    )
+    assert response.status_code == 200
+    assert {(u["is_active"], u["role"]) for u in response.json()} == {(False, "VIEWER")}
+
+    response = client.post(
+        "/api/v1/users/bulk/delete",
+        json={"ids": [*ids, str(superuser.id)]},
+        headers=superuser_headers,
+    )
+    assert response.status_code == 400
+
+    response = client.post(
+        "/api/v1/users/bulk/delete", json={"ids": ids}, headers=superuser_headers
+    )
+    assert len(response.json()) == 2
+    assert all(u["deleted_at"] for u in response.json())
+
+    response = client.get("/api/v1/users/", headers=superuser_headers)
+    assert [u["username"] for u in response.json()] == ["root"]
+
+
+def test_export_users_ndjson_and_csv(client, db, superuser_headers):
+    for i in range(3):
+        make_user(db, f"seller{i}")
+
+    response = client.get("/api/v1/users/export", headers=superuser_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert {u["username"] for u in lines} == {"root", "seller0", "seller1", "seller2"}
+
+    response = client.get("/api/v1/users/export?format=csv", headers=superuser_headers)
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 4
+    assert "seller0@example.com" in {r["email"] for r in rows}
+
+
+def test_export_users_requires_admin(client, db):
+    seller = make_user(db, "seller")
+    response = client.get("/api/v1/users/export", headers=auth_headers(seller))
+    assert response.status_code == 403
+
+
+def test_sparse_fieldsets(client, db, superuser, superuser_headers):
+    make_user(db, "ana")
+    fields = "id,username,full_name,role"
+
+    response = client.get(f"/api/v1/users/?fields={fields}", headers=superuser_headers)
+    assert response.status_code == 200
+    assert all(set(u) == set(fields.split(",")) for u in response.json())
+
+    response = client.get(
+        f"/api/v1/users/{superuser.id}?fields=username", headers=superuser_headers
+    )
+    assert response.json() == {"username": "root"}
+
+    response = client.get(
+        "/api/v1/users/?fields=username,hashed_password", headers=superuser_headers
+    )
+    assert response.status_code == 400
+
+
+def test_row_responses_match_user_response(client, db, superuser, superuser_headers):
+    # Microsegundos con ceros a la izquierda y sin microsegundos: los dos
+    # casos en que un serializador puede recortar o rellenar distinto
+    make_user(
+        db,
+        "ana",
+        role=UserRole.MANAGER.value,
+        created_at=datetime(2026, 1, 2, 3, 4, 5, 500, tzinfo=timezone.utc),
+        updated_at=datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+    )
+    users = db.scalars(select(User).order_by(User.created_at, User.id)).all()
+
+    def expected(user):
+        return UserResponse.model_validate(user).model_dump(mode="json")
+
+    # Las filas de Core que serializa orjson dan el mismo JSON que el schema:
+    # mismas claves en el mismo orden, UUID, fechas y enums iguales
+    response = client.get("/api/v1/users/", headers=superuser_headers)
+    assert response.json() == [expected(user) for user in users]
+    assert response.content == orjson.dumps([expected(user) for user in users])
+
+    for user in users:
+        response = client.get(f"/api/v1/users/{user.id}", headers=superuser_headers)
+        assert response.content == orjson.dumps(expected(user))
+
+
+def test_query_budgets(client, db, superuser_headers):
+    ana = make_user(db, "ana")
+    # Primera petición: resuelve y cachea al usuario autenticado
+    client.get("/api/v1/users/", headers=superuser_headers)
+
+    with assert_max_queries(1):
+        client.get("/api/v1/users/", headers=superuser_headers)
+    with assert_max_queries(1):
+        client.get(f"/api/v1/users/{ana.id}", headers=superuser_headers)
+    with assert_max_queries(3):
+        client.put(
+            f"/api/v1/users/{ana.id}",
+            json={"full_name": "Ana María"},
+            headers=superuser_headers,
+        )
+    # Incluye el UPDATE que revoca los refresh tokens del usuario
+    with assert_max_queries(5):
+        client.delete(f"/api/v1/users/{ana.id}", headers=superuser_headers)
+
+
+def test_timestamps_are_set_per_row(client, db, superuser_headers):
+    ana, beto = make_user(db, "ana"), make_user(db, "beto")
+    assert ana.created_at < beto.created_at
+
+    updated_at = ana.updated_at
+    client.put(
+        f"/api/v1/users/{ana.id}",
+        json={"full_name": "Ana María"},
+        headers=superuser_headers,
+    )
+    db.refresh(ana)
+    assert ana.updated_at > updated_at
+
+
+def test_etags_and_conditional_requests(client, db, superuser, superuser_headers):
+    ana = make_user(db, "ana")
+    urls = [
+        "/api/v1/auth/me",
+        "/api/v1/users/me",
+        f"/api/v1/users/{ana.id}",
+        f"/api/v1/users/{ana.id}?fields=id,username",
+        "/api/v1/users/",
+    ]
+    etags = {}
+    for url in urls:
+        response = client.get(url, headers=superuser_headers)
+        assert response.status_code == 200
+        etags[url] = response.headers["ETag"]
+        assert response.headers["Cache-Control"] == "private, no-cache"
+
+        response = client.get(
+            url, headers={**superuser_headers, "If-None-Match": etags[url]}
+        )
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etags[url]
+
+    # /auth/me y /users/me son la misma representación; el resto difiere
+    assert etags["/api/v1/auth/me"] == etags["/api/v1/users/me"]
+    assert len(set(etags.values())) == len(urls) - 1
+
+    # Modificar a ana cambia su ETag y el del listado, no el de /me
+    client.put(
+        f"/api/v1/users/{ana.id}",
+        json={"full_name": "Ana María"},
+        headers=superuser_headers,
+    )
+    for url in urls:
+        response = client.get(
+            url, headers={**superuser_headers, "If-None-Match": etags[url]}
+        )
+        assert response.status_code == (304 if url.endswith("/me") else 200)
+
+
+def test_msgpack_negotiation(client, db, superuser, superuser_headers):
+    ana = make_user(db, "ana")
+    msgpack_headers = {**superuser_headers, "Accept": "application/msgpack"}
+
+    for url in [
+        "/api/v1/users/",
+        f"/api/v1/users/{ana.id}",
+        f"/api/v1/users/{ana.id}?fields=id,username",
+        "/api/v1/users/me",
+        "/api/v1/auth/me",
+    ]:
+        as_json = client.get(url, headers=superuser_headers)
+        as_msgpack = client.get(url, headers=msgpack_headers)
+        assert as_msgpack.status_code == 200
+        assert as_msgpack.headers["content-type"] == "application/msgpack"
+        assert "Accept" in as_msgpack.headers["Vary"]
+        assert msgpack.unpackb(as_msgpack.content) == as_json.json()
+        assert as_msgpack.headers["ETag"] != as_json.headers["ETag"]
+
+    # JSON preferido sobre MessagePack: se responde JSON
+    response = client.get(
+        "/api/v1/users/",
+        headers={
+            **superuser_headers,
+            "Accept": "application/msgpack;q=0.5, application/json",
+        },
+    )
+    assert response.headers["content-type"] == "application/json"
+
+    # El export usa MessagePack por Accept, o con ?format=msgpack
+    ndjson = client.get("/api/v1/users/export", headers=superuser_headers)
+    for response in [
+        client.get("/api/v1/users/export", headers=msgpack_headers),
+        client.get("/api/v1/users/export?format=msgpack", headers=superuser_headers),
+    ]:
+        assert response.headers["content-type"] == "application/msgpack"
+        unpacker = msgpack.Unpacker()
+        unpacker.feed(response.content)
+        assert list(unpacker) == [json.loads(line) for line in ndjson.text.splitlines()]
+
+
+def test_response_compression(client, db, superuser_headers):
+    for i in range(20):
+        make_user(db, f"seller{i}")
+    url = "/api/v1/users/"
+
+    identity = client.get(url, headers={**superuser_headers, "Accept-Encoding": ""})
+    assert "content-encoding" not in identity.headers
+    assert len(identity.content) > settings.COMPRESSION_MIN_SIZE
+
+    for accept_encoding, expected in [
+        ("gzip, br", "br"),
+        ("gzip", "gzip"),
+        ("br;q=0.5, gzip", "gzip"),
+    ]:
+        response = client.get(
+            url, headers={**superuser_headers, "Accept-Encoding": accept_encoding}
+        )
+        assert response.headers["content-encoding"] == expected
+        assert "Accept-Encoding" in response.headers["Vary"]
+        assert response.content == identity.content
+        # Bytes distintos a los sin comprimir: ETag débil, pero revalida igual
+        assert response.headers["ETag"] == f"W/{identity.headers['ETag']}"
+        response = client.get(
+            url,
+            headers={**superuser_headers, "If-None-Match": response.headers["ETag"]},
+        )
+        assert response.status_code == 304
+
+    # Respuestas chicas no se comprimen
+    response = client.get(
+        "/api/v1/auth/me", headers={**superuser_headers, "Accept-Encoding": "br"}
+    )
+    assert "content-encoding" not in response.headers
+
+
+def test_list_users_total_count(client, db, superuser, superuser_headers, monkeypatch):
+    make_user(db, "ana")
+    make_user(db, "beto")
+    make_user(db, "gone", deleted_at=datetime.now(timezone.utc))
+
+    response = client.get("/api/v1/users/?count=exact", headers=superuser_headers)
+    assert response.headers["X-Total-Count"] == "3"
+    assert response.headers["X-Total-Count-Type"] == "exact"
+
+    # El conteo exacto queda cacheado: la siguiente página no repite el COUNT
+    make_user(db, "carla")
+    with assert_max_queries(1):
+        response = client.get("/api/v1/users/?count=exact", headers=superuser_headers)
+    assert response.headers["X-Total-Count"] == "3"
+    count_cache.clear()
+
+    # Tabla chica: `estimated` cae al conteo exacto
+    response = client.get("/api/v1/users/?count=estimated", headers=superuser_headers)
+    assert response.headers["X-Total-Count"] == "4"
+    assert response.headers["X-Total-Count-Type"] == "exact"
+
+    # Sobre el umbral se usa la estimación (en SQLite, max(rowid)), que
+    # también cuenta los eliminados
+    monkeypatch.setattr(settings, "COUNT_ESTIMATE_THRESHOLD", 1)
+    response = client.get("/api/v1/users/?count=estimated", headers=superuser_headers)
+    assert response.headers["X-Total-Count"] == "5"
+    assert response.headers["X-Total-Count-Type"] == "estimated"
+
+    response = client.get("/api/v1/users/", headers=superuser_headers)
+    assert "X-Total-Count" not in response.headers
+    response = client.get("/api/v1/users/?count=maybe", headers=superuser_headers)
+    assert response.status_code == 422
+
+
+def test_search_users(client, db, superuser_headers):
+    make_user(db, "ana", full_name="Ana Pérez")
+    make_user(db, "anabel", email="abel@example.com", role=UserRole.ADMIN.value)
+    make_user(db, "beto", full_name="Beto Banana", is_active=False)
+    make_user(db, "andres", deleted_at=datetime.now(timezone.utc))
+    make_user(db, "a_b")
+
+    def search(query: str) -> list[str]:
+        response = client.get(
+            f"/api/v1/users/search?{query}", headers=superuser_headers
+        )
+        assert response.status_code == 200, response.text
+        return [u["username"] for u in response.json()]
+
+    # Prefijo sin distinguir mayúsculas en username, email o full_name
+    assert search("q=AN") == ["ana", "anabel"]
+    assert search("q=abel") == ["anabel"]
+    assert search("q=beto%20b") == ["beto"]
+    # Subcadena
+    assert search("q=anan&match=contains") == ["beto"]
+    assert search("q=ana&match=contains") == ["ana", "anabel", "beto"]
+    # Filtros, solos o combinados con el texto
+    assert search("role=ADMIN") == ["anabel"]
+    assert search("q=ana&match=contains&is_active=false") == ["beto"]
+    # Los comodines de LIKE se buscan literalmente
+    assert search("q=a_") == ["a_b"]
+    assert search("q=%25") == []
+
+    # Paginación por cursor
+    response = client.get(
+        "/api/v1/users/search?q=an&limit=1&fields=username", headers=superuser_headers
+    )
+    assert response.json() == [{"username": "ana"}]
+    response = client.get(
+        "/api/v1/users/search?q=an&limit=1&fields=username&cursor="
+        + response.headers["X-Next-Cursor"],
+        headers=superuser_headers,
+    )
+    assert response.json() == [{"username": "anabel"}]
+    assert "X-Next-Cursor" not in response.headers
+
+    response = client.get(
+        "/api/v1/users/search?q=an&match=contains", headers=superuser_headers
+    )
+    assert response.status_code == 400
+
+
+def test_search_users_uses_indexes(db):
+    def plan(q: str, match: str) -> str:
+        stmt = build_page_stmt(
+            User, select(User.id).where(*build_search_filters("sqlite", q, match))
+        )
+        sql = stmt.compile(
+            dialect=db.bind.dialect, compile_kwargs={"literal_binds": True}
+        )
+        return " ".join(row[3] for row in db.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+    prefix_plan = plan("ana", "prefix")
+    for field in ("username", "email", "full_name"):
+        assert f"USING INDEX ix_users_{field}_lower" in prefix_plan
+    # En SQLite la subcadena no tiene índice (en Postgres usa los de trigramas)
+    assert "_lower" not in plan("ana", "contains")